@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Layer 1 mikro-benchmark: çift başına çözüm süresi.
+1) linprog, kısıt şablonu her çağrıda yeniden kurulur (önbellek temizlenir — eski davranışa eşdeğer)
+2) linprog, önbellekli kısıt şablonu (yalnızca fiyat vektörü değişir)
+3) check_arbitrage_batch (vektörel, tüm çiftler tek çağrı)
+Kullanım: python scripts/bench_optimization_layer1.py [çift_sayısı]
+"""
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.optimization_layer1 import (
+    BINARY_COMBINATIONS,
+    BINARY_KEYS,
+    _check_arbitrage_lp,
+    _constraint_template,
+    check_arbitrage_batch,
+    combinations_to_mask,
+)
+
+
+def _random_pairs(n, seed=42):
+    rnd = random.Random(seed)
+    pairs = []
+    for _ in range(n):
+        prices = {k: rnd.uniform(0.05, 0.95) for k in BINARY_KEYS}
+        combos = [
+            {"market_a_outcome": a, "market_b_outcome": b}
+            for a, b in BINARY_COMBINATIONS
+            if rnd.random() < 0.7
+        ] or [{"market_a_outcome": "Evet", "market_b_outcome": "Evet"}]
+        pairs.append((prices, combos))
+    return pairs
+
+
+def _per_pair_us(fn, pairs):
+    t0 = time.perf_counter()
+    fn(pairs)
+    return (time.perf_counter() - t0) / len(pairs) * 1e6
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    pairs = _random_pairs(n)
+
+    def lp_cold(ps):
+        for prices, combos in ps:
+            _constraint_template.cache_clear()
+            _check_arbitrage_lp(prices, combos, timeout=1.0)
+
+    def lp_warm(ps):
+        for prices, combos in ps:
+            _check_arbitrage_lp(prices, combos, timeout=1.0)
+
+    def batch(ps):
+        check_arbitrage_batch(
+            [[p[k] for k in BINARY_KEYS] for p, _ in ps],
+            [combinations_to_mask(c) for _, c in ps],
+        )
+
+    print(f"Çift sayısı: {n}")
+    print(f"  {'linprog, şablonsuz':<28}: {_per_pair_us(lp_cold, pairs):10.1f} µs/çift")
+    lp_warm(pairs[:50])  # şablon önbelleğini ısıt
+    print(f"  {'linprog, önbellekli şablon':<28}: {_per_pair_us(lp_warm, pairs):10.1f} µs/çift")
+    print(f"  {'vektörel (batch)':<28}: {_per_pair_us(batch, pairs):10.1f} µs/çift")
+    print(f"Şablon önbelleği: {_constraint_template.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
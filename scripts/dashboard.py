@@ -19,10 +19,10 @@ import pandas as pd
 
 from src.config_loader import load_env, load_yaml, save_risk_params, save_monitoring_alerts
 from src.monitoring import get_metrics, get_metrics_history, get_event_history, get_pipeline_runs
-from src.manual_review_queue import get_all, approve, reject
+from src.manual_review_queue import get_pending, count_by_status, approve, reject
 from src.execution_mode import get_mode, set_mode
-from src.alerts import get_alert_history
-from src.audit_log import read_audit_log
+from src.alerts import get_alert_history, evaluate_thresholds
+from src.audit_log import read_audit_page
 
 st.set_page_config(page_title="Kripto İzleme", layout="wide")
 env = load_env()
@@ -134,7 +134,7 @@ def render_dashboard():
     else:
         st.caption("Grafik verisi yok (pipeline çalıştıkça dolacak).")
 
-    alerts_list = m.get("alerts") or []
+    alerts_list = [msg for _, _, msg in evaluate_thresholds(m, load_yaml("monitoring"))]
     if alerts_list:
         st.subheader("Uyarılar")
         for msg in alerts_list:
@@ -153,8 +153,8 @@ def render_dashboard():
 
 def render_queue():
     st.title("Manuel kuyruk")
-    items = get_all()
-    pending = [x for x in items if x.get("status") == "pending"]
+    pending = get_pending(limit=200)
+    counts = count_by_status()
     if not pending:
         st.write("Bekleyen kayıt yok.")
     else:
@@ -167,14 +167,14 @@ def render_queue():
                 if st.button("Reddet", key=f"no_{x.get('id')}"):
                     reject(x["id"])
                     st.rerun()
-    st.caption(f"Toplam kayıt: {len(items)} (bekleyen: {len(pending)})")
+    st.caption(f"Toplam kayıt: {sum(counts.values())} (bekleyen: {counts.get('pending', 0)}; en yeni 200 gösterilir)")
 
 
 def render_alerts():
     st.title("Uyarılar ve geçmiş")
     m = get_metrics()
     st.subheader("Anlık uyarılar")
-    alerts_list = m.get("alerts") or []
+    alerts_list = [msg for _, _, msg in evaluate_thresholds(m, load_yaml("monitoring"))]
     if alerts_list:
         for msg in alerts_list:
             st.warning(msg)
@@ -225,9 +225,14 @@ def render_config():
 def render_audit():
     st.title("Audit log")
     action_filter = st.selectbox("Aksiyon filtresi", ["Tümü", "execution_mode_change", "config_change", "queue_approve", "queue_reject"], key="audit_filter")
-    limit = st.slider("Kayıt sayısı", 20, 300, 100)
+    limit = st.slider("Sayfa başına kayıt", 20, 300, 100)
     filt = None if action_filter == "Tümü" else action_filter
-    entries = read_audit_log(limit=limit, action_filter=filt)
+    # Sayfalama: imleç yığını (ilk eleman None = en yeni sayfa); filtre/limit değişince başa dönülür
+    if st.session_state.get("audit_query") != (filt, limit):
+        st.session_state["audit_query"] = (filt, limit)
+        st.session_state["audit_cursors"] = [None]
+    cursors = st.session_state["audit_cursors"]
+    entries, next_cursor = read_audit_page(limit=limit, action_filter=filt, cursor=cursors[-1])
     if entries:
         rows = []
         for e in entries:
@@ -235,6 +240,17 @@ def render_audit():
         st.dataframe(pd.DataFrame(rows), width="stretch")
     else:
         st.write("Kayıt yok.")
+    col_prev, col_page, col_next = st.columns(3)
+    with col_prev:
+        if len(cursors) > 1 and st.button("← Daha yeni", key="audit_prev"):
+            cursors.pop()
+            st.rerun()
+    with col_page:
+        st.caption(f"Sayfa {len(cursors)} (yeniden eskiye)")
+    with col_next:
+        if next_cursor and st.button("Daha eski →", key="audit_next"):
+            cursors.append(next_cursor)
+            st.rerun()
 
 
 if page == "Kripto":
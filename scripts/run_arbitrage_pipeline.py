@@ -3,8 +3,14 @@
 Arbitraj pipeline: Gamma API kripto event'leri → bağımlılık tespiti → Layer 1 → execution validation → kuyruk/execution.
 Sadece Bitcoin, Ethereum, Solana event'leri işlenir (SOP §4.2, §4.6.3). Polymarket Gamma API tag_id=21 (Crypto).
 """
+import fcntl
+import math
 import os
 import sys
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent.parent
@@ -12,27 +18,77 @@ sys.path.insert(0, str(ROOT))
 
 from src.config_loader import load_env, load_yaml
 from src.execution_mode import get_mode
+from src.clob_client import warm_up as clob_warm_up
+from src import dependency_cache
 from src.dependency_detection import (
+    CACHE_VERSION,
     PROMPT_TEMPLATE,
     call_gemini,
     parse_combinations,
+    build_batch_prompt,
+    parse_batch_combinations,
     is_dependent,
 )
-from src.optimization_layer1 import check_arbitrage
-from src.execution_validation import passes_execution_validation
+from src.optimization_layer1 import BINARY_KEYS, check_arbitrage, check_arbitrage_batch, check_event_arbitrage, combinations_to_mask
+from src.execution_validation import passes_execution_validation, passes_vwap_validation, vwap_validation_batch
+from src.orderbook import get_levels
 from src.manual_review_queue import add as queue_add
-from src.position_sizing import size_from_orderbook_depth
-from src.order_submission import submit_orders
-from src.monitoring import record_opportunity, record_execution, record_event, record_pipeline_run, get_metrics
+from src.position_sizing import sizes_from_book_levels, size_from_orderbook_depth
+from src.order_submission import scale_legs, submit_orders
+from src.monitoring import record_opportunity, record_execution, record_event, record_pipeline_run, get_metrics, evaluate_alerts
 from src.polymarket_gamma import (
     fetch_crypto_events,
     load_crypto_events_from_fixture,
     group_events_by_asset,
-    get_market_prices,
+    get_group_prices,
     get_market_liquidity_usd,
+    get_market_token_ids,
+    load_market_snapshot,
+    changed_market_ids,
+    save_market_snapshot,
 )
 
 CONDITIONS = "Evet / Hayır"
+DEFAULT_WORKERS = 8
+DEFAULT_PAIR_TIMEOUT_SEC = 30
+DEFAULT_LLM_TIMEOUT_SEC = 20
+LOCK_PATH = ROOT / "data" / "pipeline.lock"
+EXECUTION_LOCK_PATH = ROOT / "data" / "execution.lock"
+# Canlı order book açıksa fiyatların en fazla bu kadar eski olmasına izin verilir (run_sweep ayarlar)
+LIVE_BOOK = {"max_age_sec": None}
+# Layer 3 VWAP simülasyonu (optimization_layer3.yaml vwap); canlı order book seviyeleri varsa uygulanır
+VWAP = {"enabled": False, "max_levels": 10, "max_slippage_pct": 2.0}
+
+
+def group_prices(markets):
+    """
+    Piyasa başına (yes, no) alım fiyatları tek kaynaktan: hepsinin canlı order book'u varsa oradan,
+    yoksa tümü Gamma outcomePrices (bir çiftin/event'in bacakları farklı kaynaklardan fiyatlanmaz).
+    """
+    return get_group_prices(markets, max_age_sec=LIVE_BOOK["max_age_sec"])
+
+
+def start_live_book(env, events, force=False):
+    """
+    config/data_pipeline.yaml websocket.live_book.enabled ise event'lerdeki tüm token'lar için
+    uzun ömürlü WebSocket akışını başlatır/genişletir (src/orderbook). Tek seferlik çalıştırmada
+    kitap henüz dolmamış olabilir; fiyatlar o durumda Gamma'ya düşer. force: config'ten bağımsız aç (tepkisel mod).
+    """
+    ws_cfg = load_yaml("data_pipeline").get("websocket") or {}
+    live_cfg = ws_cfg.get("live_book") or {}
+    if not (live_cfg.get("enabled") or force):
+        LIVE_BOOK["max_age_sec"] = None
+        return 0
+    from src.orderbook import ensure_stream
+    url = env.get("POLYMARKET_WS_URL") or ws_cfg.get("url")
+    token_ids = [t for e in events for m in e.get("markets") or [] for t in get_market_token_ids(m) if t]
+    LIVE_BOOK["max_age_sec"] = float(live_cfg.get("max_staleness_sec", 2))
+    try:
+        return ensure_stream(url, token_ids, ping_interval=float(ws_cfg.get("ping_interval_sec") or 10))
+    except Exception as e:
+        print("Canlı order book başlatılamadı:", str(e))
+        LIVE_BOOK["max_age_sec"] = None
+        return 0
 
 
 def normalize_outcome(s):
@@ -56,6 +112,12 @@ def normalize_combinations(combos):
     ]
 
 
+def valid_binary_combinations(raw):
+    """LLM çıktısını normalize eder; yalnızca Evet/Hayır çiftlerini bırakır."""
+    normalized = normalize_combinations(raw)
+    return [c for c in normalized if c["market_a_outcome"] in ("Evet", "Hayır") and c["market_b_outcome"] in ("Evet", "Hayır")]
+
+
 def all_binary_combinations():
     return [
         {"market_a_outcome": "Evet", "market_b_outcome": "Evet"},
@@ -65,10 +127,20 @@ def all_binary_combinations():
     ]
 
 
-def get_valid_combinations(market_a_question, market_b_question, api_key, model, llm_cfg):
-    """Gemini ile geçerli kombinasyonlar; Evet/Hayır normalize."""
+def get_valid_combinations(market_a_question, market_b_question, api_key, model, llm_cfg, timeout=None,
+                           market_a_id=None, market_b_id=None, check_cache=True):
+    """
+    Gemini ile geçerli kombinasyonlar; Evet/Hayır normalize. timeout: HTTP süre sınırı (sn).
+    Başarılı yanıtlar dependency_cache'e yazılır; önbellekte varsa LLM çağrılmaz. Hata/boş yanıtta
+    dönen varsayılan (tüm kombinasyonlar) önbelleğe alınmaz, bir sonraki turda yeniden denenir.
+    check_cache=False: anahtara bu taramada zaten bakıldı ve ıskaladı (prefetch); tekrar sayılmaz.
+    """
     if not api_key:
         return all_binary_combinations()
+    key = dependency_cache.make_key(market_a_id, market_b_id, market_a_question, market_b_question, model, CACHE_VERSION)
+    cached = dependency_cache.get(key) if check_cache else None
+    if cached is not None:
+        return cached
     prompt = PROMPT_TEMPLATE % (market_a_question, CONDITIONS, market_b_question, CONDITIONS)
     try:
         text = call_gemini(
@@ -77,81 +149,541 @@ def get_valid_combinations(market_a_question, market_b_question, api_key, model,
             prompt,
             temperature=llm_cfg.get("temperature", 0.2),
             max_tokens=llm_cfg.get("max_tokens", 1024),
+            timeout=timeout,
         )
-        raw = parse_combinations(text)
-        normalized = normalize_combinations(raw)
-        valid = [c for c in normalized if c["market_a_outcome"] in ("Evet", "Hayır") and c["market_b_outcome"] in ("Evet", "Hayır")]
+        valid = valid_binary_combinations(parse_combinations(text))
         if not valid:
             return all_binary_combinations()
+        dependency_cache.put(key, valid, market_a_id, market_b_id, model, CACHE_VERSION)
         return valid
     except Exception:
         return all_binary_combinations()
 
 
-def run_pair(event, ma, mb, env, cfg_dep, cfg_risk, cfg_l3, api_key, model, llm_cfg, min_margin, min_liq, ref_size):
-    """Tek piyasa çifti: bağımlılık → Layer 1 → validation → kuyruk veya execution."""
-    combinations = get_valid_combinations(ma["question"], mb["question"], api_key, model, llm_cfg)
-    pa = get_market_prices(ma)
-    pb = get_market_prices(mb)
+def _fetch_batch(batch, api_key, model, llm_cfg, timeout=None):
+    """Aynı event'ten çiftleri tek Gemini isteğinde çözer; bozuk/eksik çiftler sonuca girmez (tekli yola düşer)."""
+    keys = [f"p{i + 1}" for i in range(len(batch))]
+    prompt = build_batch_prompt([(k, ma["question"], mb["question"]) for k, (_, ma, mb) in zip(keys, batch)], CONDITIONS)
+    try:
+        text = call_gemini(
+            api_key,
+            model,
+            prompt,
+            temperature=llm_cfg.get("temperature", 0.2),
+            max_tokens=llm_cfg.get("batch_max_tokens", 8192),
+            timeout=timeout,
+        )
+    except Exception:
+        return {}
+    parsed = parse_batch_combinations(text, keys)
+    out = {}
+    for k, (cache_key, ma, mb) in zip(keys, batch):
+        valid = valid_binary_combinations(parsed[k] or [])
+        if not valid:
+            continue
+        dependency_cache.put(cache_key, valid, ma.get("id"), mb.get("id"), model, CACHE_VERSION)
+        out[id(ma), id(mb)] = valid
+    return out
+
+
+def prefetch_combinations(pairs, api_key, model, llm_cfg, workers=DEFAULT_WORKERS, timeout=None, missed=None):
+    """
+    Önbellekte olmayan çiftleri event bazında llm.batch_size'lık gruplar halinde toplu prompt ile çözer.
+    Döner: {(id(market_a), id(market_b)): combinations}. Sonuçta olmayan çiftler run_pair içinde tekli çağrılır.
+    missed: set verilirse önbellekte bulunamayıp toplu promptla da çözülemeyen çiftlerin anahtarları eklenir
+    (tekli yolda önbelleğe yeniden bakılıp ıskalama iki kez sayılmasın).
+    """
+    batch_size = int(llm_cfg.get("batch_size") or 1)
+    if not api_key or batch_size <= 1:
+        return {}
+    resolved = {}
+    misses_by_event = {}
+    for event, ma, mb in pairs:
+        key = dependency_cache.make_key(ma.get("id"), mb.get("id"), ma["question"], mb["question"], model, CACHE_VERSION)
+        cached = dependency_cache.get(key)
+        if cached is not None:
+            resolved[id(ma), id(mb)] = cached
+        else:
+            misses_by_event.setdefault(id(event), []).append((key, ma, mb))
+    batches = [
+        items[i:i + batch_size]
+        for items in misses_by_event.values()
+        for i in range(0, len(items), batch_size)
+    ]
+    batches = [b for b in batches if len(b) > 1]
+    if batches:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+            for out in executor.map(lambda b: _fetch_batch(b, api_key, model, llm_cfg, timeout), batches):
+                resolved.update(out)
+    if missed is not None:
+        missed.update(
+            (id(ma), id(mb)) for items in misses_by_event.values() for _, ma, mb in items
+            if (id(ma), id(mb)) not in resolved
+        )
+    return resolved
+
+
+def screen_pairs(pairs, combos_by_pair):
+    """
+    Kombinasyonu bilinen çiftleri tek vektörel Layer 1 çağrısıyla tarar (check_arbitrage_batch).
+    Döner: {(id(market_a), id(market_b)): (has_arb, min_cost)}; numpy yoksa {} (çiftler tek tek değerlendirilir).
+    """
+    known = [(ma, mb) for _, ma, mb in pairs if (id(ma), id(mb)) in combos_by_pair]
+    if not known:
+        return {}
+    prices = [pa + pb for pa, pb in (group_prices([ma, mb]) for ma, mb in known)]
+    masks = [combinations_to_mask(combos_by_pair[id(ma), id(mb)]) for ma, mb in known]
+    try:
+        has_arb, min_cost = check_arbitrage_batch(prices, masks)
+    except ImportError:
+        return {}
+    return {(id(ma), id(mb)): (bool(h), float(c)) for (ma, mb), h, c in zip(known, has_arb, min_cost)}
+
+
+def order_legs(markets, positions, prices):
+    """
+    Alınacak outcome'lar -> emir bacakları [{token_id, price, side, market_id, outcome, position}].
+    markets: piyasa listesi; positions / prices: piyasa başına (yes, no). position: portföy birimi başına pay
+    (Layer 1 pozisyonu; execution'da scale_legs ile pay adedine çevrilir). Token id'si olmayan bacak atlanır.
+    """
+    legs = []
+    for m, pos, px in zip(markets, positions, prices):
+        token_ids = get_market_token_ids(m)
+        for k, outcome in enumerate(("Evet", "Hayır")):
+            if pos[k] > 1e-9 and token_ids[k]:
+                legs.append({
+                    "token_id": token_ids[k], "price": round(float(px[k]), 4), "side": "BUY",
+                    "market_id": m.get("id", ""), "outcome": outcome, "position": round(float(pos[k]), 6),
+                })
+    return legs
+
+
+def pair_legs(ma, mb, prices, combinations):
+    """İkili çift için Layer 1 optimum pozisyonundan bacaklar (check_arbitrage_batch return_positions)."""
+    row = [prices[k] for k in BINARY_KEYS]
+    try:
+        _, _, positions = check_arbitrage_batch([row], [combinations_to_mask(combinations)], return_positions=True)
+    except ImportError:
+        return []
+    x = positions[0]
+    return order_legs([ma, mb], [(x[0], x[1]), (x[2], x[3])], [(row[0], row[1]), (row[2], row[3])])
+
+
+def run_pair(event, ma, mb, env, cfg_dep, cfg_risk, cfg_l3, api_key, model, llm_cfg, min_margin, min_liq, ref_size,
+             pair_timeout=None, combinations=None, screen=None, cancelled=None, cache_checked=False, active=None,
+             prepared=None):
+    """
+    Tek piyasa çifti: bağımlılık → Layer 1 → validation → kuyruk veya execution.
+    combinations verilirse (önbellek/toplu prompt) LLM çağrılmaz; screen=(has_arb, min_cost) verilirse Layer 1 tekrarlanmaz.
+    cache_checked: önbelleğe bu taramada bakıldı ve ıskaladı (prefetch); tekli yolda tekrar bakılmaz.
+    pair_timeout: LLM HTTP süre sınırı. cancelled: çağrılabilir; True dönerse (zaman aşımı/tarama bitti) kuyruk/execution yapılmaz.
+    active: açık fırsat anahtarları (tarama ve tepkisel yol paylaşır); bkz. handle_opportunity.
+    prepared: prepare_pairs girdisi {"prices", "legs", "book"} — taramanın toplu VWAP/boyut sonucu (fiyatlar ve bacaklar aynı).
+    """
+    if combinations is None:
+        combinations = get_valid_combinations(
+            ma["question"], mb["question"], api_key, model, llm_cfg, timeout=pair_timeout,
+            market_a_id=ma.get("id"), market_b_id=mb.get("id"), check_cache=not cache_checked,
+        )
+    pa, pb = prepared["prices"] if prepared else group_prices([ma, mb])
     prices = {
         "market_a_yes": pa[0],
         "market_a_no": pa[1],
         "market_b_yes": pb[0],
         "market_b_no": pb[1],
     }
-    has_arb, min_cost = check_arbitrage(prices, combinations, timeout=0.1)
+    if screen is not None:
+        has_arb, min_cost = screen
+    else:
+        has_arb, min_cost = check_arbitrage(prices, combinations, timeout=0.1)
+    akey = ("pair", ma.get("id"), mb.get("id"))
     if not has_arb:
+        if active is not None:
+            active.discard(akey)
+        return None
+    liq_a = get_market_liquidity_usd(ma)
+    liq_b = get_market_liquidity_usd(mb)
+    legs = prepared["legs"] if prepared else pair_legs(ma, mb, prices, combinations)
+    return handle_opportunity(
+        event, min_cost, min(liq_a, liq_b), env, min_margin, min_liq, ref_size,
+        {
+            "market_a": ma["question"],
+            "market_b": mb["question"],
+            "market_a_id": ma.get("id", ""),
+            "market_b_id": mb.get("id", ""),
+            "combinations": combinations,
+            "dependency": True,
+            "legs": legs,
+        },
+        legs=legs, cancelled=cancelled, active=active, active_key=akey,
+        book=prepared["book"] if prepared else None,
+    )
+
+
+def prepare_pairs(pairs, combos_by_pair, screened, min_margin, min_liq, ref_size):
+    """
+    Taramada arbitrajı olan çiftlerin fiyat, bacak, VWAP ve boyut sonucunu toplu hesaplar (book_checks).
+    Döner: {(id(ma), id(mb)): {"prices": (pa, pb), "legs": [...], "book": book_checks sonucu}} (run_pair prepared).
+    """
+    keys, items, out = [], [], {}
+    for _, ma, mb in pairs:
+        key = (id(ma), id(mb))
+        screen = screened.get(key)
+        if screen is None or not screen[0] or key not in combos_by_pair:
+            continue
+        pa, pb = group_prices([ma, mb])
+        prices = {"market_a_yes": pa[0], "market_a_no": pa[1], "market_b_yes": pb[0], "market_b_no": pb[1]}
+        legs = pair_legs(ma, mb, prices, combos_by_pair[key])
+        size_usd = opportunity_size(min(get_market_liquidity_usd(ma), get_market_liquidity_usd(mb)), min_liq, ref_size)
+        keys.append(key)
+        items.append((legs, screen[1], size_usd))
+        out[key] = {"prices": (pa, pb), "legs": legs}
+    for key, book in zip(keys, book_checks(items, min_margin)):
+        out[key]["book"] = book
+    return out
+
+
+@contextmanager
+def execution_lock():
+    """
+    Kuyruk/execution adımını thread'ler ve süreçler arasında sıralar (data/execution.lock, bloklayan flock):
+    tarama worker'ları, tepkisel thread ve başka süreçteki tarama aynı anda emir/kuyruk kaydı yapmaz.
+    """
+    EXECUTION_LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(EXECUTION_LOCK_PATH, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def opportunity_size(min_liq_leg, min_liq, ref_size):
+    """Doğrulama büyüklüğü (USD): ref_size, en sığ bacağın likiditesi ve 500 ile sınırlı."""
+    return min(ref_size, (min_liq_leg or min_liq) or ref_size, 500)
+
+
+def book_checks(items, min_margin):
+    """
+    Canlı kitap seviyeleriyle Layer 3, adaylar toplu: VWAP doğrulaması tek simülasyonda (vwap_validation_batch) ve
+    depth_optimal boyutlandırma tek optimal_sizes_batch çağrısında (sizes_from_book_levels). items: [(legs, min_cost,
+    size_usd), ...]; bacak pozisyonları ağırlık olarak kullanılır (eşit olmayan event pozisyonları).
+    Döner: aday başına (book_levels, vwap_sonucu, sized): vwap_sonucu (passed, reason, sim) veya None (VWAP kapalı);
+    sized (size_usd, birim, profit) veya None (depth_optimal değil). Bacaklardan birinin taze kitabı yoksa (None, None, None).
+    """
+    out = [(None, None, None)] * len(items)
+    if LIVE_BOOK["max_age_sec"] is None:
+        return out
+    idx, books, weights = [], [], []
+    for i, (legs, _, _) in enumerate(items):
+        if not legs:
+            continue
+        book_levels = [get_levels(leg["token_id"], "asks", VWAP["max_levels"], LIVE_BOOK["max_age_sec"]) for leg in legs]
+        if all(book_levels):
+            idx.append(i)
+            books.append(book_levels)
+            weights.append([leg.get("position", 1.0) for leg in legs])
+    if not idx:
+        return out
+    results = [None] * len(idx)
+    if VWAP["enabled"]:
+        results = vwap_validation_batch(
+            [(b, items[i][2], items[i][1], w) for i, b, w in zip(idx, books, weights)],
+            min_margin_usd=min_margin, max_slippage_pct=VWAP["max_slippage_pct"], max_levels=VWAP["max_levels"],
+        )
+    sized = [None] * len(idx)
+    sizing = load_yaml("execution").get("position_sizing") or {}
+    if sizing.get("method") == "depth_optimal":
+        sized = sizes_from_book_levels(
+            list(zip(books, weights)), cap_pct=sizing.get("cap_pct_of_depth", 50),
+            max_usd=load_yaml("risk_params").get("max_position_usd"), max_levels=VWAP["max_levels"],
+        )
+    for i, b, result, size in zip(idx, books, results, sized):
+        out[i] = (b, result, size)
+    return out
+
+
+def handle_opportunity(event, min_cost, min_liq_leg, env, min_margin, min_liq, ref_size, queue_item, legs=None,
+                       cancelled=None, active=None, active_key=None, book=None):
+    """
+    Arbitraj bulunduktan sonraki ortak adımlar (çift ve event modu): min kenar → validation →
+    auto ise execution, değilse manuel kuyruk. queue_item: kuyruğa yazılacak çift/event alanları.
+    legs: emir bacakları; canlı kitapları taze ise VWAP simülasyonu (Layer 3) uygulanır, geçmezse {"rejected": neden}.
+    cancelled: çağrılabilir; başta (fırsat metriğinden önce) veya kuyruk/execution'dan hemen önce True dönerse hiçbir şey
+    yapılmaz (None döner).
+    active / active_key: açık fırsat kümesi ve bu fırsatın anahtarı; anahtar kümedeyse (fırsat tarama veya tepkisel
+    yolda işlendi, henüz kapanmadı) tekrar kuyruğa/execution'a gitmez. Kontrol ve yan etkiler execution_lock altındadır.
+    book: taramanın toplu book_checks sonucu (book_levels, VWAP sonucu, boyut); None ise burada tek aday olarak hesaplanır.
+    Execution'da bacak payları boyutlandırmanın birim sayısıyla (depth_optimal: optimum birim, yoksa size_usd / min_cost) ölçeklenir;
+    canlı kitap varsa son boyut VWAP/slippage kontrolünden yeniden geçer ve bacak limit fiyatı yürünen en derin seviyedir.
+    """
+    if cancelled is not None and cancelled():
+        # Zaman aşımına uğramış/bitmiş taramanın işi fırsat metriğine sayılmaz
         return None
     record_opportunity()
     profit_per_unit = 1.0 - min_cost
     min_edge_ratio = min_margin / ref_size
     if profit_per_unit < min_edge_ratio:
         return None
-    liq_a = get_market_liquidity_usd(ma)
-    liq_b = get_market_liquidity_usd(mb)
-    min_liq_leg = min(liq_a, liq_b) or min_liq
-    size_usd = min(ref_size, min_liq_leg or ref_size, 500)
+    min_liq_leg = min_liq_leg or min_liq
+    size_usd = opportunity_size(min_liq_leg, min_liq, ref_size)
     profit_usd = profit_per_unit * size_usd
+    vwap_sim = None
+    # Tüm bacakların taze kitabı varsa seviyeler (pozisyon ağırlıklı) yürünerek gerçekleşebilir kâr hesaplanır
+    book_levels, vwap_result, sized = book if book is not None else book_checks([(legs, min_cost, size_usd)], min_margin)[0]
+    if vwap_result is not None:
+        ok, reason, vwap_sim = vwap_result
+        if not ok:
+            return {"rejected": reason}
+        profit_usd = vwap_sim["profit"]
+        size_usd = min(size_usd, vwap_sim["cost"])
     passed, reason = passes_execution_validation(
         profit_usd,
         min_volume_per_leg_usd=min_liq_leg or min_liq,
         min_margin_usd=min_margin,
         min_liquidity_usd=min_liq,
     )
-    mode_data = get_mode()
-    mode = mode_data.get("EXECUTION_MODE") or env.get("EXECUTION_MODE", "paper")
-    trigger = mode_data.get("TRIGGER_MODE", "manual")
-
-    if passed and trigger == "auto":
-        cfg_ex = load_yaml("execution")
-        cap_pct = (cfg_ex.get("position_sizing") or {}).get("cap_pct_of_depth", 50)
-        depth_per_leg = [min_liq_leg or 100, min_liq_leg or 100]
-        size_usd = size_from_orderbook_depth(depth_per_leg, cap_pct=cap_pct)
-        success, msg = submit_orders([], size_usd, env, cfg_ex, execution_mode=mode)
-        record_execution(success, pnl_usd=profit_usd, latency_ms=0)
-        record_event("execution", {"success": success, "pnl_usd": round(profit_usd, 4), "mode": mode})
-        return {"executed": True, "success": success}
-    else:
-        qid = queue_add({
-            "market_a": ma["question"],
-            "market_b": mb["question"],
-            "min_cost": min_cost,
-            "event_slug": event.get("slug", ""),
-            "market_a_id": ma.get("id", ""),
-            "market_b_id": mb.get("id", ""),
-            "combinations": combinations,
-            "dependency": True,
-            "has_arbitrage": True,
-            "profit_usd": profit_usd,
-        })
-        return {"queued": qid}
+    with execution_lock():
+        mode_data = get_mode()
+        mode = mode_data.get("EXECUTION_MODE") or env.get("EXECUTION_MODE", "paper")
+        trigger = mode_data.get("TRIGGER_MODE", "manual")
+        if cancelled is not None and cancelled():
+            # Zaman aşımına uğramış/bitmiş taramanın geç kalan işi: sonucu kimse saymaz, yan etki de olmamalı
+            return None
+        if active is not None:
+            if active_key in active:
+                return None
+            active.add(active_key)
 
+        if passed and trigger == "auto":
+            cfg_ex = load_yaml("execution")
+            limit_prices = None
+            if sized is not None:
+                # Slippage sonrası beklenen kârı en yükselten büyüklük (canlı kitap seviyeleri, depth_optimal)
+                size_usd, units, profit_usd, limit_prices = sized
+                if profit_usd < min_margin:
+                    if active is not None:
+                        active.discard(active_key)
+                    return {"rejected": "sized profit < min_margin"}
+            else:
+                sizing = cfg_ex.get("position_sizing") or {}
+                depth_per_leg = [min_liq_leg or 100] * max(len(legs or []), 2)
+                size_usd = size_from_orderbook_depth(
+                    depth_per_leg, cap_pct=sizing.get("cap_pct_of_depth", 50),
+                    max_usd=load_yaml("risk_params").get("max_position_usd"),
+                )
+                # Birim maliyeti min_cost: toplam maliyet size_usd olacak birim sayısı
+                units = size_usd / min_cost if min_cost > 0 else 0.0
+            if book_levels is not None:
+                # VWAP kontrolü opportunity_size'da yapıldı; gönderilecek boyut (units) seviyeler yürünerek yeniden sınanır
+                ok, reason, final_sim = passes_vwap_validation(
+                    book_levels, size_usd, min_cost, min_margin_usd=min_margin, max_slippage_pct=VWAP["max_slippage_pct"],
+                    max_levels=VWAP["max_levels"], weights=[leg.get("position", 1.0) for leg in legs], units=units,
+                )
+                if VWAP["enabled"] and not ok:
+                    if vwap_sim is None:
+                        if active is not None:
+                            active.discard(active_key)
+                        return {"rejected": f"sized {reason}"}
+                    # Büyütülmüş boyut slippage/kâr sınırını aşıyor: doğrulanmış (opportunity_size) boyuta dönülür
+                    size_usd, units, profit_usd = vwap_sim["cost"], vwap_sim["fill_qty"], vwap_sim["profit"]
+                    final_sim, limit_prices = vwap_sim, None
+                limit_prices = limit_prices or final_sim["limit_price"]
+            leg_report = []
+            t0 = time.perf_counter()
+            # Bacak başına pay: pozisyon × birim sayısı; limit fiyat: payın yürüdüğü en derin kitap seviyesi
+            success, msg = submit_orders(
+                scale_legs(legs or [], units, limit_prices), size_usd, env, cfg_ex, execution_mode=mode, leg_report=leg_report,
+            )
+            latency_ms = (time.perf_counter() - t0) * 1000
+            record_execution(success, pnl_usd=profit_usd, latency_ms=latency_ms)
+            record_event("execution", {
+                "success": success, "pnl_usd": round(profit_usd, 4), "mode": mode, "latency_ms": round(latency_ms, 2),
+                "legs": [{k: r.get(k) for k in ("token_id", "qty", "status", "latency_ms")} for r in leg_report],
+            })
+            return {"executed": True, "success": success}
+        else:
+            item = dict(queue_item)
+            item.update({
+                "min_cost": min_cost,
+                "event_slug": event.get("slug", ""),
+                "has_arbitrage": True,
+                "profit_usd": profit_usd,
+            })
+            if vwap_sim is not None:
+                item["vwap"] = {
+                    "fill_qty": round(vwap_sim["fill_qty"], 4), "cost_usd": round(vwap_sim["cost"], 4),
+                    "max_slippage_pct": round(vwap_sim["max_slippage_pct"], 3),
+                }
+            qid = queue_add(item)
+            return {"queued": qid}
 
-def main():
+
+def is_exclusive_event(event):
+    """Polymarket negRisk event'i: piyasalar karşılıklı dışlayan ve tam olarak biri Evet çözülür."""
+    return bool(event.get("negRisk") or event.get("enableNegRisk"))
+
+
+def event_arbitrage(event, prices=None):
+    """Event'in tüm piyasaları için Layer 1: (has_arb, min_cost, positions). prices: group_prices sonucu (opsiyonel)."""
+    prices = prices or group_prices(event["markets"])
+    return check_event_arbitrage([p[0] for p in prices], [p[1] for p in prices], exhaustive=True)
+
+
+def event_legs(event, positions, prices):
+    """Event LP pozisyonundan (alınan piyasalar [(m, pos)], emir bacakları, en sığ bacak likiditesi)."""
+    legs = [(m, pos, px) for m, pos, px in zip(event["markets"], positions, prices) if pos[0] > 1e-9 or pos[1] > 1e-9]
+    min_liq_leg = min((get_market_liquidity_usd(m) for m, _, _ in legs), default=0.0)
+    orders = order_legs([m for m, _, _ in legs], [pos for _, pos, _ in legs], [px for _, _, px in legs])
+    return [(m, pos) for m, pos, _ in legs], orders, min_liq_leg
+
+
+def run_event(event, env, min_margin, min_liq, ref_size, check=None, prices=None, active=None, book=None):
+    """
+    Event modu: karşılıklı dışlayan tüm piyasalar tek LP ile (check_event_arbitrage); LLM çağrısı yok.
+    check: önceden hesaplanmış event_arbitrage sonucu; prices: onun hesaplandığı group_prices (opsiyonel).
+    active: açık fırsat anahtarları; book: taramanın toplu book_checks sonucu (bkz. handle_opportunity).
+    Döner: run_pair ile aynı biçim (None | {"queued"} | {"executed"} | {"rejected"}).
+    """
+    markets = event["markets"]
+    prices = prices or group_prices(markets)
+    has_arb, min_cost, positions = check or event_arbitrage(event, prices)
+    akey = ("event", event.get("id"))
+    if not has_arb:
+        if active is not None:
+            active.discard(akey)
+        return None
+    legs, orders, min_liq_leg = event_legs(event, positions, prices)
+    return handle_opportunity(
+        event, min_cost, min_liq_leg, env, min_margin, min_liq, ref_size,
+        {
+            "market_a": event.get("title", ""),
+            "market_b": f"{len(markets)} piyasa (event modu)",
+            "market_ids": [m.get("id", "") for m in markets],
+            "positions": [
+                {"market_id": m.get("id", ""), "question": m.get("question", ""), "yes": round(pos[0], 6), "no": round(pos[1], 6)}
+                for m, pos in legs
+            ],
+            "mode": "event",
+        },
+        legs=orders, active=active, active_key=akey, book=book,
+    )
+
+
+def evaluate_pairs(pairs, run_fn, workers=DEFAULT_WORKERS, pair_timeout=DEFAULT_PAIR_TIMEOUT_SEC):
+    """
+    Çiftleri sınırlı eşzamanlılıkla değerlendirir (ThreadPoolExecutor).
+    pairs: list of (event, market_a, market_b); run_fn(event, ma, mb, cancelled) -> run_pair sonucu.
+    Her çiftin süresi başladığı andan itibaren pair_timeout ile sınırlıdır; aşanlar timeout sayılır. Thread iptal
+    edilemediği için run_fn'e cancelled() verilir: çiftin süresi dolduysa veya tarama döndüyse True olur ve
+    run_pair kuyruk/execution yapmaz (geç biten çift kilit bırakıldıktan sonra yan etki üretmez).
+    Sayaçlar yalnızca ana thread'de güncellenir.
+    Döner: dict (pairs_checked, arbitrage_found, queued, executed, vwap_rejected, timeouts, errors).
+    """
+    counts = {"pairs_checked": 0, "arbitrage_found": 0, "queued": 0, "executed": 0, "vwap_rejected": 0, "timeouts": 0, "errors": 0}
+    if not pairs:
+        return counts
+    started = {}
+    finished = threading.Event()
+
+    def _timed(event, ma, mb):
+        t0 = time.monotonic()
+        started[id(ma), id(mb)] = t0
+        return run_fn(event, ma, mb, lambda: finished.is_set() or time.monotonic() - t0 > pair_timeout)
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pair")
+    try:
+        pending = {executor.submit(_timed, e, ma, mb): (e, ma, mb) for e, ma, mb in pairs}
+        # Kuyrukta bekleyen son çift de pair_timeout içinde bitmeli: toplam bütçe dalga sayısı * pair_timeout
+        sweep_deadline = time.monotonic() + pair_timeout * (math.ceil(len(pairs) / workers) + 1)
+        while pending:
+            now = time.monotonic()
+            if now >= sweep_deadline:
+                break
+            done, _ = wait(pending, timeout=min(1.0, sweep_deadline - now), return_when=FIRST_COMPLETED)
+            for fut in done:
+                _, ma, _ = pending.pop(fut)
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    counts["errors"] += 1
+                    print("Pair hatası:", (ma.get("question") or "")[:50], str(e))
+                    continue
+                counts["pairs_checked"] += 1
+                if result is None:
+                    continue
+                counts["arbitrage_found"] += 1
+                if result.get("rejected"):
+                    counts["vwap_rejected"] += 1
+                elif result.get("executed"):
+                    counts["executed"] += 1
+                else:
+                    counts["queued"] += 1
+            now = time.monotonic()
+            for fut, (_, ma, mb) in list(pending.items()):
+                t0 = started.get((id(ma), id(mb)))
+                if t0 is not None and now - t0 > pair_timeout and not fut.done():
+                    pending.pop(fut)
+                    counts["timeouts"] += 1
+                    print("Pair zaman aşımı:", (ma.get("question") or "")[:50])
+        for fut, (_, ma, _) in pending.items():
+            fut.cancel()
+            counts["timeouts"] += 1
+    finally:
+        finished.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+    return counts
+
+
+@contextmanager
+def pipeline_lock():
+    """
+    Süreçler arası çakışma koruması (data/pipeline.lock, flock). Cron ve döngü aynı anda tarama yapmaz.
+    yield: True kilit alındıysa, False başka bir tarama sürüyorsa (beklemez).
+    """
+    LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(LOCK_PATH, "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def run_sweep(context=None):
+    """
+    Tek tarama: Gamma → bağımlılık → Layer 1 → kuyruk/execution. Süreç içinde tekrar çağrılabilir
+    (run_pipeline_loop daemon modu); önbellekler ve HTTP oturumları çağrılar arasında korunur.
+    context: dict verilirse tepkisel mod için taramanın çift/event listesi ve token indeksi yazılır;
+    context["active"] (açık fırsat kümesi) tepkisel yolla paylaşılır, açık fırsat tekrar kuyruğa/execution'a gitmez.
+    Döner: (msg, counts, duration_sec).
+    """
+    t0 = time.monotonic()
+    # Sayaçlar süreç boyunca birikir (daemon); mesajda yalnızca bu taramanın farkı raporlanır
+    cache_before = dependency_cache.stats()
     record_pipeline_run("running", "Kripto event'leri Gamma API (tag_id=21) ile çekiliyor.")
     env = load_env()
+    mode_data = get_mode()
+    warm = (mode_data.get("EXECUTION_MODE") or env.get("EXECUTION_MODE", "paper")) == "live" and mode_data.get("TRIGGER_MODE") == "auto"
+
+    def _warm_up(markets):
+        # Önbellekli CLOB client'ı, HTTP bağlantısını ve aday token'ların tick size / neg risk / fee bilgisini
+        # tarama sürerken hazırla (ilk emirde el sıkışma ve meta veri çağrısı olmasın)
+        token_ids = sorted({t for m in markets for t in get_market_token_ids(m) if t})
+        if warm and token_ids:
+            threading.Thread(target=clob_warm_up, args=(env, token_ids), name="clob-warm-up", daemon=True).start()
     cfg_dep = load_yaml("dependency_detection")
     cfg_l3 = load_yaml("optimization_layer3")
+    vwap_cfg = cfg_l3.get("vwap") or {}
+    VWAP.update({
+        "enabled": bool(vwap_cfg.get("use_orderbook_levels", False)),
+        "max_levels": int(vwap_cfg.get("max_levels", 10)),
+        "max_slippage_pct": float(cfg_l3.get("max_slippage_pct", 2.0)),
+    })
     cfg_risk = load_yaml("risk_params")
     api_key = env.get("GOOGLE_GEMINI_API_KEY")
     if not api_key:
@@ -177,35 +709,292 @@ def main():
     grouped = group_events_by_asset(events)
     crypto_only = grouped["btc"] + grouped["eth"] + grouped["sol"]
     events_with_pairs = [e for e in crypto_only if e.get("markets") and len(e["markets"]) >= 2]
+    start_live_book(env, events_with_pairs, force=context is not None and context.get("reactive", False))
+    # Artımlı mod: yalnızca outcomePrices/liquidity'si önceki turdan beri değişen piyasaları içeren çift/event'ler
+    only_changed = (env.get("PIPELINE_ONLY_CHANGED") or "true").lower() == "true"
+    changed = changed_market_ids(crypto_only, load_market_snapshot()) if only_changed else None
+    if changed is not None and LIVE_BOOK["max_age_sec"] is not None:
+        # Fiyatlar canlı kitaptan: Gamma snapshot'ı değişmese de kitabı güncellenen piyasalar da değerlendirilir
+        from src.orderbook import drain_updated
+        book_updated = drain_updated()
+        changed = set(changed) | {
+            str(m.get("id", "")) for e in crypto_only for m in e.get("markets") or []
+            if any(str(t) in book_updated for t in get_market_token_ids(m) if t)
+        }
 
-    pairs_checked = 0
-    arbitrage_found = 0
-    queued = 0
-    executed = 0
+    def _touched(markets):
+        return changed is None or any(str(m.get("id", "")) in changed for m in markets)
 
-    for event in events_with_pairs:
-        markets = event["markets"]
-        for i in range(len(markets)):
-            for j in range(i + 1, len(markets)):
-                ma, mb = markets[i], markets[j]
-                try:
-                    result = run_pair(
-                        event, ma, mb, env, cfg_dep, cfg_risk, cfg_l3,
-                        api_key, model, llm_cfg, min_margin, min_liq, ref_size,
-                    )
-                    pairs_checked += 1
-                    if result is None:
-                        continue
-                    arbitrage_found += 1
-                    if result.get("executed"):
-                        executed += 1
-                    else:
-                        queued += 1
-                except Exception as e:
-                    print("Pair hatası:", (ma.get("question") or "")[:50], str(e))
+    cfg_l1 = load_yaml("optimization_layer1")
+    event_counts = {"events_checked": 0, "arbitrage_found": 0, "queued": 0, "executed": 0, "vwap_rejected": 0}
+    exclusive_all = []
+    # Değerlendirmesi hata veren event'lerin piyasaları snapshot'a yazılmaz (fiyat değişmese de sonraki turda tekrar)
+    failed_ids = set()
+    active = context.setdefault("active", set()) if context is not None else None
+    if (cfg_l1.get("event_mode") or {}).get("enabled", True):
+        # Karşılıklı dışlayan event'ler tek LP ile; bu event'lerin çiftleri LLM/çift LP'ye girmez
+        exclusive_all = [e for e in events_with_pairs if is_exclusive_event(e)]
+        events_with_pairs = [e for e in events_with_pairs if not is_exclusive_event(e)]
+        touched_events = [e for e in exclusive_all if _touched(e["markets"])]
+        # Layer 1 önce hesaplanır; arbitrajı olan event'lerin token'ları execution'dan önce ısıtılır
+        checks = {}
+        warm_markets = []
+        for event in touched_events:
+            try:
+                prices = group_prices(event["markets"])
+                check = event_arbitrage(event, prices)
+            except Exception:
+                continue  # run_event'te tekrar denenir; hata orada sayılır
+            checks[id(event)] = (prices, check)
+            if check[0]:
+                warm_markets.extend(event["markets"])
+        _warm_up(warm_markets)
+        # Arbitrajı olan event'lerin VWAP doğrulaması ve boyutlandırması toplu (book_checks)
+        book_keys, book_items = [], []
+        for event in touched_events:
+            prices, check = checks.get(id(event), (None, (False,)))
+            if check[0]:
+                _, orders, min_liq_leg = event_legs(event, check[2], prices)
+                book_keys.append(id(event))
+                book_items.append((orders, check[1], opportunity_size(min_liq_leg, min_liq, ref_size)))
+        event_books = dict(zip(book_keys, book_checks(book_items, min_margin)))
+        for event in touched_events:
+            prices, check = checks.get(id(event), (None, None))
+            try:
+                result = run_event(
+                    event, env, min_margin, min_liq, ref_size, check=check, prices=prices, active=active,
+                    book=event_books.get(id(event)),
+                )
+            except Exception as e:
+                print("Event hatası:", (event.get("title") or "")[:50], str(e))
+                event_counts["errors"] = event_counts.get("errors", 0) + 1
+                failed_ids.update(str(m.get("id", "")) for m in event["markets"])
+                continue
+            event_counts["events_checked"] += 1
+            if result is None:
+                continue
+            event_counts["arbitrage_found"] += 1
+            event_counts["vwap_rejected" if result.get("rejected") else "executed" if result.get("executed") else "queued"] += 1
+
+    pairs = [
+        (event, event["markets"][i], event["markets"][j])
+        for event in events_with_pairs
+        for i in range(len(event["markets"]))
+        for j in range(i + 1, len(event["markets"]))
+    ]
+    all_pairs = pairs
+    pairs = [(e, ma, mb) for e, ma, mb in pairs if _touched((ma, mb))]
+    workers = max(1, int(env.get("PIPELINE_WORKERS") or DEFAULT_WORKERS))
+    pair_timeout = float(env.get("PIPELINE_PAIR_TIMEOUT_SEC") or DEFAULT_PAIR_TIMEOUT_SEC)
+    # Gemini HTTP süre sınırı çift bütçesinden ayrı (çift süresi LLM + Layer 1 + execution'ı kapsar)
+    llm_timeout = float(env.get("PIPELINE_LLM_TIMEOUT_SEC") or llm_cfg.get("timeout_sec") or DEFAULT_LLM_TIMEOUT_SEC)
 
-    msg = f"Gamma crypto_events={len(crypto_only)} pairs={pairs_checked} arbitrage={arbitrage_found} queued={queued} executed={executed}"
+    prefetch_missed = set()
+    combos_by_pair = prefetch_combinations(
+        pairs, api_key, model, llm_cfg, workers=workers, timeout=llm_timeout, missed=prefetch_missed,
+    )
+    screened = screen_pairs(pairs, combos_by_pair)
+    # Vektörel taramada arbitrajı olmayan çiftler havuza hiç girmez
+    to_run = [(e, ma, mb) for e, ma, mb in pairs if screened.get((id(ma), id(mb)), (True, None))[0]]
+    _warm_up([m for _, ma, mb in to_run for m in (ma, mb)])
+    prepared = prepare_pairs(to_run, combos_by_pair, screened, min_margin, min_liq, ref_size)
+    if active is not None:
+        for _, ma, mb in pairs:
+            if not screened.get((id(ma), id(mb)), (True, None))[0]:
+                active.discard(("pair", ma.get("id"), mb.get("id")))
+
+    def _run(event, ma, mb, cancelled):
+        return run_pair(
+            event, ma, mb, env, cfg_dep, cfg_risk, cfg_l3,
+            api_key, model, llm_cfg, min_margin, min_liq, ref_size,
+            pair_timeout=llm_timeout, combinations=combos_by_pair.get((id(ma), id(mb))),
+            screen=screened.get((id(ma), id(mb))), cancelled=cancelled,
+            cache_checked=(id(ma), id(mb)) in prefetch_missed, active=active,
+            prepared=prepared.get((id(ma), id(mb))),
+        )
+
+    counts = evaluate_pairs(to_run, _run, workers=workers, pair_timeout=pair_timeout)
+    counts["pairs_checked"] += len(pairs) - len(to_run)
+
+    msg = (
+        f"Gamma crypto_events={len(crypto_only)} pairs={counts['pairs_checked']} arbitrage={counts['arbitrage_found']} "
+        f"queued={counts['queued']} executed={counts['executed']} vwap_rejected={counts['vwap_rejected']}"
+        f" timeouts={counts['timeouts']} errors={counts['errors']} workers={workers}"
+    )
+    if only_changed:
+        # Kombinasyonu çözülemeyen (LLM hatası/timeout) çiftlerin piyasaları snapshot'a girmez; sonraki turda tekrar denenir
+        retry = set(failed_ids)
+        for _, ma, mb in pairs:
+            key = dependency_cache.make_key(ma.get("id"), mb.get("id"), ma["question"], mb["question"], model, CACHE_VERSION)
+            if not dependency_cache.contains(key):
+                retry.update((str(ma.get("id", "")), str(mb.get("id", ""))))
+        save_market_snapshot(crypto_only, exclude_ids=retry)
+        msg += f" unchanged_skipped={len(all_pairs) - len(pairs)}"
+    if event_counts["events_checked"]:
+        msg += (
+            f" event_mode: events={event_counts['events_checked']} arbitrage={event_counts['arbitrage_found']}"
+            f" queued={event_counts['queued']} executed={event_counts['executed']} vwap_rejected={event_counts['vwap_rejected']}"
+        )
+    if event_counts.get("errors"):
+        msg += f" event_errors={event_counts['errors']}"
+    dependency_cache.purge_expired(min_interval_sec=dependency_cache.PURGE_INTERVAL_SEC)
+    cache_stats = dependency_cache.stats(since=cache_before)
+    msg += f" cache_hit={cache_stats['hits']} cache_miss={cache_stats['misses']}"
+    if cache_stats["expired"]:
+        msg += f" cache_expired={cache_stats['expired']}"
+    alerts = evaluate_alerts()
+    if alerts:
+        msg += f" alerts={len(alerts)}"
+    duration = time.monotonic() - t0
+    msg += f" duration={duration:.1f}s"
     record_pipeline_run("ok", msg)
+    if context is not None:
+        context.update({
+            "env": env, "cfg_dep": cfg_dep, "cfg_risk": cfg_risk, "cfg_l3": cfg_l3,
+            "api_key": api_key, "model": model, "llm_cfg": llm_cfg,
+            "min_margin": min_margin, "min_liq": min_liq, "ref_size": ref_size,
+            "combos": dict(combos_by_pair),
+            "index": build_token_index(all_pairs, exclusive_all),
+        })
+    return msg, counts, duration
+
+
+def build_token_index(pairs, exclusive_events):
+    """token_id -> [("pair", (event, ma, mb)) | ("event", event)]: bir kitap güncellemesinin etkilediği hedefler."""
+    index = {}
+    for e, ma, mb in pairs:
+        for t in get_market_token_ids(ma) + get_market_token_ids(mb):
+            if t:
+                index.setdefault(t, []).append(("pair", (e, ma, mb)))
+    for e in exclusive_events:
+        for m in e["markets"]:
+            for t in get_market_token_ids(m):
+                if t:
+                    index.setdefault(t, []).append(("event", e))
+    return index
+
+
+def reevaluate_tokens(token_ids, context):
+    """
+    Tepkisel değerlendirme: güncellenen token'ları içeren çift ve event'leri yeniden hesaplar.
+    Yalnızca önbellekteki kombinasyonlar kullanılır (sıcak yolda LLM çağrısı yok).
+    context["active"]: arbitrajı açık hedef anahtarları (tarama ile paylaşılır); yalnızca yeni açılan fırsatlar
+    kuyruğa/execution'a gider.
+    Döner: (değerlendirilen hedef sayısı, yeni fırsat sayısı).
+    """
+    index = context.get("index") or {}
+    active = context.setdefault("active", set())
+    pairs, events = {}, {}
+    for t in token_ids:
+        for kind, item in index.get(t, ()):
+            if kind == "pair":
+                pairs[id(item[1]), id(item[2])] = item
+            else:
+                events[id(item)] = item
+    combos = context["combos"]
+    known = []
+    for key, (e, ma, mb) in pairs.items():
+        if key not in combos:
+            ck = dependency_cache.make_key(ma.get("id"), mb.get("id"), ma["question"], mb["question"], context["model"], CACHE_VERSION)
+            cached = dependency_cache.get(ck)
+            if cached is None:
+                continue
+            combos[key] = cached
+        known.append((e, ma, mb))
+    screened = screen_pairs(known, combos)
+    found = 0
+    for e, ma, mb in known:
+        key = (id(ma), id(mb))
+        screen = screened.get(key)
+        if screen is None:
+            continue
+        if not screen[0]:
+            active.discard(("pair", ma.get("id"), mb.get("id")))
+            continue
+        if ("pair", ma.get("id"), mb.get("id")) in active:
+            # Açık fırsat zaten işlendi; kesin kontrol ve ekleme handle_opportunity'de kilit altında
+            continue
+        result = run_pair(
+            e, ma, mb, context["env"], context["cfg_dep"], context["cfg_risk"], context["cfg_l3"],
+            context["api_key"], context["model"], context["llm_cfg"],
+            context["min_margin"], context["min_liq"], context["ref_size"],
+            combinations=combos[key], screen=screen, active=active,
+        )
+        found += result is not None and not result.get("rejected")
+    for e in events.values():
+        prices = group_prices(e["markets"])
+        check = event_arbitrage(e, prices)
+        akey = ("event", e.get("id"))
+        if not check[0]:
+            active.discard(akey)
+            continue
+        if akey in active:
+            continue
+        result = run_event(
+            e, context["env"], context["min_margin"], context["min_liq"], context["ref_size"],
+            check=check, prices=prices, active=active,
+        )
+        found += result is not None and not result.get("rejected")
+    return len(known) + len(events), found
+
+
+def start_reactive(holder, debounce_sec=0.05):
+    """
+    Order book güncellemelerinde etkilenen çift/event'leri yeniden değerlendiren arka plan thread'i.
+    holder["context"]: son run_sweep(context=...) sonucu (her taramada değiştirilir).
+    Güncellemeler debounce_sec boyunca biriktirilir. holder["stats"]: değerlendirme sayısı ve gecikme.
+    Döner: stop (threading.Event).
+    """
+    from src import orderbook
+    dirty = set()
+    lock = threading.Lock()
+    wake = threading.Event()
+    stop = threading.Event()
+    stats = holder.setdefault("stats", {"batches": 0, "targets": 0, "found": 0, "last_latency_ms": 0.0})
+
+    def _on_update(tokens):
+        with lock:
+            if not dirty:
+                stats["_first_dirty"] = time.monotonic()
+            dirty.update(tokens)
+        wake.set()
+
+    def _loop():
+        while not stop.is_set():
+            if not wake.wait(1.0):
+                continue
+            wake.clear()
+            stop.wait(debounce_sec)
+            with lock:
+                tokens = set(dirty)
+                dirty.clear()
+                first = stats.pop("_first_dirty", None)
+            context = holder.get("context")
+            if not tokens or not context:
+                continue
+            try:
+                targets, found = reevaluate_tokens(tokens, context)
+            except Exception as e:
+                print("Tepkisel değerlendirme hatası:", str(e))
+                continue
+            stats["batches"] += 1
+            stats["targets"] += targets
+            stats["found"] += found
+            if first is not None:
+                stats["last_latency_ms"] = round((time.monotonic() - first) * 1000, 1)
+        orderbook.remove_listener(_on_update)
+
+    orderbook.add_listener(_on_update)
+    threading.Thread(target=_loop, daemon=True, name="reactive").start()
+    return stop
+
+
+def main():
+    with pipeline_lock() as acquired:
+        if not acquired:
+            print("Başka bir pipeline taraması sürüyor; bu çalıştırma atlandı.")
+            return
+        msg, _, _ = run_sweep()
     print("5. Metrikler:", get_metrics())
     print("OK: Pipeline tamamlandı.", msg)
 
@@ -1,45 +1,153 @@
 #!/usr/bin/env python3
 """
-Veri hattı demo: Alchemy son N blok (parçalı), opsiyonel WebSocket kısa dinleme.
-Config: config/data_pipeline.yaml, .env: POLYGON_RPC_URL, POLYMARKET_WS_URL
+Veri hattı demo: Alchemy son time_window_blocks blok (parçalı, akış), opsiyonel WebSocket kısa dinleme.
+Kesinleşmiş bloklar data/chain_logs.sqlite'ta önbelleklenir; tekrar çalıştırmada yalnızca yeni bloklar çekilir.
+OrderFilled/PositionSplit/PositionsMerge çözülüp data/event_store'a (sütunlu .npy segmentler) eklenir.
+DATA_PIPELINE_MODE=subscribe (veya alchemy.subscribe.enabled): pencere işlendikten sonra eth_subscribe ile canlı
+log'lar dinlenir; boşluk/yeniden bağlantıda son işlenen bloktan parçalı backfill yapılır. Durdurmak için Ctrl+C.
+Config: config/data_pipeline.yaml, .env: POLYGON_RPC_URL, POLYGON_WS_URL, POLYMARKET_WS_URL
 """
+import os
 import sys
+import threading
+import time
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
 from src.config_loader import load_env, load_yaml
-from src.alchemy_fetcher import fetch_logs_chunked
+from src.alchemy_fetcher import chain_heads, stream_logs
+from src import event_store
+from src.log_subscriber import subscribe_logs, ws_url_from_rpc
 
 
 def main():
     env = load_env()
     cfg = load_yaml("data_pipeline")
     rpc = env.get("POLYGON_RPC_URL") or env.get("ALCHEMY_POLYGON_RPC_URL")
-    contract = (cfg.get("alchemy") or {}).get("contract_address", "0x4D97DCd97eC945f40cF65F87097ACe5EA0476045")
-    max_blocks = (cfg.get("alchemy") or {}).get("max_blocks_per_request", 10)
+    alchemy_cfg = cfg.get("alchemy") or {}
+    # Conditional Tokens (split/merge) + CTF Exchange kontratları (OrderFilled)
+    contracts = [alchemy_cfg.get("contract_address", "0x4D97DCd97eC945f40cF65F87097ACe5EA0476045")]
+    contracts += list(alchemy_cfg.get("exchange_addresses") or [])
+    max_blocks = alchemy_cfg.get("max_blocks_per_request", 10)
 
     if not rpc:
         print("HATA: POLYGON_RPC_URL veya ALCHEMY_POLYGON_RPC_URL .env'de tanımlı değil.")
         sys.exit(1)
 
-    from web3 import Web3
-    w3 = Web3(Web3.HTTPProvider(rpc))
-    latest = w3.eth.block_number
-    from_block = max(0, latest - 29)
+    cache_cfg = alchemy_cfg.get("cache") or {}
+    reorg_depth = int(cache_cfg.get("reorg_depth_blocks", 128))
+    latest, finalized = chain_heads(rpc, reorg_depth)
+    window = int(cfg.get("time_window_blocks", 30))
+    from_block = max(0, latest - window + 1)
     to_block = latest
-    print("Alchemy: son 30 blok (parçalı, max", max_blocks, "blok/istek)")
-    print("Blok aralığı:", from_block, "-", to_block)
-
-    logs = fetch_logs_chunked(rpc, contract, from_block, to_block, max_blocks)
-    print("Toplam log:", len(logs))
-    for i, log in enumerate(logs[:5]):
-        print(f"  [{i}] block={log['blockNumber']} tx={log['transactionHash'].hex()[:16]}...")
-    if len(logs) > 5:
+    print(f"Alchemy: son {window} blok (parçalı, max {max_blocks} blok/istek)")
+    print("Blok aralığı:", from_block, "-", to_block, "| kesinleşmiş:", finalized)
+
+    t0 = time.monotonic()
+    total = 0
+    shown = 0
+    fetch_kwargs = {
+        "max_blocks_per_request": max_blocks,
+        "workers": int(alchemy_cfg.get("workers", 8)),
+        "rate_limit_rpm": alchemy_cfg.get("rate_limit_rpm"),
+        "max_retries": int(alchemy_cfg.get("max_retries", 5)),
+        "adaptive": bool(alchemy_cfg.get("adaptive_chunks", False)),
+        "max_blocks_limit": int(alchemy_cfg.get("max_blocks_limit", 2000)),
+        "batch_size": int(alchemy_cfg.get("batch_size", 10)),
+    }
+    chunks = stream_logs(
+        rpc, contracts, from_block, to_block, finalized_block=finalized,
+        use_cache=bool(cache_cfg.get("enabled", True)), reorg_depth=reorg_depth, **fetch_kwargs,
+    )
+    store_cfg = cfg.get("event_store") or {}
+    stored = {}
+    if store_cfg.get("enabled", True):
+        chunks = event_store.record(
+            chunks, finalized, events=alchemy_cfg.get("events"),
+            flush_rows=int(store_cfg.get("flush_rows", event_store.DEFAULT_FLUSH_ROWS)),
+            partition_blocks=int(store_cfg.get("partition_blocks", event_store.DEFAULT_PARTITION_BLOCKS)),
+            stats=stored,
+        )
+    for _, _, logs in chunks:
+        total += len(logs)
+        for log in logs[:max(0, 5 - shown)]:
+            print(f"  [{shown}] block={log['blockNumber']} tx={str(log['transactionHash'])[:18]}...")
+            shown += 1
+    if total > 5:
         print("  ...")
+    print(f"Toplam log: {total} ({time.monotonic() - t0:.1f} sn)")
+    if store_cfg.get("enabled", True):
+        print("Event deposu (yeni satır):", ", ".join(f"{k}={v}" for k, v in sorted(stored.items())) or "yok")
+        fills = event_store.load_events("OrderFilled", from_block, to_block, columns=["maker_amount", "taker_amount"])
+        if len(fills["block"]):
+            print(f"OrderFilled: {len(fills['block'])} dolum, maker hacmi {fills['maker_amount'].sum() / 1e6:,.2f}")
     print("OK: Veri hattı (Alchemy parçalı) tamamlandı.")
 
+    sub_cfg = alchemy_cfg.get("subscribe") or {}
+    mode = os.environ.get("DATA_PIPELINE_MODE", "subscribe" if sub_cfg.get("enabled") else "window").lower()
+    if mode == "subscribe":
+        ws_url = env.get("POLYGON_WS_URL") or env.get("ALCHEMY_POLYGON_WS_URL") or ws_url_from_rpc(rpc)
+        if not ws_url:
+            print("HATA: Canlı mod için POLYGON_WS_URL .env'de tanımlı değil.")
+            sys.exit(1)
+        # Pencerede yalnızca kesinleşmiş bloklar depoya yazıldı; canlı akış kesinleşmemiş kuyruğu yeniden kapsar
+        follow(
+            ws_url, rpc, contracts, min(to_block, finalized) + 1, alchemy_cfg, store_cfg, reorg_depth, fetch_kwargs,
+            finalized=finalized,
+        )
+
+
+def follow(ws_url, rpc, contracts, from_block, alchemy_cfg, store_cfg, reorg_depth, fetch_kwargs, finalized=None):
+    """
+    Canlı mod: eth_subscribe log akışı; event'ler zincirin "finalized" bloğu geçince depoya yazılır (chain_heads,
+    finalized_poll_sec aralıkla; etiket yoksa latest - reorg_depth). Gecikme: kesinleşme süresi + en fazla flush_sec.
+    """
+    sub_cfg = alchemy_cfg.get("subscribe") or {}
+    stop = threading.Event()
+    status = {}
+    poll_sec = float(sub_cfg.get("finalized_poll_sec", 5))
+    heads = {"finalized": finalized if finalized is not None else from_block - 1, "at": float("-inf")}
+
+    def current_finalized():
+        # record her parçada çağırır; RPC en fazla poll_sec'te bir, hata olursa son bilinen değer kullanılır
+        now = time.monotonic()
+        if now - heads["at"] >= poll_sec:
+            heads["at"] = now
+            try:
+                heads["finalized"] = max(heads["finalized"], chain_heads(rpc, reorg_depth)[1])
+            except Exception:
+                pass
+        return heads["finalized"]
+
+    chunks = subscribe_logs(
+        ws_url, rpc, contracts, from_block, stop=stop, status=status,
+        confirm_blocks=int(sub_cfg.get("confirm_blocks", 1)), stall_sec=float(sub_cfg.get("stall_sec", 30)),
+        **fetch_kwargs,
+    )
+    stored = {}
+    if store_cfg.get("enabled", True):
+        chunks = event_store.record(
+            chunks, current_finalized, events=alchemy_cfg.get("events"),
+            flush_rows=int(store_cfg.get("flush_rows", event_store.DEFAULT_FLUSH_ROWS)),
+            partition_blocks=int(store_cfg.get("partition_blocks", event_store.DEFAULT_PARTITION_BLOCKS)),
+            stats=stored, flush_sec=float(sub_cfg.get("flush_sec", 60)),
+        )
+    print(f"Canlı mod: blok {from_block} sonrası dinleniyor (Ctrl+C ile dur).")
+    try:
+        for start, end, logs in chunks:
+            print(
+                f"  blok {start}-{end}: {len(logs)} log | head={status.get('head')} backfill={status.get('backfills')}"
+                f" reorg={status.get('reorgs')} yeniden_bağlantı={status.get('reconnects')}"
+            )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        chunks.close()
+    print("Canlı mod durdu. Event deposu (yeni satır):", ", ".join(f"{k}={v}" for k, v in sorted(stored.items())) or "yok")
+
 
 if __name__ == "__main__":
     main()
@@ -2,11 +2,17 @@
 """
 Arbitraj pipeline'ı periyodik çalıştırır (hafif daemon).
 PIPELINE_INTERVAL_SEC ortam değişkeni veya varsayılan 60 saniye.
-Durdurmak için Ctrl+C.
+PIPELINE_LOOP_MODE: "inprocess" (varsayılan) taramaları tek süreçte çalıştırır — import'lar, HTTP oturumları
+ve önbellekler turlar arasında korunur; "reactive" buna ek olarak canlı order book güncellemelerinde yalnızca
+etkilenen çift/event'leri anında yeniden değerlendirir (tam tarama indeksi ve kombinasyonları tazeler);
+"subprocess" her turda yeni Python süreci başlatır (eski davranış).
+Durdurmak için Ctrl+C veya SIGTERM (süren tarama bitince çıkar).
 """
 import os
+import signal
 import subprocess
 import sys
+import threading
 import time
 from pathlib import Path
 
@@ -16,12 +22,12 @@ PYTHON = ROOT / ".venv" / "bin" / "python"
 if not PYTHON.exists():
     PYTHON = sys.executable
 
-def main():
-    interval = int(os.environ.get("PIPELINE_INTERVAL_SEC", "60"))
+
+def run_subprocess_loop(interval):
+    """Her turda run_arbitrage_pipeline.py'yi ayrı süreçte çalıştırır."""
     env = os.environ.copy()
     env["PYTHONPATH"] = str(ROOT) + (os.environ.get("PYTHONPATH", "") and ":" + os.environ["PYTHONPATH"] or "")
     env["POLYMARKET_ROOT"] = str(ROOT)
-    print(f"Pipeline döngü başladı (aralık: {interval} sn). Durdurmak için Ctrl+C.")
     while True:
         try:
             subprocess.run([str(PYTHON), str(SCRIPT)], cwd=str(ROOT), env=env, check=False)
@@ -29,6 +35,70 @@ def main():
             print(f"Hata: {e}")
         time.sleep(interval)
 
+
+def run_inprocess_loop(interval, reactive=False):
+    """
+    Taramaları aynı süreçte çalıştırır. Aralık tarama başlangıçları arasıdır (süre düşülür).
+    Çakışma: pipeline_lock alınamazsa (ör. cron taraması sürüyor) tur atlanır.
+    reactive: order book güncellemelerinde pipeline.start_reactive ile anında değerlendirme.
+    """
+    sys.path.insert(0, str(ROOT))
+    sys.path.insert(0, str(ROOT / "scripts"))
+    import run_arbitrage_pipeline as pipeline
+    from src.monitoring import record_pipeline_run
+
+    stop = threading.Event()
+
+    def _request_stop(signum, frame):
+        if stop.is_set():
+            raise KeyboardInterrupt
+        print("\nDurdurma isteği alındı; süren tarama bitince çıkılacak (tekrar Ctrl+C: hemen çık).")
+        stop.set()
+
+    signal.signal(signal.SIGINT, _request_stop)
+    signal.signal(signal.SIGTERM, _request_stop)
+
+    holder = {"context": None}
+    reactive_stop = pipeline.start_reactive(holder) if reactive else None
+    sweep_no = 0
+    while not stop.is_set():
+        started = time.monotonic()
+        sweep_no += 1
+        with pipeline.pipeline_lock() as acquired:
+            if not acquired:
+                print(f"[#{sweep_no}] Başka bir tarama sürüyor; tur atlandı.")
+            else:
+                try:
+                    # Açık fırsat kümesi taramalar ve tepkisel thread arasında korunur (aynı fırsat tekrar işlenmez)
+                    context = {"reactive": reactive, "active": (holder.get("context") or {}).get("active", set())}
+                    msg, _, duration = pipeline.run_sweep(context=context if reactive else None)
+                    if reactive:
+                        holder["context"] = context
+                        st = holder.get("stats") or {}
+                        msg += (
+                            f" | tepkisel: değerlendirme={st.get('batches', 0)} hedef={st.get('targets', 0)}"
+                            f" fırsat={st.get('found', 0)} son_gecikme={st.get('last_latency_ms', 0)}ms"
+                            f" token={len(context.get('index') or {})}"
+                        )
+                    print(f"[#{sweep_no}] {duration:.1f} sn — {msg}")
+                except Exception as e:
+                    record_pipeline_run("error", str(e))
+                    print(f"[#{sweep_no}] Hata: {e}")
+        stop.wait(max(0.0, interval - (time.monotonic() - started)))
+    if reactive_stop is not None:
+        reactive_stop.set()
+
+
+def main():
+    interval = int(os.environ.get("PIPELINE_INTERVAL_SEC", "60"))
+    mode = os.environ.get("PIPELINE_LOOP_MODE", "inprocess").lower()
+    print(f"Pipeline döngü başladı (aralık: {interval} sn, mod: {mode}). Durdurmak için Ctrl+C.")
+    if mode == "subprocess":
+        run_subprocess_loop(interval)
+    else:
+        run_inprocess_loop(interval, reactive=mode == "reactive")
+    print("Döngü durduruldu.")
+
 if __name__ == "__main__":
     try:
         main()
@@ -7,7 +7,7 @@ ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
 from src.config_loader import load_env, load_yaml
-from src.alerts import check_alerts
+from src.alerts import evaluate_thresholds
 from src.alert_email import send_alert_email
 
 def main():
@@ -28,7 +28,8 @@ def main():
         "executions_count": 5,
     }
     print("\nTest metrikleri (eşik aşan):", metrics)
-    messages = check_alerts(metrics, config)
+    # Durumlu motor (cooldown/digest) atlanır; e-posta aşağıda doğrudan gönderilir
+    messages = [msg for _, _, msg in evaluate_thresholds(metrics, config)]
     print("Tetiklenen uyarılar:", len(messages))
     for m in messages:
         print(" -", m)
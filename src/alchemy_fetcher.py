@@ -1,29 +1,356 @@
-"""Alchemy Polygon: eth_getLogs parçalı çekme (Free plan: 10 blok/istek)."""
+"""
+Alchemy Polygon: eth_getLogs parçalı çekme (Free plan: 10 blok/istek).
+Parçalar JSON-RPC batch istekleri olarak (batch_size çağrı / HTTP isteği) paylaşılan keep-alive oturum
+üzerinden eşzamanlı gönderilir; token bucket alchemy.rate_limit_rpm'i çağrı başına sayar (batch = batch_size jeton). Batch yanıtı
+id ile çağrılara ayrıştırılır; başarısız çağrılar tek tek üstel geri çekilmeyle tekrar denenir. adaptive açıksa
+sağlayıcı izin verdikçe parça boyu büyütülür; aralık/yanıt boyutu hatasında parça ikiye bölünür ve boyut
+bilinen en büyük başarılı değere sabitlenir; hız sınırı hataları (429/-32005) bölünmez, geri çekilmeyle beklenir. iter_logs_chunked parçaları blok sırasıyla akış olarak üretir;
+stream_logs bunu data/chain_logs.sqlite önbelleğiyle (src/log_cache) birleştirir: kesinleşmiş bloklar bir kez
+çekilir, sonraki çalıştırmalarda yalnızca yeni bloklar ve reorg'a açık kuyruk istenir.
+Log'lar ham JSON-RPC biçimindedir: blockNumber/logIndex/transactionIndex int, hash/topics/data hex str.
+"""
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 import sys
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
+DEFAULT_WORKERS = 8
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_MAX_RETRIES = 5
+TIMEOUT = 30
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 16
+# Adaptif büyütmede üst sınır (sağlayıcı izin verse bile)
+MAX_BLOCKS_LIMIT = 2000
+POOL_SIZE = 16
+# "finalized" etiketi desteklenmezse kesinleşmiş kabul edilen derinlik (Polygon reorg payı)
+DEFAULT_REORG_DEPTH = 128
+# Sağlayıcının "aralık çok büyük / yanıt çok büyük" hatalarını tanımak için (Alchemy, Infura, genel RPC)
+_RANGE_ERROR_MARKERS = ("block range", "range is too large", "response size exceeded", "query returned more than")
+# Hız sınırı hataları (HTTP 429, JSON-RPC 429/-32005, Alchemy CU/s): bölünmez, geri çekilmeyle yeniden denenir
+_RATE_LIMIT_CODES = (429, -32005)
+_RATE_LIMIT_MARKERS = ("429", "too many requests", "rate limit", "compute units per second", "request rate exceeded")
+_INT_FIELDS = ("blockNumber", "logIndex", "transactionIndex")
 
-def fetch_logs_chunked(rpc_url, contract_address, from_block, to_block, max_blocks_per_request=10):
-    """
-    from_block..to_block aralığını max_blocks_per_request'lık parçalara bölüp get_logs çeker.
-    Free plan: 10 blok/istek. Yields (log, ...) yerine tüm log listesini döner.
-    """
-    from web3 import Web3
-    w3 = Web3(Web3.HTTPProvider(rpc_url))
-    if not w3.is_connected():
-        raise RuntimeError("Polygon RPC'ye bağlanılamadı")
-    contract = Web3.to_checksum_address(contract_address)
-    all_logs = []
-    start = from_block
-    while start <= to_block:
-        end = min(start + max_blocks_per_request - 1, to_block)
-        logs = w3.eth.get_logs({
-            "address": contract,
-            "fromBlock": start,
-            "toBlock": end,
-        })
-        all_logs.extend(logs)
-        start = end + 1
-    return all_logs
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+_IDS = itertools.count(1)
+
+
+class RpcError(Exception):
+    """JSON-RPC çağrı hatası (batch içindeki tek çağrı); code: JSON-RPC hata kodu (varsa)."""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+def _rpc_error(err):
+    err = err if isinstance(err, dict) else {"message": str(err)}
+    return RpcError(err.get("message") or str(err), err.get("code"))
+
+
+class BatchUnsupported(RpcError):
+    """Uç nokta batch isteğine tek (liste olmayan) yanıt döndü; çağrılar tek tek gönderilmeli."""
+
+
+def _session():
+    """Süreç boyunca paylaşılan keep-alive oturum."""
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                s = requests.Session()
+                s.headers.update({"Content-Type": "application/json", "User-Agent": "Polymarket-Arbitrage/1.0"})
+                s.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE))
+                s.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE))
+                _SESSION = s
+    return _SESSION
+
+
+def rpc_batch(rpc_url, calls, timeout=TIMEOUT):
+    """
+    calls: [(method, params), ...] tek JSON-RPC batch isteği olarak gönderilir.
+    Döner: çağrı sırasıyla sonuç veya RpcError listesi (çağrı bazında hata). HTTP hatası istisna olarak yükselir.
+    """
+    ids = [next(_IDS) for _ in calls]
+    payload = [{"jsonrpc": "2.0", "id": i, "method": m, "params": p} for i, (m, p) in zip(ids, calls)]
+    r = _session().post(rpc_url, json=payload, timeout=timeout)
+    r.raise_for_status()
+    body = r.json()
+    if isinstance(body, dict) and len(calls) == 1 and ("result" in body or "error" in body):
+        # Bazı uç noktalar tek elemanlı batch'e tekil yanıt döner
+        body = [dict(body, id=ids[0])]
+    if not isinstance(body, list):
+        # İstek düzeyinde hata (ör. rate limit) veya batch desteklenmiyor: tüm çağrılar aynı hatayı alır
+        err = body.get("error") if isinstance(body, dict) else None
+        if err:
+            return [_rpc_error(err)] * len(calls)
+        return [BatchUnsupported("batch yanıtı liste değil")] * len(calls)
+    by_id = {item.get("id"): item for item in body if isinstance(item, dict)}
+    out = []
+    for i in ids:
+        item = by_id.get(i)
+        if item is None:
+            out.append(RpcError("batch yanıtında çağrı eksik"))
+        elif item.get("error") is not None:
+            out.append(_rpc_error(item["error"]))
+        else:
+            out.append(item.get("result"))
+    return out
+
+
+def _addresses(contract_address):
+    """Tek adres veya adres listesi → küçük harf, sıralı, tekrarsız adres listesi."""
+    if isinstance(contract_address, str):
+        contract_address = [contract_address]
+    return sorted({str(a).lower() for a in contract_address})
+
+
+def _address_filter(addresses):
+    """eth_getLogs/eth_subscribe "address" filtresi: tek adres str, birden çoğu liste."""
+    return addresses[0] if len(addresses) == 1 else list(addresses)
+
+
+def _normalize_log(log):
+    for k in _INT_FIELDS:
+        v = log.get(k)
+        if isinstance(v, str):
+            log[k] = int(v, 16)
+    return log
+
+
+def make_rate_limiter(rate_limit_rpm, burst=None):
+    """
+    Token bucket: dakikada rate_limit_rpm jeton, en fazla `burst` birikmiş jeton.
+    Döner: acquire(cost=1) — cost jeton yoksa gerekli süre kadar bekler (thread-safe; cost kapasiteyle sınırlanır).
+    rpm <= 0 ise sınırsız.
+    """
+    if not rate_limit_rpm or rate_limit_rpm <= 0:
+        return lambda cost=1: None
+    rate = float(rate_limit_rpm) / 60.0
+    capacity = float(burst or max(1.0, rate))
+    state = {"tokens": capacity, "ts": time.monotonic()}
+    lock = threading.Lock()
+
+    def acquire(cost=1):
+        cost = min(float(cost), capacity)
+        while True:
+            with lock:
+                now = time.monotonic()
+                state["tokens"] = min(capacity, state["tokens"] + (now - state["ts"]) * rate)
+                state["ts"] = now
+                if state["tokens"] >= cost:
+                    state["tokens"] -= cost
+                    return
+                wait_sec = (cost - state["tokens"]) / rate
+            time.sleep(wait_sec)
+    return acquire
+
+
+def _is_range_error(exc):
+    msg = str(exc).lower()
+    return any(marker in msg for marker in _RANGE_ERROR_MARKERS)
+
+
+def _is_rate_limited(exc):
+    """Hız sınırı hatası mı (aralık hatası değil); -32005 Infura'da aralık hatası için de kullanılır."""
+    if _is_range_error(exc):
+        return False
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) == 429 or getattr(exc, "code", None) in _RATE_LIMIT_CODES:
+        return True
+    msg = str(exc).lower()
+    return any(marker in msg for marker in _RATE_LIMIT_MARKERS)
+
+
+def _fetch_batch(rpc_url, address, ranges, acquire, delay_sec=0.0, max_retries=DEFAULT_MAX_RETRIES):
+    """
+    ranges: [(start, end, attempt), ...] tek batch isteği; her gönderim çağrı sayısı kadar jeton harcar. HTTP
+    hatasında üstel geri çekilmeyle tüm batch max_retries kez yeniden gönderilir. Döner: çağrı sırasıyla log
+    listesi veya RpcError.
+    """
+    if delay_sec > 0:
+        time.sleep(delay_sec)
+    calls = [("eth_getLogs", [{"address": address, "fromBlock": hex(s), "toBlock": hex(e)}]) for s, e, _ in ranges]
+    for attempt in range(max_retries + 1):
+        acquire(len(calls))
+        try:
+            results = rpc_batch(rpc_url, calls)
+            break
+        except Exception:
+            if attempt == max_retries:
+                raise
+            time.sleep(_backoff(attempt))
+    return [r if isinstance(r, Exception) else [_normalize_log(log) for log in r or []] for r in results]
+
+
+def _backoff(attempt):
+    return min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * (2 ** attempt)) * (0.5 + random.random() / 2)
+
+
+def iter_logs_chunked(rpc_url, contract_address, from_block, to_block, max_blocks_per_request=10,
+                      workers=DEFAULT_WORKERS, rate_limit_rpm=None, max_retries=DEFAULT_MAX_RETRIES, adaptive=False,
+                      max_blocks_limit=MAX_BLOCKS_LIMIT, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    contract_address: tek adres veya adres listesi (tek eth_getLogs filtresinde).
+    from_block..to_block aralığını max_blocks_per_request'lık parçalara böler; batch_size parça tek JSON-RPC
+    batch isteğinde, workers istek eşzamanlı gönderilir. rate_limit_rpm: eth_getLogs çağrısı başına token bucket
+    (None/0: sınırsız; batch isteği batch_size jeton harcar). Başarısız çağrılar (aralık hatası hariç) tek tek
+    max_retries kez yeniden denenir.
+    adaptive: başarılı parçalardan sonra boyutu ikiye katla (max_blocks_limit'e kadar), aralık hatasında böl ve küçült.
+    Üretir: (start, end, logs) — parçalar tamamlandıkça blok sırasıyla; sıradaki parçayı bekleyen tampon sınırlıdır.
+    """
+    address = _address_filter(_addresses(contract_address))
+    # Kapasite en az bir tam batch: dakikalık oran düşük olsa da batch bölünmeden gönderilebilir
+    acquire = make_rate_limiter(rate_limit_rpm, burst=max(workers, int(batch_size)))
+    workers = max(1, workers)
+    state = {
+        "next": from_block,
+        "size": max(1, int(max_blocks_per_request)),
+        # Büyütme tavanı: aralık hatası görülünce bilinen en büyük başarılı boyuta iner
+        "ceiling": max(1, int(max_blocks_limit)) if adaptive else max(1, int(max_blocks_per_request)),
+        "largest_ok": 0,
+        "batch_size": max(1, int(batch_size)),
+    }
+    retry_ranges = deque()
+    # Sırası gelmemiş tamamlanmış parçalar: start -> (end, logs)
+    results = {}
+    emit_from = from_block
+
+    def next_range():
+        if retry_ranges:
+            return retry_ranges.popleft()
+        if state["next"] > to_block:
+            return None
+        start = state["next"]
+        end = min(start + state["size"] - 1, to_block)
+        state["next"] = end + 1
+        return start, end, 0
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="getlogs")
+    pending = {}
+    try:
+        while True:
+            # Tüketici yavaşsa ileri çekmeyi durdur; sıradaki parçayı tutan yeniden denemeler her zaman gönderilir
+            while len(pending) < workers and (retry_ranges or len(results) < workers * state["batch_size"] * 4):
+                batch = []
+                while len(batch) < state["batch_size"]:
+                    rng = next_range()
+                    if rng is None:
+                        break
+                    batch.append(rng)
+                if not batch:
+                    break
+                # Yeniden denenen çağrı içeren batch, en yüksek deneme sayısına göre bekletilir
+                delay = max((_backoff(a - 1) for _, _, a in batch if a > 0), default=0.0)
+                pending[pool.submit(_fetch_batch, rpc_url, address, batch, acquire, delay, max_retries)] = batch
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                batch = pending.pop(fut)
+                outcomes = fut.result()
+                if len(batch) > 1 and any(isinstance(o, BatchUnsupported) for o in outcomes):
+                    state["batch_size"] = 1
+                    retry_ranges.extendleft(reversed(batch))
+                    continue
+                for (start, end, attempt), outcome in zip(batch, outcomes):
+                    span = end - start + 1
+                    if not isinstance(outcome, Exception):
+                        results[start] = (end, outcome)
+                        state["largest_ok"] = max(state["largest_ok"], span)
+                        if adaptive and span >= state["size"] and state["size"] * 2 <= state["ceiling"]:
+                            state["size"] *= 2
+                        continue
+                    if _is_rate_limited(outcome) and attempt < max_retries:
+                        # Hız sınırı: parça bölünmez, deneme sayısına göre geri çekilerek yeniden gönderilir
+                        retry_ranges.append((start, end, attempt + 1))
+                    elif _is_range_error(outcome) and span > 1:
+                        mid = start + span // 2 - 1
+                        retry_ranges.extend([(start, mid, attempt), (mid + 1, end, attempt)])
+                        state["ceiling"] = max(1, min(state["ceiling"], max(state["largest_ok"], span // 2)))
+                        state["size"] = min(state["size"], state["ceiling"])
+                    elif attempt < max_retries:
+                        retry_ranges.append((start, end, attempt + 1))
+                    else:
+                        raise RuntimeError(f"eth_getLogs {start}-{end} başarısız: {outcome}")
+            while emit_from in results:
+                end, logs = results.pop(emit_from)
+                yield emit_from, end, logs
+                emit_from = end + 1
+    finally:
+        # Hata veya tüketicinin erken kapatması: bekleyen istekler iptal edilir, süren istekler beklenmez
+        for fut in pending:
+            fut.cancel()
+        pool.shutdown(wait=False)
+
+
+def fetch_logs_chunked(rpc_url, contract_address, from_block, to_block, max_blocks_per_request=10, **kwargs):
+    """iter_logs_chunked ile aynı; tüm log'ları blok sırasıyla tek liste olarak döner."""
+    return [
+        log for _, _, logs in iter_logs_chunked(rpc_url, contract_address, from_block, to_block, max_blocks_per_request, **kwargs)
+        for log in logs
+    ]
+
+
+def chain_heads(rpc_url, reorg_depth=DEFAULT_REORG_DEPTH):
+    """
+    (latest, finalized) blok numaraları tek batch isteğiyle. Uç nokta "finalized" etiketini desteklemiyorsa
+    finalized = latest - reorg_depth.
+    """
+    latest, block = rpc_batch(rpc_url, [("eth_blockNumber", []), ("eth_getBlockByNumber", ["finalized", False])])
+    if isinstance(latest, Exception):
+        raise latest
+    latest = int(latest, 16)
+    if isinstance(block, dict) and block.get("number"):
+        return latest, min(latest, int(block["number"], 16))
+    return latest, max(0, latest - int(reorg_depth))
+
+
+def stream_logs(rpc_url, contract_address, from_block, to_block, finalized_block=None, use_cache=True,
+                reorg_depth=DEFAULT_REORG_DEPTH, **fetch_kwargs):
+    """
+    Önbellekli akış: (start, end, logs) blok sırasıyla; contract_address tek adres veya liste. Önbellek kapsama
+    aralıklarındaki bloklar data/chain_logs.sqlite'tan okunur; yalnızca aralar (boşluklar) ve reorg'a açık kuyruk
+    (finalized_block sonrası) çekilir. Çekilen kesinleşmiş parçalar önbelleğe yazılır ve kapsamaya eklenir (komşu aralıklarla birleşir).
+    finalized_block None ise chain_heads ile bulunur. fetch_kwargs: iter_logs_chunked parametreleri.
+    """
+    addresses = _addresses(contract_address)
+    if not use_cache:
+        yield from iter_logs_chunked(rpc_url, addresses, from_block, to_block, **fetch_kwargs)
+        return
+    from src import log_cache
+    if finalized_block is None:
+        _, finalized_block = chain_heads(rpc_url, reorg_depth)
+    # Önbellek anahtarı adres kümesidir: kümeye adres eklenince eksik log'lu eski kapsama kullanılmaz
+    address = ",".join(addresses)
+
+    def fetch_gap(lo, hi):
+        for start, end, logs in iter_logs_chunked(rpc_url, addresses, lo, hi, **fetch_kwargs):
+            if start <= finalized_block:
+                # Kesinleşmiş kısım önbelleğe; finalized sonrası kuyruk yazılmaz
+                top = min(end, finalized_block)
+                log_cache.store(address, [log for log in logs if int(log["blockNumber"]) <= top], coverage=(start, top))
+            yield start, end, logs
+
+    pos = from_block
+    for lo, hi in log_cache.get_coverage(address):
+        if hi < pos:
+            continue
+        if lo > to_block:
+            break
+        if lo > pos:
+            yield from fetch_gap(pos, lo - 1)
+        yield from log_cache.iter_cached(address, max(pos, lo), min(hi, to_block))
+        pos = min(hi, to_block) + 1
+    if pos <= to_block:
+        yield from fetch_gap(pos, to_block)
@@ -1,5 +1,12 @@
-"""Alert kontrolü: drawdown, execution rate eşikleri (config/monitoring.yaml). Uyarı geçmişi: data/alert_history.json."""
+"""
+Alert kontrolü: drawdown, execution rate eşikleri (config/monitoring.yaml). Uyarı geçmişi: data/alert_history.json.
+Durumlu motor: kural başına dedup anahtarı, cooldown ve histerezis (data/alert_state.json); e-postalar arka plan
+kuyruğunda toplanıp özet (digest) olarak gönderilir — çağıran taraf ağı beklemez.
+"""
+import atexit
 import json
+import queue
+import threading
 import time
 import sys
 from pathlib import Path
@@ -7,7 +14,18 @@ ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
 ALERT_HISTORY_PATH = ROOT / "data" / "alert_history.json"
+ALERT_STATE_PATH = ROOT / "data" / "alert_state.json"
 MAX_ALERT_HISTORY = 200
+DEFAULT_COOLDOWN_SEC = 1800
+DEFAULT_DIGEST_WINDOW_SEC = 30
+# Uyarı temizlenmesi için eşiğin ne kadar geri geçilmesi gerektiği (yüzde puan)
+DEFAULT_HYSTERESIS = {"drawdown_pct": 2.0, "execution_rate_lt": 5.0}
+EXIT_DRAIN_TIMEOUT_SEC = 20
+
+_STATE_LOCK = threading.Lock()
+_QUEUE = queue.Queue()
+_WORKER = {"thread": None, "digest_window_sec": DEFAULT_DIGEST_WINDOW_SEC}
+_WORKER_LOCK = threading.Lock()
 
 
 def _append_alert_history(metric_key, threshold, message):
@@ -26,10 +44,11 @@ def _append_alert_history(metric_key, threshold, message):
         pass
 
 
-def check_alerts(metrics, config=None):
+def evaluate_thresholds(metrics, config=None):
     """
+    Saf eşik kontrolü (yan etkisiz; dashboard bunu kullanır).
     config: monitoring.yaml içeriği (dict) veya None (varsayılan eşikler).
-    Döner: list of str (uyarı mesajları). Tetiklenen uyarıları alert_history'e yazar.
+    Döner: list of (metric_key, threshold, message).
     """
     if config is None:
         config = {}
@@ -38,24 +57,149 @@ def check_alerts(metrics, config=None):
     drawdown_pct = metrics.get("drawdown_pct") or 0
     drawdown_gt = alerts_config.get("drawdown_pct_gt", 15)
     if drawdown_gt and drawdown_pct > drawdown_gt:
-        msg = f"Drawdown %{drawdown_pct:.1f} > %{drawdown_gt} eşiği"
-        out.append(msg)
-        _append_alert_history("drawdown_pct", drawdown_gt, msg)
+        out.append(("drawdown_pct", drawdown_gt, f"Drawdown %{drawdown_pct:.1f} > %{drawdown_gt} eşiği"))
     execution_rate = metrics.get("execution_success_rate") or 0
     rate_lt = alerts_config.get("execution_rate_lt", 30)
     if rate_lt is not None and execution_rate < rate_lt and metrics.get("executions_count", 0) > 0:
-        msg = f"Execution başarı oranı %{execution_rate:.1f} < %{rate_lt} eşiği"
-        out.append(msg)
-        _append_alert_history("execution_rate_lt", rate_lt, msg)
-    if out:
-        try:
-            from src.alert_email import send_alert_email
-            send_alert_email(out)  # (success, detail) döner; hata sessiz kalır
-        except Exception:
-            pass
+        out.append(("execution_rate_lt", rate_lt, f"Execution başarı oranı %{execution_rate:.1f} < %{rate_lt} eşiği"))
     return out
 
 
+def _load_state():
+    try:
+        if ALERT_STATE_PATH.exists():
+            with open(ALERT_STATE_PATH) as f:
+                state = json.load(f)
+            return state if isinstance(state, dict) else {}
+    except Exception:
+        pass
+    return {}
+
+
+def _save_state(state):
+    try:
+        ALERT_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ALERT_STATE_PATH.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=0, ensure_ascii=False)
+        tmp.replace(ALERT_STATE_PATH)
+    except Exception:
+        pass
+
+
+def _dedup_key(metric_key, threshold):
+    return f"{metric_key}:{threshold}"
+
+
+def _is_cleared(metric_key, threshold, metrics, band):
+    """Histerezis: aktif uyarı ancak değer eşiğin `band` kadar gerisine dönünce temizlenir."""
+    if metric_key == "drawdown_pct":
+        return (metrics.get("drawdown_pct") or 0) <= threshold - band
+    if metric_key == "execution_rate_lt":
+        return (metrics.get("execution_success_rate") or 0) >= threshold + band or not metrics.get("executions_count")
+    return True
+
+
+def _worker_loop():
+    """Kuyruktan ilk mesajı bekler, digest penceresi boyunca gelenleri toplar ve tek e-posta gönderir."""
+    from src.alert_email import send_alert_email
+    while True:
+        item = _QUEUE.get()
+        batch, done = [], []
+        while True:
+            done.append(item)
+            if item is not None:
+                batch.extend(m for m in item if m not in batch)
+            if item is None:
+                break
+            try:
+                item = _QUEUE.get(timeout=_WORKER["digest_window_sec"])
+            except queue.Empty:
+                break
+        if batch:
+            try:
+                send_alert_email(batch)  # (success, detail) döner; hata sessiz kalır
+            except Exception:
+                pass
+        for _ in done:
+            _QUEUE.task_done()
+
+
+def _enqueue(messages, digest_window_sec):
+    with _WORKER_LOCK:
+        _WORKER["digest_window_sec"] = digest_window_sec
+        if _WORKER["thread"] is None or not _WORKER["thread"].is_alive():
+            _WORKER["thread"] = threading.Thread(target=_worker_loop, name="alert-email", daemon=True)
+            _WORKER["thread"].start()
+    _QUEUE.put(list(messages))
+
+
+def flush_alert_queue(timeout=EXIT_DRAIN_TIMEOUT_SEC):
+    """Bekleyen digest'i hemen gönderir ve kuyruk boşalana kadar (en fazla timeout sn) bekler. Boşaldıysa True."""
+    thread = _WORKER["thread"]
+    if thread is None or not thread.is_alive():
+        return _QUEUE.unfinished_tasks == 0
+    _QUEUE.put(None)  # digest penceresini erken kapatır
+    deadline = time.monotonic() + timeout
+    while _QUEUE.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return _QUEUE.unfinished_tasks == 0
+
+
+atexit.register(flush_alert_queue)
+
+
+def check_alerts(metrics, config=None):
+    """
+    config: monitoring.yaml içeriği (dict) veya None (varsayılan eşikler).
+    Döner: list of str (şu an eşiği aşan tüm uyarı mesajları).
+    Durumlu: her kural (dedup anahtarı metrik:eşik) ilk tetiklendiğinde ve aktif kaldığı sürece cooldown_sec
+    dolduğunda bir kez alert_history'e yazılır ve e-posta kuyruğuna eklenir; değer histerezis bandının
+    gerisine dönünce kural temizlenir. E-posta arka planda digest olarak gönderilir (bloklamaz).
+    Yalnızca zamanlanmış değerlendiriciden (monitoring.evaluate_alerts) çağrılmalı.
+    """
+    if config is None:
+        config = {}
+    alerts_config = config.get("alerts") or {}
+    cooldown = float(alerts_config.get("cooldown_sec", DEFAULT_COOLDOWN_SEC))
+    digest_window = float(alerts_config.get("digest_window_sec", DEFAULT_DIGEST_WINDOW_SEC))
+    hysteresis = dict(DEFAULT_HYSTERESIS)
+    hysteresis.update(alerts_config.get("hysteresis") or {})
+    triggered = evaluate_thresholds(metrics, config)
+    now = time.time()
+    to_send = []
+    with _STATE_LOCK:
+        state = _load_state()
+        changed = False
+        triggered_keys = set()
+        for metric_key, threshold, msg in triggered:
+            key = _dedup_key(metric_key, threshold)
+            triggered_keys.add(key)
+            rule = state.get(key) or {}
+            if rule.get("active") and now - float(rule.get("last_sent", 0)) < cooldown:
+                continue
+            _append_alert_history(metric_key, threshold, msg)
+            to_send.append(msg)
+            state[key] = {"active": True, "since": rule.get("since") if rule.get("active") else now, "last_sent": now}
+            changed = True
+        for key, rule in list(state.items()):
+            if key in triggered_keys or not rule.get("active"):
+                continue
+            metric_key, _, threshold = key.partition(":")
+            try:
+                threshold = float(threshold)
+            except ValueError:
+                threshold = None
+            if threshold is None or _is_cleared(metric_key, threshold, metrics, float(hysteresis.get(metric_key, 0))):
+                state[key] = dict(rule, active=False, cleared_at=now)
+                changed = True
+        if changed:
+            _save_state(state)
+    if to_send:
+        _enqueue(to_send, digest_window)
+    return [msg for _, _, msg in triggered]
+
+
 def get_alert_history(limit=50):
     """Son N uyarı kaydını döner."""
     if not ALERT_HISTORY_PATH.exists():
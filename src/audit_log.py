@@ -1,45 +1,221 @@
-"""Audit log: config/execution modu değişikliklerini logs/audit.log'a yazar."""
+"""
+Audit log: config/execution modu değişikliklerini logs/audit.log'a yazar.
+Her satırın yanına sabit genişlikli bir indeks kaydı (ts, ofset, aksiyon crc32) logs/audit.log.idx'e eklenir;
+okuyucu indeksi sondan bloklar hâlinde tarar ve yalnızca eşleşen satırlara seek eder (sabit bellek).
+Rotasyon: boyut (AUDIT_LOG_MAX_BYTES) veya yaş (AUDIT_LOG_MAX_AGE_DAYS) aşılınca audit.log → audit.log.<seq>.
+"""
+import fcntl
 import json
+import os
+import struct
+import threading
+import time
+import zlib
 from pathlib import Path
 from datetime import datetime
 
 ROOT = Path(__file__).resolve().parent.parent
 AUDIT_PATH = ROOT / "logs" / "audit.log"
+LOCK_PATH = ROOT / "logs" / "audit.lock"
+MAX_BYTES = int(os.environ.get("AUDIT_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+MAX_AGE_DAYS = float(os.environ.get("AUDIT_LOG_MAX_AGE_DAYS", "0"))
+# Saklanacak rotasyon segmenti sayısı (0: hepsi)
+KEEP_SEGMENTS = int(os.environ.get("AUDIT_LOG_KEEP", "0"))
+# İndeks kaydı: ts (epoch, double), satır ofseti (uint64), aksiyon crc32 (uint32)
+_RECORD = struct.Struct("<dQI")
+_BLOCK_RECORDS = 4096
+_LOCK = threading.Lock()
+
+
+def _action_code(action):
+    return zlib.crc32(str(action).encode("utf-8"))
+
+
+def _index_path(log_path):
+    return log_path.with_name(log_path.name + ".idx")
+
+
+def _segments():
+    """(seq, log_path) listesi, yeniden eskiye. Aktif audit.log en büyük seq'i alır (rotasyonda bu adla taşınır)."""
+    prefix = AUDIT_PATH.name + "."
+    rotated = []
+    for p in AUDIT_PATH.parent.glob(prefix + "*"):
+        suffix = p.name[len(prefix):]
+        if suffix.isdigit():
+            rotated.append((int(suffix), p))
+    rotated.sort(reverse=True)
+    active_seq = (rotated[0][0] if rotated else 0) + 1
+    return [(active_seq, AUDIT_PATH)] + rotated
+
+
+def _parse_ts(ts):
+    try:
+        return datetime.fromisoformat(str(ts).replace("Z", "+00:00")).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _rebuild_index(log_path):
+    """Log satırlarını tarayıp indeksi baştan yazar (eski log'lar veya kayıp indeks için)."""
+    idx_path = _index_path(log_path)
+    tmp = idx_path.with_name(idx_path.name + ".tmp")
+    with open(log_path, "rb") as f, open(tmp, "wb") as out:
+        offset = 0
+        for line in f:
+            try:
+                entry = json.loads(line)
+                out.write(_RECORD.pack(_parse_ts(entry.get("ts")), offset, _action_code(entry.get("action"))))
+            except Exception:
+                pass
+            offset += len(line)
+    tmp.replace(idx_path)
+
+
+def _needs_index(log_path):
+    idx_path = _index_path(log_path)
+    if not log_path.exists():
+        return False
+    return not idx_path.exists() or (idx_path.stat().st_size == 0 and log_path.stat().st_size > 0)
+
+
+def _ensure_index(log_path):
+    """İndeks yoksa/boşsa yeniden kurar; LOCK_PATH üzerinde özel (exclusive) flock altında çağrılmalı."""
+    if _needs_index(log_path):
+        _rebuild_index(log_path)
+
+
+def _should_rotate(size):
+    if MAX_BYTES > 0 and size >= MAX_BYTES:
+        return True
+    if MAX_AGE_DAYS > 0:
+        try:
+            with open(_index_path(AUDIT_PATH), "rb") as f:
+                first = f.read(_RECORD.size)
+            if len(first) == _RECORD.size and time.time() - _RECORD.unpack(first)[0] > MAX_AGE_DAYS * 86400:
+                return True
+        except OSError:
+            pass
+    return False
+
+
+def _rotate():
+    """Aktif segmenti audit.log.<seq> olarak taşır; KEEP_SEGMENTS aşılırsa en eskiler silinir. Kilit altında çağrılır."""
+    segments = _segments()
+    seq = segments[0][0]
+    target = AUDIT_PATH.with_name(f"{AUDIT_PATH.name}.{seq}")
+    idx_path = _index_path(AUDIT_PATH)
+    AUDIT_PATH.replace(target)
+    if idx_path.exists():
+        idx_path.replace(_index_path(target))
+    if KEEP_SEGMENTS > 0:
+        rotated = [(seq, target)] + segments[1:]
+        for _, old in rotated[KEEP_SEGMENTS:]:
+            for p in (old, _index_path(old)):
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
 
 
 def append_to_audit(action: str, details=None):
-    """action ve opsiyonel details'i tek satır JSON olarak ekler."""
+    """action ve opsiyonel details'i tek satır JSON olarak ekler (indeks kaydıyla birlikte)."""
     AUDIT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    now = time.time()
     entry = {
-        "ts": datetime.utcnow().isoformat() + "Z",
+        "ts": datetime.utcfromtimestamp(now).isoformat() + "Z",
         "action": action,
         "details": details or {},
     }
-    with open(AUDIT_PATH, "a") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+    # Süreçler arası (dashboard + pipeline) kilit; rotasyon log dosyasını taşıdığı için ayrı dosyada
+    with _LOCK, open(LOCK_PATH, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            _ensure_index(AUDIT_PATH)
+            with open(AUDIT_PATH, "ab") as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(line)
+            with open(_index_path(AUDIT_PATH), "ab") as f:
+                f.write(_RECORD.pack(now, offset, _action_code(action)))
+            if _should_rotate(offset + len(line)):
+                _rotate()
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
 
 
-def read_audit_log(limit=200, action_filter=None):
-    """Son N kaydı döner. action_filter: str veya None (tümü)."""
-    if not AUDIT_PATH.exists():
-        return []
+def read_audit_page(limit=100, action_filter=None, cursor=None, since=None, until=None):
+    """
+    Yeniden eskiye bir sayfa kayıt. action_filter: str veya None (tümü); since/until: epoch saniye (opsiyonel).
+    cursor: önceki sayfanın döndürdüğü imleç (None: en yeni). Döner: (entries, next_cursor) — devamı yoksa next_cursor None.
+    Bellek kullanımı sayfa + bir indeks bloğu ile sınırlı; log dosyasının yalnızca eşleşen satırları okunur.
+    Okuma yazıcının kilidi (LOCK_PATH) paylaşımlı alınarak yapılır (rotasyon araya giremez); eksik indeks
+    kilit özele yükseltilerek yeniden kurulur.
+    """
+    code = _action_code(action_filter) if action_filter else None
+    start_seq, start_pos = None, None
+    if cursor:
+        try:
+            start_seq, start_pos = (int(x) for x in str(cursor).split(":", 1))
+        except ValueError:
+            start_seq, start_pos = None, None
+    if not AUDIT_PATH.parent.exists():
+        return [], None
+    with open(LOCK_PATH, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_SH)
+        try:
+            if any(_needs_index(log_path) for _, log_path in _segments()):
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                for _, log_path in _segments():
+                    _ensure_index(log_path)
+                fcntl.flock(lock, fcntl.LOCK_SH)
+            return _read_page(limit, action_filter, code, start_seq, start_pos, since, until)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_page(limit, action_filter, code, start_seq, start_pos, since, until):
+    """read_audit_page gövdesi; LOCK_PATH paylaşımlı kilidi altında çağrılır. Döner: (entries, next_cursor)."""
     out = []
     try:
-        with open(AUDIT_PATH) as f:
-            lines = f.readlines()
-        for line in reversed(lines[-limit * 2:]):
-            line = line.strip()
-            if not line:
+        for seq, log_path in _segments():
+            if start_seq is not None and seq > start_seq:
                 continue
-            try:
-                entry = json.loads(line)
-                if action_filter and entry.get("action") != action_filter:
-                    continue
-                out.append(entry)
-                if len(out) >= limit:
-                    break
-            except Exception:
+            if not log_path.exists():
                 continue
-        return out[::-1]
+            idx_path = _index_path(log_path)
+            with open(idx_path, "rb") as fi, open(log_path, "rb") as fl:
+                end = idx_path.stat().st_size // _RECORD.size
+                if seq == start_seq and start_pos is not None:
+                    end = min(end, start_pos)
+                while end > 0:
+                    start = max(0, end - _BLOCK_RECORDS)
+                    fi.seek(start * _RECORD.size)
+                    buf = fi.read((end - start) * _RECORD.size)
+                    for j in range(end - start - 1, -1, -1):
+                        ts, offset, action_code = _RECORD.unpack_from(buf, j * _RECORD.size)
+                        if until is not None and ts > until:
+                            continue
+                        if since is not None and ts < since:
+                            return out, None
+                        if code is not None and action_code != code:
+                            continue
+                        fl.seek(offset)
+                        try:
+                            entry = json.loads(fl.readline())
+                        except Exception:
+                            continue
+                        if action_filter and entry.get("action") != action_filter:
+                            continue
+                        out.append(entry)
+                        if len(out) >= limit:
+                            return out, f"{seq}:{start + j}"
+                    end = start
     except Exception:
-        return []
+        pass
+    return out, None
+
+
+def read_audit_log(limit=200, action_filter=None):
+    """Son N kaydı döner (eskiden yeniye). action_filter: str veya None (tümü)."""
+    entries, _ = read_audit_page(limit=limit, action_filter=action_filter)
+    return entries[::-1]
@@ -1,18 +1,31 @@
 """
 Polymarket CLOB client: emir gönderme hazırlığı.
-Paper modda kullanılmaz; live modda py_clob_client ile order endpoint (şimdilik stub).
+Paper modda kullanılmaz; live modda py_clob_client ile order endpoint.
+Client süreç genelinde credential başına önbelleklenir: HTTP bağlantısı ve token meta verisi (tick size,
+neg risk, fee) client üzerinde kalır. Emirler önceden imzalanabilir (presign_order); gönderim tek istek.
 """
+import hashlib
+import threading
 import sys
 from pathlib import Path
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
+# credential hash -> ClobClient
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
 
-def get_client(env):
-    """
-    .env'den host, API creds; emir için PRIVATE_KEY + chain_id ile ClobClient döner.
-    Eksik credential varsa None.
-    """
+
+def _client_key(env):
+    """Önbellek anahtarı: host + credential'ların hash'i (sırlar anahtar olarak bellekte tutulmaz)."""
+    parts = [env.get(k) or "" for k in (
+        "POLYMARKET_CLOB_API_URL", "POLYMARKET_API_KEY", "POLYMARKET_API_SECRET", "POLYMARKET_PASSPHRASE",
+        "PRIVATE_KEY", "POLYGON_CHAIN_ID",
+    )]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def _build_client(env):
     try:
         from py_clob_client.client import ClobClient
     except ImportError:
@@ -29,22 +42,131 @@ def get_client(env):
         client = ClobClient(host, key=key, chain_id=chain_id)
     else:
         client = ClobClient(host)
-    client.set_api_creds({"api_key": api_key, "api_secret": api_secret, "passphrase": passphrase})
+    try:
+        from py_clob_client.clob_types import ApiCreds
+        creds = ApiCreds(api_key=api_key, api_secret=api_secret, api_passphrase=passphrase)
+    except ImportError:
+        creds = {"api_key": api_key, "api_secret": api_secret, "passphrase": passphrase}
+    client.set_api_creds(creds)
     return client
 
 
+def get_client(env):
+    """
+    .env'den host, API creds; emir için PRIVATE_KEY + chain_id ile ClobClient döner (credential başına önbellekli).
+    Eksik credential varsa None.
+    """
+    key = _client_key(env)
+    client = _CLIENTS.get(key)
+    if client is not None:
+        return client
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = _build_client(env)
+            if client is not None:
+                _CLIENTS[key] = client
+    return client
+
+
+def reset_clients():
+    """Önbellekteki client'ları bırakır (credential değişimi sonrası)."""
+    with _CLIENTS_LOCK:
+        _CLIENTS.clear()
+
+
+def warm_up(env, token_ids=()):
+    """
+    Client'ı kurar, HTTP bağlantısını açar (get_ok) ve verilen token'ların tick size / neg risk / fee
+    bilgisini client önbelleğine alır; böylece sonraki imzalama ağ çağrısı yapmaz. Döner: bool.
+    """
+    client = get_client(env)
+    if client is None:
+        return False
+    try:
+        client.get_ok()
+        for token_id in token_ids:
+            if token_id:
+                client.get_tick_size(str(token_id))
+                client.get_neg_risk(str(token_id))
+                client.get_fee_rate_bps(str(token_id))
+        return True
+    except Exception:
+        return False
+
+
+def order_shares(price, size_usd=None, shares=None):
+    """Emir büyüklüğü pay (share) cinsinden: shares verilmişse o, yoksa size_usd / price; 2 ondalığa yuvarlanır."""
+    if shares is None:
+        shares = float(size_usd or 0) / float(price) if float(price) > 0 else 0.0
+    return round(float(shares), 2)
+
+
+def presign_order(env, token_id, price, size_usd=None, side="BUY", shares=None):
+    """
+    İmzalı emir (create_order); gönderilmez. OrderArgs.size pay adedidir: shares verilmezse size_usd / price.
+    Client yoksa veya hata olursa None.
+    """
+    client = get_client(env)
+    if client is None:
+        return None
+    try:
+        from py_clob_client.clob_types import OrderArgs
+        size = order_shares(price, size_usd, shares)
+        order_args = OrderArgs(token_id=str(token_id), price=float(price), size=size, side=side.upper())
+        return client.create_order(order_args)
+    except Exception:
+        return None
+
+
+def post_signed_order(env, signed_order, label=""):
+    """Önceden imzalanmış emri gönderir (tek istek). Döner: (success, message, order_id)."""
+    client = get_client(env)
+    if client is None:
+        return True, "clob_stub: no client (creds or py_clob_client missing)", None
+    try:
+        resp = client.post_order(signed_order)
+    except Exception as e:
+        return False, str(e), None
+    order_id = resp.get("orderID") if isinstance(resp, dict) else None
+    if isinstance(resp, dict) and resp.get("success") is False:
+        return False, str(resp.get("errorMsg") or resp), order_id
+    return True, f"clob_order_posted {label}".strip(), order_id
+
+
+def place_order(env, token_id, price, size_usd=None, side="BUY", signed_order=None, shares=None):
+    """
+    Tek bacak emir: live modda imzala (veya signed_order kullan) + gönder. Büyüklük shares (pay) veya size_usd (USD,
+    price ile paya çevrilir). Döner: (success: bool, message: str, order_id: str | None). Client yoksa stub başarı.
+    """
+    if get_client(env) is None:
+        return True, "clob_stub: no client (creds or py_clob_client missing)", None
+    if signed_order is None:
+        signed_order = presign_order(env, token_id, price, size_usd, side, shares=shares)
+        if signed_order is None:
+            return False, f"order_sign_failed token={str(token_id)[:20]}", None
+    size = order_shares(price, size_usd, shares)
+    return post_signed_order(env, signed_order, label=f"token={str(token_id)[:20]}... price={price} shares={size}")
+
+
 def place_order_stub(env, token_id, price, size_usd, side="BUY"):
     """
     Tek bacak emir: live modda CLOB create_and_post_order iskeleti.
     token_id, price, size_usd, side. Döner: (success: bool, message: str).
     """
+    ok, msg, _ = place_order(env, token_id, price, size_usd, side)
+    return ok, msg
+
+
+def cancel_order(env, order_id):
+    """Açık emri iptal eder (dolmamış kısım). Döner: (success: bool, message: str)."""
+    if not order_id:
+        return False, "order_id yok"
     client = get_client(env)
     if client is None:
-        return True, "clob_stub: no client (creds or py_clob_client missing)"
+        return False, "clob_stub: no client"
     try:
-        from py_clob_client.clob_types import OrderArgs
-        order_args = OrderArgs(token_id=str(token_id), price=float(price), size=float(size_usd), side=side.upper())
-        _ = client.create_and_post_order(order_args)
-        return True, f"clob_order_posted token={str(token_id)[:20]}... price={price} size={size_usd}"
+        client.cancel(order_id=order_id)
+        return True, f"clob_order_cancelled id={order_id}"
     except Exception as e:
         return False, str(e)
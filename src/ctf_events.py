@@ -0,0 +1,140 @@
+"""
+Polymarket zincir event'lerinin çözümü: OrderFilled (CTF Exchange), PositionSplit ve PositionsMerge (Conditional Tokens).
+topic0 hash'leri imzalardan bir kez hesaplanır (Web3.keccak); log başına ABI araması yapılmaz. Log'lar ham
+JSON-RPC biçiminde beklenir (alchemy_fetcher). Çıktı sütun sözlüğüdür (NumPy dizileri):
+hash/asset id'ler V32, adresler V20 (big-endian ham bayt; bytes(x) her zaman tam genişlik — S dtype okurken sondaki
+\x00 baytlarını attığı için kullanılmaz, ör. USDC tarafının asset id'si 0), miktarlar uint64 (taşarsa doyurulur).
+"""
+import numpy as np
+
+SIGNATURES = {
+    "OrderFilled": "OrderFilled(bytes32,address,address,uint256,uint256,uint256,uint256,uint256)",
+    "PositionSplit": "PositionSplit(address,address,bytes32,bytes32,uint256[],uint256)",
+    "PositionsMerge": "PositionsMerge(address,address,bytes32,bytes32,uint256[],uint256)",
+}
+# Sütun adı -> dtype (event_store segmentleri bu sırayla yazılır)
+COLUMNS = {
+    "OrderFilled": {
+        "block": "u8", "log_index": "u4", "tx_hash": "V32", "order_hash": "V32", "maker": "V20", "taker": "V20",
+        "maker_asset_id": "V32", "taker_asset_id": "V32", "maker_amount": "u8", "taker_amount": "u8", "fee": "u8",
+    },
+    "PositionSplit": {
+        "block": "u8", "log_index": "u4", "tx_hash": "V32", "stakeholder": "V20", "collateral": "V20",
+        "parent_collection_id": "V32", "condition_id": "V32", "partition_mask": "u8", "amount": "u8",
+    },
+}
+COLUMNS["PositionsMerge"] = COLUMNS["PositionSplit"]
+_U64_MAX = np.iinfo(np.uint64).max
+_TOPICS = None
+
+
+def topics():
+    """{topic0 (0x.. küçük harf): event adı}; ilk çağrıda hesaplanır."""
+    global _TOPICS
+    if _TOPICS is None:
+        from web3 import Web3
+        _TOPICS = {"0x" + bytes(Web3.keccak(text=sig)).hex(): name for name, sig in SIGNATURES.items()}
+    return _TOPICS
+
+
+def topic_of(event):
+    """Event adının topic0 hash'i."""
+    for topic, name in topics().items():
+        if name == event:
+            return topic
+    raise KeyError(event)
+
+
+def _hex_column(values, nbytes):
+    """Hex string listesi → V{nbytes} dizisi (her değerin son nbytes baytı; adresler 32 bayt topic'ten kırpılır)."""
+    if not values:
+        return np.empty(0, dtype=f"V{nbytes}")
+    return np.frombuffer(bytes.fromhex("".join(v[-2 * nbytes:] for v in values)), dtype=f"V{nbytes}").copy()
+
+
+def _u64_words(words):
+    """(n, 32) uint8 big-endian kelimeler → uint64; 64 bitten büyük değerler doyurulur."""
+    out = words[:, 24:].copy().view(">u8").ravel().astype(np.uint64)
+    out[words[:, :24].any(axis=1)] = _U64_MAX
+    return out
+
+
+def _decode_order_filled(logs):
+    n = len(logs)
+    # Veri: makerAssetId, takerAssetId, makerAmountFilled, takerAmountFilled, fee (5 sabit kelime)
+    data = np.frombuffer(bytes.fromhex("".join(log["data"][2:2 + 640] for log in logs)), dtype=np.uint8).reshape(n, 5, 32)
+    return {
+        "maker_asset_id": data[:, 0, :].copy().view("V32").ravel(),
+        "taker_asset_id": data[:, 1, :].copy().view("V32").ravel(),
+        "maker_amount": _u64_words(data[:, 2, :]),
+        "taker_amount": _u64_words(data[:, 3, :]),
+        "fee": _u64_words(data[:, 4, :]),
+        "order_hash": _hex_column([log["topics"][1] for log in logs], 32),
+        "maker": _hex_column([log["topics"][2] for log in logs], 20),
+        "taker": _hex_column([log["topics"][3] for log in logs], 20),
+    }
+
+
+def _decode_position(logs):
+    # Veri: collateralToken, partition ofseti, amount, ardından partition dizisi (uzunluk + elemanlar)
+    masks = np.empty(len(logs), dtype=np.uint64)
+    amounts = np.empty(len(logs), dtype=np.uint64)
+    collateral = []
+    for i, log in enumerate(logs):
+        raw = bytes.fromhex(log["data"][2:])
+        collateral.append(raw[12:32].hex())
+        amounts[i] = min(int.from_bytes(raw[64:96], "big"), _U64_MAX)
+        offset = int.from_bytes(raw[32:64], "big")
+        length = int.from_bytes(raw[offset:offset + 32], "big")
+        mask = 0
+        for k in range(length):
+            mask |= int.from_bytes(raw[offset + 32 * (k + 1):offset + 32 * (k + 2)], "big")
+        masks[i] = min(mask, _U64_MAX)
+    return {
+        "stakeholder": _hex_column([log["topics"][1] for log in logs], 20),
+        "collateral": _hex_column(collateral, 20),
+        "parent_collection_id": _hex_column([log["topics"][2] for log in logs], 32),
+        "condition_id": _hex_column([log["topics"][3] for log in logs], 32),
+        "partition_mask": masks,
+        "amount": amounts,
+    }
+
+
+_DECODERS = {"OrderFilled": _decode_order_filled, "PositionSplit": _decode_position, "PositionsMerge": _decode_position}
+
+
+def decode_logs(logs, events=None):
+    """
+    Ham log listesini event adına göre sütunlara çözer. events: çözülecek event adları (None: hepsi).
+    Döner: {event: {sütun: np.ndarray}} — yalnızca log'u olan event'ler; tanınmayan/bozuk log'lar atlanır.
+    """
+    by_topic = topics()
+    wanted = set(events) if events else set(SIGNATURES)
+    groups = {}
+    for log in logs:
+        t = log.get("topics") or []
+        name = by_topic.get(str(t[0]).lower()) if t else None
+        if name in wanted and len(t) == 4:
+            groups.setdefault(name, []).append(log)
+    out = {}
+    for name, group in groups.items():
+        try:
+            cols = _DECODERS[name](group)
+        except (ValueError, IndexError):
+            # Beklenmeyen veri uzunluğu: grup log log çözülür, bozuklar atlanır
+            good = []
+            for log in group:
+                try:
+                    _DECODERS[name]([log])
+                    good.append(log)
+                except (ValueError, IndexError):
+                    pass
+            if not good:
+                continue
+            group = good
+            cols = _DECODERS[name](group)
+        cols["block"] = np.array([int(log["blockNumber"]) for log in group], dtype=np.uint64)
+        cols["log_index"] = np.array([int(log.get("logIndex") or 0) for log in group], dtype=np.uint32)
+        cols["tx_hash"] = _hex_column([str(log.get("transactionHash") or "0x" + "00" * 32) for log in group], 32)
+        out[name] = {c: cols[c].astype(dtype, copy=False) for c, dtype in COLUMNS[name].items()}
+    return out
@@ -0,0 +1,170 @@
+"""
+Bağımlılık kombinasyon önbelleği: data/dependency_cache.sqlite.
+Anahtar: (market_a_id, market_b_id, soru hash'i, model, prompt sürümü). İki piyasa sorusu arasındaki
+mantıksal ilişki değişmediği için Gemini yanıtı kalıcı saklanır; TTL + LRU ile sınırlanır.
+Ayarlar: config/dependency_detection.yaml → cache (ttl_hours, max_entries).
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+CACHE_PATH = ROOT / "data" / "dependency_cache.sqlite"
+DEFAULT_TTL_HOURS = 24 * 7
+DEFAULT_MAX_ENTRIES = 50000
+# Her isabette last_used yazmamak için: bu süreden eski ise güncellenir (LRU hassasiyeti)
+TOUCH_INTERVAL_SEC = 60
+# Süresi dolmuş kayıtların toplu silinme aralığı (run_sweep her turda purge_expired çağırır)
+PURGE_INTERVAL_SEC = 3600
+
+_LOCK = threading.Lock()
+_CONN = None
+_SETTINGS = {"ttl_sec": DEFAULT_TTL_HOURS * 3600, "max_entries": DEFAULT_MAX_ENTRIES, "enabled": True}
+_STATS = {"hits": 0, "misses": 0, "puts": 0, "evictions": 0, "expired": 0}
+_LAST_PURGE = 0.0
+
+
+def _load_settings():
+    try:
+        from src.config_loader import load_yaml
+        cfg = load_yaml("dependency_detection").get("cache") or {}
+    except Exception:
+        cfg = {}
+    _SETTINGS["ttl_sec"] = float(cfg.get("ttl_hours", DEFAULT_TTL_HOURS)) * 3600
+    _SETTINGS["max_entries"] = int(cfg.get("max_entries", DEFAULT_MAX_ENTRIES))
+    _SETTINGS["enabled"] = bool(cfg.get("enabled", True))
+
+
+def _conn():
+    """Tek paylaşılan bağlantı (WAL); _LOCK altında çağrılmalı."""
+    global _CONN
+    if _CONN is None:
+        _load_settings()
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        _CONN = sqlite3.connect(str(CACHE_PATH), check_same_thread=False, timeout=10)
+        _CONN.execute("PRAGMA journal_mode=WAL")
+        _CONN.execute("PRAGMA synchronous=NORMAL")
+        _CONN.execute(
+            "CREATE TABLE IF NOT EXISTS combinations ("
+            " key TEXT PRIMARY KEY, market_a_id TEXT, market_b_id TEXT, model TEXT, prompt_version TEXT,"
+            " combinations TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        _CONN.execute("CREATE INDEX IF NOT EXISTS idx_combinations_last_used ON combinations(last_used)")
+        _CONN.commit()
+    return _CONN
+
+
+def make_key(market_a_id, market_b_id, question_a, question_b, model, prompt_version):
+    """Önbellek anahtarı; soru metni değişirse (hash) anahtar da değişir."""
+    qhash = hashlib.sha1(f"{question_a}\x1f{question_b}".encode("utf-8")).hexdigest()[:16]
+    return "|".join([str(market_a_id or ""), str(market_b_id or ""), qhash, str(model), str(prompt_version)])
+
+
+def get(key):
+    """Önbellekteki kombinasyon listesi veya None (yok/süresi dolmuş)."""
+    now = time.time()
+    with _LOCK:
+        try:
+            conn = _conn()
+            if not _SETTINGS["enabled"]:
+                return None
+            row = conn.execute("SELECT combinations, created_at, last_used FROM combinations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                _STATS["misses"] += 1
+                return None
+            combos, created_at, last_used = row
+            if _SETTINGS["ttl_sec"] > 0 and now - created_at > _SETTINGS["ttl_sec"]:
+                conn.execute("DELETE FROM combinations WHERE key = ?", (key,))
+                conn.commit()
+                _STATS["expired"] += 1
+                _STATS["misses"] += 1
+                return None
+            if now - last_used > TOUCH_INTERVAL_SEC:
+                conn.execute("UPDATE combinations SET last_used = ? WHERE key = ?", (now, key))
+                conn.commit()
+            _STATS["hits"] += 1
+            return json.loads(combos)
+        except Exception:
+            _STATS["misses"] += 1
+            return None
+
+
+def contains(key):
+    """Anahtar önbellekte var mı (sayaçları ve last_used'ı değiştirmez)."""
+    with _LOCK:
+        try:
+            row = _conn().execute("SELECT 1 FROM combinations WHERE key = ?", (key,)).fetchone()
+            return row is not None
+        except Exception:
+            return False
+
+
+def put(key, combinations, market_a_id=None, market_b_id=None, model=None, prompt_version=None):
+    """Kombinasyonları yazar; max_entries aşılırsa en az kullanılanlar silinir (LRU)."""
+    now = time.time()
+    with _LOCK:
+        try:
+            conn = _conn()
+            if not _SETTINGS["enabled"]:
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO combinations VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, str(market_a_id or ""), str(market_b_id or ""), str(model or ""), str(prompt_version or ""),
+                 json.dumps(combinations, ensure_ascii=False), now, now),
+            )
+            _STATS["puts"] += 1
+            max_entries = _SETTINGS["max_entries"]
+            if max_entries > 0 and _STATS["puts"] % 100 == 1:
+                size = conn.execute("SELECT COUNT(*) FROM combinations").fetchone()[0]
+                if size > max_entries:
+                    # %10 pay bırakılır; her put'ta tekrar silme yapılmasın
+                    excess = size - int(max_entries * 0.9)
+                    conn.execute(
+                        "DELETE FROM combinations WHERE key IN (SELECT key FROM combinations ORDER BY last_used LIMIT ?)",
+                        (excess,),
+                    )
+                    _STATS["evictions"] += excess
+            conn.commit()
+        except Exception:
+            pass
+
+
+def purge_expired(min_interval_sec=0):
+    """
+    Süresi dolmuş kayıtları siler; silinen sayısını döner. min_interval_sec: son temizlikten bu kadar geçmediyse
+    hiçbir şey yapmaz (her taramada çağrılabilir).
+    """
+    global _LAST_PURGE
+    now = time.time()
+    with _LOCK:
+        if min_interval_sec and now - _LAST_PURGE < min_interval_sec:
+            return 0
+        try:
+            conn = _conn()
+            _LAST_PURGE = now
+            if _SETTINGS["ttl_sec"] <= 0:
+                return 0
+            cur = conn.execute("DELETE FROM combinations WHERE created_at < ?", (now - _SETTINGS["ttl_sec"],))
+            conn.commit()
+            _STATS["expired"] += cur.rowcount
+            return cur.rowcount
+        except Exception:
+            return 0
+
+
+def stats(since=None):
+    """
+    Süreç içi sayaçlar (hits, misses, puts, evictions, expired) + hit_rate.
+    since: önceki bir stats() sonucu verilirse o andan bu yana farklar döner (tarama başına raporlama).
+    """
+    out = dict(_STATS)
+    if since:
+        out = {k: v - since.get(k, 0) for k, v in out.items()}
+    total = out["hits"] + out["misses"]
+    out["hit_rate"] = round(out["hits"] / total * 100, 1) if total else 0.0
+    return out
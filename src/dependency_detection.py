@@ -1,6 +1,7 @@
 """Bağımlılık tespiti: Gemini ile geçerli kombinasyonlar, validasyon."""
 import json
 import re
+import threading
 from pathlib import Path
 import sys
 ROOT = Path(__file__).resolve().parent.parent
@@ -8,6 +9,17 @@ sys.path.insert(0, str(ROOT))
 
 GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
 TIMEOUT = 30
+# PROMPT_TEMPLATE değişince artırın: dependency_cache anahtarına girer, eski yanıtlar kullanılmaz
+PROMPT_VERSION = "v1"
+# BATCH_PROMPT_TEMPLATE değişince artırın
+BATCH_PROMPT_VERSION = "v1"
+# dependency_cache anahtarındaki sürüm: bir çiftin yanıtı tekli ve toplu yoldan aynı anahtarla okunur, bu yüzden
+# iki şablondan biri değişince tüm yanıtlar geçersizleşir
+CACHE_VERSION = f"{PROMPT_VERSION}+batch-{BATCH_PROMPT_VERSION}"
+POOL_SIZE = 32
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
 
 PROMPT_TEMPLATE = """Aşağıda iki tahmin piyasası ve koşulları var. Geçerli sonuç kombinasyonlarını (hangi koşullar birlikte TRUE olabilir) JSON array olarak yaz.
 Sadece JSON döndür, başka açıklama yazma.
@@ -21,19 +33,46 @@ Piyasa B: %s
 Örnek çıktı formatı: [{"market_a_outcome": "X", "market_b_outcome": "Y"}, ...]
 """
 
+BATCH_PROMPT_TEMPLATE = """Aşağıda aynı event'e ait birden fazla tahmin piyasası çifti var. Her çift için geçerli sonuç kombinasyonlarını (hangi koşullar birlikte TRUE olabilir) yaz.
+Sadece JSON döndür, başka açıklama yazma. Çıktı, çift anahtarlarını JSON array'lere eşleyen tek bir JSON object olmalı.
+
+%s
+
+Örnek çıktı formatı: {"p1": [{"market_a_outcome": "X", "market_b_outcome": "Y"}, ...], "p2": [...]}
+"""
+
+BATCH_PAIR_TEMPLATE = """Çift %s:
+  Piyasa A: %s
+    Koşullar: %s
+  Piyasa B: %s
+    Koşullar: %s"""
+
 
-def call_gemini(api_key, model, prompt, temperature=0.2, max_tokens=512):
-    """Gemini REST API; yanıt metnini döner."""
-    import requests
+def _session():
+    """Süreç boyunca paylaşılan keep-alive oturum (TLS el sıkışması her çağrıda tekrarlanmaz)."""
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                s = requests.Session()
+                s.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE))
+                _SESSION = s
+    return _SESSION
+
+
+def call_gemini(api_key, model, prompt, temperature=0.2, max_tokens=512, timeout=None):
+    """Gemini REST API; yanıt metnini döner. timeout verilmezse TIMEOUT (sn)."""
     url = GEMINI_URL.format(model=model)
-    r = requests.post(
+    r = _session().post(
         url,
         headers={"x-goog-api-key": api_key, "Content-Type": "application/json"},
         json={
             "contents": [{"parts": [{"text": prompt}]}],
             "generationConfig": {"temperature": temperature, "maxOutputTokens": max_tokens},
         },
-        timeout=TIMEOUT,
+        timeout=timeout or TIMEOUT,
     )
     r.raise_for_status()
     data = r.json()
@@ -41,8 +80,7 @@ def call_gemini(api_key, model, prompt, temperature=0.2, max_tokens=512):
     return (parts[0].get("text", "") if parts else "").strip()
 
 
-def parse_combinations(text):
-    """LLM çıktısından JSON array parse; liste döner, hata varsa []."""
+def _strip_code_fence(text):
     raw = (text or "").strip()
     if "```json" in raw:
         m = re.search(r"```json\s*([\s\S]*?)```", raw)
@@ -50,6 +88,12 @@ def parse_combinations(text):
     elif "```" in raw:
         m = re.search(r"```\s*([\s\S]*?)```", raw)
         raw = m.group(1).strip() if m else raw
+    return raw
+
+
+def parse_combinations(text):
+    """LLM çıktısından JSON array parse; liste döner, hata varsa []."""
+    raw = _strip_code_fence(text)
     try:
         out = json.loads(raw)
         return out if isinstance(out, list) else []
@@ -57,6 +101,34 @@ def parse_combinations(text):
         return []
 
 
+def build_batch_prompt(pairs, conditions):
+    """
+    pairs: list of (key, market_a_question, market_b_question); key örn. "p1".
+    Tüm çiftler için tek prompt döner (BATCH_PROMPT_TEMPLATE).
+    """
+    body = "\n\n".join(BATCH_PAIR_TEMPLATE % (key, qa, conditions, qb, conditions) for key, qa, qb in pairs)
+    return BATCH_PROMPT_TEMPLATE % body
+
+
+def parse_batch_combinations(text, keys):
+    """
+    Toplu yanıttan {key: list} parse. Her key için parse_combinations ile aynı anlam: liste.
+    Eksik veya liste olmayan (bozuk) çiftler None döner; çağıran bunları tekli çağrıya düşürür.
+    """
+    out = {k: None for k in keys}
+    try:
+        data = json.loads(_strip_code_fence(text))
+    except json.JSONDecodeError:
+        return out
+    if not isinstance(data, dict):
+        return out
+    for k in keys:
+        v = data.get(k)
+        if isinstance(v, list) and all(isinstance(c, dict) for c in v):
+            out[k] = v
+    return out
+
+
 def is_dependent(combinations, n_a, n_b):
     """
     Geçerli kombinasyon sayısı < n_a * n_b ise bağımlılık var.
@@ -0,0 +1,198 @@
+"""
+Çözülmüş zincir event'leri için yalnızca-ekleme sütunlu depo: data/event_store/<Event>/<bölüm>/<segment>/<sütun>.npy.
+Bölümler sabit blok aralıklarıdır (partition_blocks); her segment kapsadığı blok aralığıyla adlandırılır ve
+geçici dizine yazılıp tek rename ile yayımlanır (yarım segment görünmez). Okuma np.load(mmap_mode="r") ile yapılır,
+analizler yeniden çözmeden vektörel çalışır. Yalnızca kesinleşmiş bloklar yazılır (reorg'da yeniden yazım yok);
+canlı akışta kesinleşmemiş satırlar record() içinde bellekte bekler.
+Ayarlar: config/data_pipeline.yaml → event_store.
+"""
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+STORE_PATH = ROOT / "data" / "event_store"
+DEFAULT_PARTITION_BLOCKS = 100_000
+DEFAULT_FLUSH_ROWS = 50_000
+_WIDTH = 12
+
+
+def _range_name(lo, hi):
+    return f"{lo:0{_WIDTH}d}-{hi:0{_WIDTH}d}"
+
+
+def _parse_range(name):
+    try:
+        lo, hi = name.split("-", 1)
+        return int(lo), int(hi)
+    except ValueError:
+        return None
+
+
+def segments(event, from_block=None, to_block=None, root=STORE_PATH):
+    """[(seg_from, seg_to, path), ...] blok sırasıyla; verilen aralıkla kesişenler."""
+    out = []
+    base = Path(root) / event
+    if not base.exists():
+        return out
+    for part in base.iterdir():
+        prange = _parse_range(part.name)
+        if prange is None or not part.is_dir():
+            continue
+        if (to_block is not None and prange[0] > to_block) or (from_block is not None and prange[1] < from_block):
+            continue
+        for seg in part.iterdir():
+            srange = _parse_range(seg.name)
+            if srange is None or not seg.is_dir():
+                continue
+            if (to_block is not None and srange[0] > to_block) or (from_block is not None and srange[1] < from_block):
+                continue
+            out.append((srange[0], srange[1], seg))
+    out.sort()
+    return out
+
+
+def high_water(event, root=STORE_PATH):
+    """Depoya yazılmış en yüksek blok (segment adlarından); boşsa -1."""
+    segs = segments(event, root=root)
+    return max((hi for _, hi, _ in segs), default=-1)
+
+
+def write_segment(event, seg_from, seg_to, columns, partition_blocks=DEFAULT_PARTITION_BLOCKS, root=STORE_PATH):
+    """
+    columns: {sütun: np.ndarray} (aynı uzunlukta, block sütunu dahil), seg_from..seg_to kapsanan aralık.
+    Bölüm sınırlarında bölünerek yazılır; boş parçalar için segment açılmaz. Döner: yazılan satır sayısı.
+    """
+    blocks = columns["block"]
+    written = 0
+    lo = seg_from
+    while lo <= seg_to:
+        part_lo = lo - lo % partition_blocks
+        part_hi = part_lo + partition_blocks - 1
+        hi = min(seg_to, part_hi)
+        mask = (blocks >= lo) & (blocks <= hi)
+        if mask.any():
+            target = Path(root) / event / _range_name(part_lo, part_hi) / _range_name(lo, hi)
+            tmp = target.with_name("." + target.name + f".tmp{os.getpid()}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            tmp.mkdir(parents=True)
+            for name, values in columns.items():
+                np.save(tmp / f"{name}.npy", values[mask])
+            os.replace(tmp, target)
+            written += int(mask.sum())
+        lo = hi + 1
+    return written
+
+
+def load_events(event, from_block=None, to_block=None, columns=None, root=STORE_PATH):
+    """
+    Aralıktaki event'leri sütun sözlüğü olarak döner (blok sırasıyla). columns: istenen sütunlar (None: hepsi).
+    Segmentler memmap ile açılır; yalnızca istenen sütunlar ve aralık kopyalanır. Eski S dtype'lı bayt sütunları
+    (dosyada tam genişlik saklıdır) V dtype olarak yeniden yorumlanır.
+    """
+    from src.ctf_events import COLUMNS
+    names = list(columns or COLUMNS[event])
+    if "block" not in names:
+        names.append("block")
+    parts = {name: [] for name in names}
+    for _, _, seg in segments(event, from_block, to_block, root=root):
+        block = np.load(seg / "block.npy", mmap_mode="r")
+        mask = np.ones(len(block), dtype=bool)
+        if from_block is not None:
+            mask &= block >= from_block
+        if to_block is not None:
+            mask &= block <= to_block
+        for name in names:
+            values = np.asarray(np.load(seg / f"{name}.npy", mmap_mode="r")[mask])
+            dtype = np.dtype(COLUMNS[event][name])
+            if values.dtype.kind == "S" and dtype.kind == "V" and values.dtype.itemsize == dtype.itemsize:
+                values = values.view(dtype)
+            parts[name].append(values)
+    return {
+        name: np.concatenate(arrs) if arrs else np.empty(0, dtype=COLUMNS[event][name])
+        for name, arrs in parts.items()
+    }
+
+
+def record(chunks, finalized_block, events=None, flush_rows=DEFAULT_FLUSH_ROWS,
+           partition_blocks=DEFAULT_PARTITION_BLOCKS, root=STORE_PATH, stats=None, flush_sec=None):
+    """
+    (start, end, logs) akışını aynen geçirirken event'leri çözüp depoya ekler. finalized_block: sayı veya
+    güncel kesinleşmiş bloğu döndüren fonksiyon (canlı akış). Kesinleşmemiş satırlar bellekte bekler; aynı
+    aralığı yeniden kapsayan parça (reorg) bekleyen satırların yerine geçer. Event başına depodaki en yüksek
+    bloktan sonrası yazılır (tekrar çalıştırmada çift kayıt olmaz). flush_rows kesinleşmiş satır birikince veya
+    akış bitince (erken kapanış dahil) segment yazılır; flush_sec verilirse kesinleşmiş satırlar en geç bu sürede
+    yazılır (canlı akış). stats: verilirse {event: yazılan satır} ile güncellenir.
+    """
+    from src.ctf_events import COLUMNS, decode_logs
+    finalized = finalized_block if callable(finalized_block) else (lambda: finalized_block)
+    events = list(events or COLUMNS)
+    hw = {name: high_water(name, root=root) for name in events}
+    # Event başına: kapsama başı (yazılmamış ilk blok), görülen son blok, yazılmamış sütun parçaları
+    cov_from = {name: None for name in events}
+    seen_to = {name: -1 for name in events}
+    pending = {name: [] for name in events}
+    # Bekleyen satır sayısı ve en yüksek bloğu (sıralı akışta değiştirme taramasını atlamak için)
+    pending_rows = {name: 0 for name in events}
+    pending_max = {name: -1 for name in events}
+    stats = stats if stats is not None else {}
+    last_flush = {name: time.monotonic() for name in events}
+
+    def flush(name, top):
+        top = min(top, seen_to[name])
+        lo = cov_from[name]
+        last_flush[name] = time.monotonic()
+        if lo is None or top < lo or not pending_rows[name]:
+            return
+        cols = {c: np.concatenate([p[c] for p in pending[name]]) for c in COLUMNS[name]}
+        final = cols["block"] <= top
+        if not final.any():
+            return
+        stats[name] = stats.get(name, 0) + write_segment(name, lo, top, {c: v[final] for c, v in cols.items()}, partition_blocks, root)
+        rest = {c: v[~final] for c, v in cols.items()}
+        pending[name] = [rest] if len(rest["block"]) else []
+        pending_rows[name] = len(rest["block"])
+        hw[name] = top
+        cov_from[name] = top + 1
+
+    try:
+        for start, end, logs in chunks:
+            yield start, end, logs
+            new = [name for name in events if end > hw[name]]
+            if not new:
+                continue
+            decoded = decode_logs(logs, new)
+            top = finalized()
+            for name in new:
+                lo = max(start, hw[name] + 1)
+                if lo <= pending_max[name]:
+                    # Aynı aralığın önceki (kesinleşmemiş) satırları bu parçayla değiştirilir
+                    pending[name] = [
+                        {c: v[keep] for c, v in p.items()}
+                        for p in pending[name]
+                        for keep in [(p["block"] < lo) | (p["block"] > end)]
+                        if keep.any()
+                    ]
+                    pending_rows[name] = sum(len(p["block"]) for p in pending[name])
+                cols = decoded.get(name)
+                if cols is not None:
+                    keep = (cols["block"] >= lo) & (cols["block"] <= end)
+                    if keep.any():
+                        pending[name].append({c: v[keep] for c, v in cols.items()})
+                        pending_rows[name] += int(keep.sum())
+                        pending_max[name] = max(pending_max[name], end)
+                if cov_from[name] is None:
+                    cov_from[name] = lo
+                seen_to[name] = max(seen_to[name], end)
+                if pending_rows[name] >= flush_rows or (flush_sec and time.monotonic() - last_flush[name] >= flush_sec):
+                    flush(name, top)
+    finally:
+        top = finalized()
+        for name in events:
+            flush(name, top)
@@ -22,3 +22,149 @@ def passes_execution_validation(profit_usd, min_volume_per_leg_usd, min_margin_u
     if not check_liquidity(min_volume_per_leg_usd, min_liquidity_usd):
         return False, "liquidity < min"
     return True, "ok"
+
+
+def _pad_levels(book_levels, max_levels):
+    """Bacak başına [(price, size), ...] -> (prices, sizes) dizileri (L, K); eksik seviyeler size=0."""
+    import numpy as np
+    n = len(book_levels)
+    prices = np.zeros((n, max_levels))
+    sizes = np.zeros((n, max_levels))
+    for i, levels in enumerate(book_levels):
+        levels = list(levels)[:max_levels]
+        if levels:
+            arr = np.asarray(levels, dtype=float).reshape(-1, 2)
+            prices[i, :len(arr)] = arr[:, 0]
+            sizes[i, :len(arr)] = arr[:, 1]
+    return prices, sizes
+
+
+def pad_candidates(book_levels_list, weights_list=None, max_levels=10):
+    """
+    Bacak sayısı farklı adayları tek diziye toplar: (prices, sizes) (N, L, K) ve weights (N, L).
+    Eksik bacaklar ağırlık 0 ve boş seviyeyle doldurulur (simülasyonda etkisizdir). weights_list None: hepsi 1.
+    """
+    import numpy as np
+    n = len(book_levels_list)
+    n_legs = max((len(b) for b in book_levels_list), default=0)
+    prices = np.zeros((n, n_legs, max_levels))
+    sizes = np.zeros((n, n_legs, max_levels))
+    weights = np.zeros((n, n_legs))
+    for i, book_levels in enumerate(book_levels_list):
+        legs = len(book_levels)
+        if legs:
+            prices[i, :legs], sizes[i, :legs] = _pad_levels(book_levels, max_levels)
+            weights[i, :legs] = 1.0 if weights_list is None else np.asarray(weights_list[i], dtype=float)
+    return prices, sizes, weights
+
+
+def simulate_vwap_batch(prices, sizes, target_qty, weights=None):
+    """
+    Vektörel VWAP/slippage simülasyonu: N aday × L bacak × K seviye tek seferde.
+    prices, sizes: (N, L, K) — her bacağın ask seviyeleri, fiyat artan; boş seviye size=0.
+    target_qty: (N,) — portföy birimi (paket başına 1$ ödeme) adedi.
+    weights: (N, L) — birim başına bacak payı (Layer 1 pozisyonu); None: her bacakta 1 (eşit adet). Ağırlığı 0 olan
+    bacak alınmaz. Bacak l'de w_l × fill_qty pay alınır; fill_qty = min(target, min_l derinlik_l / w_l).
+    Döner: dict — fill_qty (N,) birim, vwap (N, L), cost (N,) USD, profit (N,) USD = fill_qty - cost,
+    slippage_pct (N, L) en iyi ask'a göre, limit_price (N, L) bacağın yürüdüğü en derin seviyenin fiyatı (limit emir
+    fiyatı; alınmayan bacakta NaN).
+    """
+    import numpy as np
+    p = np.asarray(prices, dtype=float)
+    s = np.asarray(sizes, dtype=float)
+    target = np.asarray(target_qty, dtype=float).reshape(-1)
+    w = np.ones(p.shape[:2]) if weights is None else np.asarray(weights, dtype=float)
+    cum_size = np.cumsum(s, axis=2)
+    depth = cum_size[:, :, -1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        units_depth = np.where(w > 0, depth / w, np.inf)
+    fill = np.minimum(target, units_depth.min(axis=1))
+    fill = np.maximum(fill, 0.0)
+    leg_qty = w * fill[:, None]
+    # Seviye k'de alınan miktar: önceki seviyeler doldurulduktan sonra kalan, seviye boyutuyla sınırlı
+    prev_size = cum_size - s
+    taken = np.clip(leg_qty[:, :, None] - prev_size, 0.0, s)
+    leg_cost = (taken * p).sum(axis=2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vwap = np.where(leg_qty > 0, leg_cost / leg_qty, np.nan)
+        best = p[:, :, 0]
+        slippage = np.where((best > 0) & (leg_qty > 0), (vwap - best) / best * 100, np.nan)
+    cost = leg_cost.sum(axis=1)
+    touched = taken > 0
+    deepest = p.shape[2] - 1 - np.argmax(touched[:, :, ::-1], axis=2)
+    limit_price = np.where(touched.any(axis=2), np.take_along_axis(p, deepest[:, :, None], axis=2)[:, :, 0], np.nan)
+    return {
+        "fill_qty": fill, "vwap": vwap, "cost": cost, "profit": fill - cost, "slippage_pct": slippage,
+        "limit_price": limit_price,
+    }
+
+
+def _candidate_sim(sim, i, n_legs):
+    slippage = [float(x) for x in sim["slippage_pct"][i][:n_legs]]
+    valid = [x for x in slippage if x == x]
+    return {
+        "fill_qty": float(sim["fill_qty"][i]),
+        "vwap": [float(x) for x in sim["vwap"][i][:n_legs]],
+        "cost": float(sim["cost"][i]),
+        "profit": float(sim["profit"][i]),
+        "slippage_pct": slippage,
+        "max_slippage_pct": max(valid) if valid else 0.0,
+        "limit_price": [float(x) for x in sim["limit_price"][i][:n_legs]],
+    }
+
+
+def simulate_vwap(book_levels, target_qty, max_levels=10, weights=None):
+    """
+    Tek aday: book_levels bacak başına [(price, size), ...] (ask, fiyat artan); target_qty portföy birimi adedi;
+    weights bacak başına birim payı (None: 1).
+    Döner: dict — fill_qty, vwap (bacak listesi), cost, profit, slippage_pct (bacak listesi), max_slippage_pct,
+    limit_price (bacak listesi).
+    """
+    prices, sizes, w = pad_candidates([book_levels], None if weights is None else [weights], max_levels)
+    sim = simulate_vwap_batch(prices, sizes, [target_qty], w)
+    return _candidate_sim(sim, 0, len(book_levels))
+
+
+def vwap_validation_batch(candidates, min_margin_usd=0.05, max_slippage_pct=2.0, max_levels=10):
+    """
+    Bir taramanın adaylarını tek simülasyonla doğrular. candidates: [(book_levels, size_usd, min_cost, weights), ...]
+    veya sonuna hedef birim adedi eklenmiş 5'li (None: size_usd / min_cost). Döner: aday başına (passed, reason, sim)
+    — passes_vwap_validation ile aynı.
+    """
+    if not candidates:
+        return []
+    prices, sizes, w = pad_candidates(
+        [c[0] for c in candidates],
+        [c[3] if c[3] is not None else [1.0] * len(c[0]) for c in candidates],
+        max_levels,
+    )
+    target = [
+        float(c[4]) if len(c) > 4 and c[4] is not None else float(c[1]) / max(float(c[2]), 1e-9) for c in candidates
+    ]
+    batch = simulate_vwap_batch(prices, sizes, target, w)
+    out = []
+    for i, c in enumerate(candidates):
+        sim = _candidate_sim(batch, i, len(c[0]))
+        if sim["fill_qty"] <= 0:
+            out.append((False, "orderbook depth = 0", sim))
+        elif sim["max_slippage_pct"] > float(max_slippage_pct):
+            out.append((False, f"slippage {sim['max_slippage_pct']:.2f}% > {max_slippage_pct}%", sim))
+        elif not check_min_margin(sim["profit"], min_margin_usd):
+            out.append((False, "vwap profit < min_margin", sim))
+        else:
+            out.append((True, "ok", sim))
+    return out
+
+
+def passes_vwap_validation(book_levels, size_usd, min_cost, min_margin_usd=0.05, max_slippage_pct=2.0, max_levels=10,
+                           weights=None, units=None):
+    """
+    Order book derinliğiyle Layer 3: hedef portföy birimi size_usd / min_cost (units verilirse o; ör. boyutlandırma
+    sonrası son kontrol); bacak l'de weights[l] × birim pay (Layer 1 pozisyonu; None: eşit adet) seviyeler yürünerek
+    alınır.
+    Döner: (passed: bool, reason: str, sim: dict). sim["profit"] gerçekleşebilir kâr (USD).
+    """
+    return vwap_validation_batch(
+        [(book_levels, size_usd, min_cost, weights, units)],
+        min_margin_usd=min_margin_usd, max_slippage_pct=max_slippage_pct, max_levels=max_levels,
+    )[0]
@@ -0,0 +1,122 @@
+"""
+Zincir log önbelleği: data/chain_logs.sqlite (WAL).
+Kontrat başına birden çok kapsama aralığı [from_block, to_block] tutulur (örtüşen/bitişik aralıklar yazılırken
+birleştirilir); aralıklardaki tüm log'lar (ham JSON-RPC biçimi) saklıdır, aradaki boşluklar sonradan doldurulabilir. Yalnızca kesinleşmiş (finalized) bloklar yazılır, böylece reorg'a açık kuyruk
+her çalıştırmada yeniden çekilir. Akış mantığı: alchemy_fetcher.stream_logs.
+"""
+import json
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+CACHE_PATH = ROOT / "data" / "chain_logs.sqlite"
+# Önbellekten okurken tek seferde taranan blok sayısı (bellek sınırı)
+READ_WINDOW_BLOCKS = 1000
+_LOCK = threading.Lock()
+_CONN = None
+
+
+def _conn():
+    """Tek paylaşılan bağlantı (WAL); _LOCK altında çağrılmalı."""
+    global _CONN
+    if _CONN is None:
+        CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(CACHE_PATH), check_same_thread=False, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS logs ("
+            " address TEXT NOT NULL, block_number INTEGER NOT NULL, log_index INTEGER NOT NULL, data TEXT NOT NULL,"
+            " PRIMARY KEY (address, block_number, log_index)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS coverage_ranges ("
+            " address TEXT NOT NULL, from_block INTEGER NOT NULL, to_block INTEGER NOT NULL,"
+            " PRIMARY KEY (address, from_block)) WITHOUT ROWID;"
+        )
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'coverage'").fetchone():
+            # Eski tek aralıklı kapsama tablosu yeni tabloya taşınır
+            conn.executescript(
+                "BEGIN IMMEDIATE;"
+                "INSERT OR IGNORE INTO coverage_ranges (address, from_block, to_block)"
+                " SELECT address, from_block, finalized_block FROM coverage WHERE finalized_block >= from_block;"
+                "DROP TABLE coverage;"
+                "COMMIT;"
+            )
+        _CONN = conn
+    return _CONN
+
+
+def get_coverage(address):
+    """Kapsama aralıkları [(from_block, to_block), ...] blok sırasıyla; önbellek boşsa []."""
+    with _LOCK:
+        rows = _conn().execute(
+            "SELECT from_block, to_block FROM coverage_ranges WHERE address = ? ORDER BY from_block", (str(address).lower(),)
+        ).fetchall()
+    return [tuple(r) for r in rows]
+
+
+def store(address, logs, coverage=None):
+    """
+    Log'ları yazar (aynı blok/log_index üzerine yazılır); coverage=(from_block, to_block) verilirse aralık aynı
+    işlemde kapsamaya eklenir ve örtüşen/bitişik aralıklarla birleştirilir. Log'lar kesinleşmiş bloklardan olmalı.
+    """
+    address = str(address).lower()
+    rows = [
+        (address, int(log["blockNumber"]), int(log.get("logIndex") or 0), json.dumps(log, separators=(",", ":")))
+        for log in logs
+    ]
+    with _LOCK:
+        conn = _conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if rows:
+                conn.executemany("INSERT OR REPLACE INTO logs (address, block_number, log_index, data) VALUES (?, ?, ?, ?)", rows)
+            if coverage is not None and int(coverage[1]) >= int(coverage[0]):
+                lo, hi = int(coverage[0]), int(coverage[1])
+                # Örtüşen veya bitişik aralıklar tek aralıkta birleştirilir
+                touching = (address, hi + 1, lo - 1)
+                merged = conn.execute(
+                    "SELECT MIN(from_block), MAX(to_block) FROM coverage_ranges"
+                    " WHERE address = ? AND from_block <= ? AND to_block >= ?",
+                    touching,
+                ).fetchone()
+                if merged[0] is not None:
+                    lo, hi = min(lo, merged[0]), max(hi, merged[1])
+                conn.execute("DELETE FROM coverage_ranges WHERE address = ? AND from_block <= ? AND to_block >= ?", touching)
+                conn.execute("INSERT INTO coverage_ranges (address, from_block, to_block) VALUES (?, ?, ?)", (address, lo, hi))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def clear(address):
+    """Kontratın log'larını ve tüm kapsama aralıklarını siler."""
+    address = str(address).lower()
+    with _LOCK:
+        conn = _conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM logs WHERE address = ?", (address,))
+            conn.execute("DELETE FROM coverage_ranges WHERE address = ?", (address,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def iter_cached(address, from_block, to_block, window=READ_WINDOW_BLOCKS):
+    """from_block..to_block önbellek log'larını pencere pencere üretir: (start, end, logs), blok sırasıyla."""
+    address = str(address).lower()
+    start = from_block
+    while start <= to_block:
+        end = min(start + window - 1, to_block)
+        with _LOCK:
+            rows = _conn().execute(
+                "SELECT data FROM logs WHERE address = ? AND block_number BETWEEN ? AND ? ORDER BY block_number, log_index",
+                (address, start, end),
+            ).fetchall()
+        yield start, end, [json.loads(r[0]) for r in rows]
+        start = end + 1
@@ -0,0 +1,190 @@
+"""
+Canlı zincir log aboneliği: WebSocket üzerinden eth_subscribe ("logs" + "newHeads").
+Yeni log'lar blok başlığı geldikçe (confirm_blocks gecikmeyle) (start, end, logs) parçaları olarak üretilir;
+iter_logs_chunked ile aynı biçim, event_store.record ile birleştirilebilir.
+Boşluk tespiti: her (yeniden) bağlantıda ve başlık numarası atladığında (kaçırılan başlık) son işlenen bloktan
+itibaren parçalı getLogs backfill yapılır; stall_sec boyunca başlık gelmezse bağlantı yenilenir.
+Reorg: removed=true veya geç gelen log zaten üretilmiş bir bloğa aitse sonraki başlıkta o bloktan itibaren aralık yeniden
+çekilip üretilir (start önceki parçaların end'inden küçük olabilir; tüketici aralığı değiştirme olarak ele alır).
+RPC/backfill hataları akışı sonlandırmaz: akış senkron değil sayılır ve sonraki başlık/açılışta yeniden denenir.
+"""
+import json
+import queue
+import threading
+import time
+import sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+DEFAULT_CONFIRM_BLOCKS = 1
+DEFAULT_STALL_SEC = 30
+
+
+def ws_url_from_rpc(rpc_url):
+    """Alchemy HTTP RPC URL'inden WebSocket URL'i (aynı yol, wss şeması); türetilemezse None."""
+    if rpc_url and "alchemy.com" in rpc_url and rpc_url.startswith("https://"):
+        return "wss://" + rpc_url[len("https://"):]
+    return None
+
+
+def _run_socket(ws_url, address, events, stop, ping_interval, delay_min, delay_max):
+    """Arka plan thread'i: bağlantı + abonelik; mesajları events kuyruğuna koyar, koparsa exp backoff ile yeniden bağlanır."""
+    import websocket
+    state = {"attempt": 0, "app": None, "subs": {}}
+
+    def _on_open(ws):
+        state["attempt"] = 0
+        state["subs"] = {}
+        ws.send(json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe", "params": ["newHeads"]}))
+        ws.send(json.dumps({"jsonrpc": "2.0", "id": 2, "method": "eth_subscribe", "params": ["logs", {"address": address}]}))
+        events.put(("open", None))
+
+    def _on_message(ws, message):
+        try:
+            msg = json.loads(message)
+        except ValueError:
+            return
+        if msg.get("id") in (1, 2) and isinstance(msg.get("result"), str):
+            state["subs"][msg["result"]] = "head" if msg["id"] == 1 else "log"
+            return
+        params = msg.get("params") or {}
+        kind = state["subs"].get(params.get("subscription"))
+        result = params.get("result")
+        if kind and isinstance(result, dict):
+            events.put((kind, result))
+
+    def _on_close(ws, code, reason):
+        events.put(("closed", None))
+
+    def _watch_stop():
+        stop.wait()
+        app = state["app"]
+        if app is not None:
+            try:
+                app.close()
+            except Exception:
+                pass
+
+    def _run():
+        while not stop.is_set():
+            try:
+                app = websocket.WebSocketApp(ws_url, on_open=_on_open, on_message=_on_message, on_close=_on_close)
+                state["app"] = app
+                app.run_forever(ping_interval=ping_interval, ping_timeout=max(1, ping_interval - 1))
+            except Exception:
+                pass
+            if stop.is_set():
+                break
+            state["attempt"] += 1
+            stop.wait(min(delay_max, delay_min * (2 ** (state["attempt"] - 1))))
+
+    threading.Thread(target=_watch_stop, daemon=True).start()
+    threading.Thread(target=_run, daemon=True, name="ws-logs").start()
+    return state
+
+
+def subscribe_logs(ws_url, rpc_url, contract_address, from_block, stop=None, status=None,
+                   confirm_blocks=DEFAULT_CONFIRM_BLOCKS, stall_sec=DEFAULT_STALL_SEC,
+                   ping_interval=10, delay_min=1, delay_max=60, **fetch_kwargs):
+    """
+    from_block'tan itibaren kontrat log'larını canlı üretir: (start, end, logs); contract_address tek adres veya
+    liste (abonelik ve backfill aynı adres filtresini kullanır). stop (threading.Event) set edilene kadar çalışır.
+    status: verilirse {"head", "last_block", "backfills", "reorgs", "reconnects", "errors"} güncellenir.
+    fetch_kwargs: backfill için iter_logs_chunked parametreleri.
+    """
+    from src.alchemy_fetcher import _address_filter, _addresses, _normalize_log, chain_heads, iter_logs_chunked
+    addresses = _addresses(contract_address)
+    stop = stop or threading.Event()
+    status = status if status is not None else {}
+    status.update({"head": None, "last_block": from_block - 1, "backfills": 0, "reorgs": 0, "reconnects": 0, "errors": 0})
+    events = queue.Queue()
+    sock = _run_socket(ws_url, _address_filter(addresses), events, stop, ping_interval, delay_min, delay_max)
+    # Canlı gelen, henüz üretilmemiş bloklar: blok -> {(tx, logIndex): log}
+    live = {}
+    last = from_block - 1
+    prev_head = None
+    reorg_from = None
+    connected = False
+    synced = False
+    last_head_at = time.monotonic()
+
+    def backfill(lo, hi):
+        status["backfills"] += 1
+        for chunk in iter_logs_chunked(rpc_url, addresses, lo, hi, **fetch_kwargs):
+            yield chunk
+        for b in [b for b in live if b <= hi]:
+            del live[b]
+
+    try:
+        while not stop.is_set():
+            try:
+                kind, payload = events.get(timeout=1)
+            except queue.Empty:
+                if connected and time.monotonic() - last_head_at > stall_sec:
+                    # Başlık akışı durdu: bağlantıyı yenile (yeniden açılışta backfill yapılır)
+                    synced = False
+                    last_head_at = time.monotonic()
+                    app = sock["app"]
+                    if app is not None:
+                        app.close()
+                continue
+            if kind == "closed":
+                connected = synced = False
+                status["reconnects"] += 1
+            elif kind == "open":
+                connected = True
+                synced = False
+                last_head_at = time.monotonic()
+            elif kind == "log":
+                b = int(payload.get("blockNumber") or "0x0", 16)
+                key = (payload.get("transactionHash"), payload.get("logIndex"))
+                if b <= last:
+                    # Üretilmiş blok değişti (removed veya geç gelen log): sonraki başlıkta o bloktan yeniden çekilir
+                    reorg_from = b if reorg_from is None else min(reorg_from, b)
+                elif payload.get("removed"):
+                    live.get(b, {}).pop(key, None)
+                else:
+                    live.setdefault(b, {})[key] = _normalize_log(payload)
+            elif kind == "head":
+                n = int(payload.get("number") or "0x0", 16)
+                last_head_at = time.monotonic()
+                status["head"] = n
+            try:
+                if connected and not synced and kind in ("open", "head"):
+                    # (Yeniden) bağlantı veya önceki hata: o ana kadar çıkmış bloklar getLogs ile tamamlanır,
+                    # sonrakiler canlı tampondan gelir
+                    latest, _ = chain_heads(rpc_url)
+                    if latest > last:
+                        yield from backfill(last + 1, latest)
+                        last = latest
+                    prev_head = latest
+                    synced = True
+                elif kind == "head" and synced:
+                    if reorg_from is not None:
+                        status["reorgs"] += 1
+                        yield from backfill(reorg_from, last)
+                        reorg_from = None
+                    target = n - confirm_blocks
+                    if prev_head is not None and n > prev_head + 1:
+                        # Kaçırılan başlık: aradaki log'lar eksik olabilir, getLogs ile doldurulur
+                        if target > last:
+                            yield from backfill(last + 1, target)
+                            last = target
+                    elif target > last:
+                        logs = []
+                        for b in range(last + 1, target + 1):
+                            block_logs = live.pop(b, None)
+                            if block_logs:
+                                logs.extend(sorted(block_logs.values(), key=lambda log: log.get("logIndex") or 0))
+                        yield last + 1, target, logs
+                        last = target
+                    prev_head = n
+            except Exception:
+                # RPC/backfill hatası: akış senkron değil sayılır, sonraki başlıkta veya açılışta son işlenen bloktan
+                # yeniden denenir (yarım backfill'in üretilmiş parçaları yeniden üretilir)
+                status["errors"] += 1
+                synced = False
+            status["last_block"] = last
+    finally:
+        stop.set()
@@ -1,76 +1,212 @@
-"""Manuel doğrulama kuyruğu: data/manual_review_queue.json."""
+"""
+Manuel doğrulama kuyruğu: data/manual_review_queue.sqlite (WAL).
+id'ler monoton (AUTOINCREMENT); status ve çift anahtarı indeksli. Aynı çift + fiyat için bekleyen kayıt varsa
+yeni kayıt açılmaz, mevcut kaydın seen_count/last_seen alanları güncellenir (taramalar arası tekilleştirme).
+Eski data/manual_review_queue.json ilk açılışta içe aktarılır ve .migrated uzantısıyla saklanır.
+"""
 import json
+import sqlite3
 import sys
+import threading
+import time
 from pathlib import Path
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
+DB_PATH = ROOT / "data" / "manual_review_queue.sqlite"
+# Eski JSON kuyruğu (yalnızca içe aktarma için)
 QUEUE_PATH = ROOT / "data" / "manual_review_queue.json"
+# Tekilleştirmede fiyat anahtarı: min_cost bu basamağa yuvarlanır
+PRICE_KEY_DECIMALS = 4
+_LOCK = threading.Lock()
+_CONN = None
 
 
-def _load():
-    if not QUEUE_PATH.exists():
-        return []
+def _conn():
+    """Tek paylaşılan bağlantı (WAL); _LOCK altında çağrılmalı."""
+    global _CONN
+    if _CONN is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(DB_PATH), check_same_thread=False, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, status TEXT NOT NULL, pair_key TEXT NOT NULL,"
+            " price_key TEXT NOT NULL, created_at REAL NOT NULL, last_seen REAL NOT NULL,"
+            " seen_count INTEGER NOT NULL DEFAULT 1, data TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_items_status ON items(status, id);"
+            "CREATE INDEX IF NOT EXISTS idx_items_pair ON items(pair_key, status, price_key);"
+        )
+        if QUEUE_PATH.exists() and conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0:
+            _import_legacy_json(conn)
+        _CONN = conn
+    return _CONN
+
+
+def _import_legacy_json(conn):
+    """
+    JSON kuyruğunu taşır; dosya .migrated olarak yeniden adlandırılır. Geçerli ve tekil id'ler korunur;
+    eksik/geçersiz/tekrarlanan id'li kayıtlar AUTOINCREMENT ile yeni id alır (eski id data'da legacy_id olarak kalır).
+    Okuma veya yazma hatasında işlem geri alınır ve RuntimeError yükseltilir (bağlantı kurulmaz, sonraki açılışta tekrar denenir).
+    """
     try:
         with open(QUEUE_PATH) as f:
-            return json.load(f)
-    except Exception:
-        return []
+            items = json.load(f) or []
+    except Exception as e:
+        raise RuntimeError(f"{QUEUE_PATH} okunamadı, kuyruk içe aktarılamadı: {e}") from e
+    now = time.time()
+    used = set()
+    keep, renumber = [], []
+    for x in items:
+        if not isinstance(x, dict):
+            continue
+        item_id = x.get("id")
+        if isinstance(item_id, int) and not isinstance(item_id, bool) and item_id > 0 and item_id not in used:
+            used.add(item_id)
+            keep.append((item_id, x))
+        else:
+            renumber.append((None, dict(x, legacy_id=item_id) if "id" in x else x))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Korunan id'ler önce yazılır; yeni id'ler bunların en büyüğünden sonra atanır
+        for item_id, x in keep + renumber:
+            pair_key, price_key = _dedup_keys(x)
+            conn.execute(
+                "INSERT INTO items (id, status, pair_key, price_key, created_at, last_seen, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (item_id, x.get("status") or "pending", pair_key, price_key, now, now, json.dumps(x, ensure_ascii=False)),
+            )
+        conn.execute("COMMIT")
+    except Exception as e:
+        conn.execute("ROLLBACK")
+        raise RuntimeError(f"{QUEUE_PATH} içe aktarılamadı: {e}") from e
+    try:
+        QUEUE_PATH.replace(QUEUE_PATH.with_name(QUEUE_PATH.name + ".migrated"))
+    except OSError:
+        pass
+
+
+def _dedup_keys(item):
+    """(pair_key, price_key): çift modu piyasa id'leri, event modu sıralı piyasa id listesi; fiyat min_cost."""
+    if item.get("market_ids"):
+        pair_key = "event:" + ",".join(sorted(str(i) for i in item["market_ids"]))
+    elif item.get("market_a_id") or item.get("market_b_id"):
+        pair_key = f"{item.get('market_a_id', '')}|{item.get('market_b_id', '')}"
+    else:
+        pair_key = f"q:{item.get('market_a', '')}|{item.get('market_b', '')}"
+    try:
+        price_key = f"{float(item.get('min_cost')):.{PRICE_KEY_DECIMALS}f}"
+    except (TypeError, ValueError):
+        price_key = ""
+    return pair_key, price_key
 
 
-def _save(items):
-    QUEUE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(QUEUE_PATH, "w") as f:
-        json.dump(items, f, indent=2, ensure_ascii=False)
+def _row_to_item(row):
+    item_id, status, seen_count, last_seen, data = row
+    try:
+        item = json.loads(data)
+    except Exception:
+        item = {}
+    item.update({"id": item_id, "status": status, "seen_count": seen_count, "last_seen": last_seen})
+    return item
 
 
 def add(item):
-    """Kuyruğa ekle. item: dict (market_a, market_b, combinations, dependency, ...)."""
-    items = _load()
-    item["id"] = len(items) + 1
+    """
+    Kuyruğa ekle. item: dict (market_a, market_b, combinations, dependency, ...).
+    Aynı çift + fiyat için bekleyen kayıt varsa onun id'si döner (seen_count artar).
+    """
+    pair_key, price_key = _dedup_keys(item)
+    now = time.time()
+    with _LOCK:
+        conn = _conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM items WHERE pair_key = ? AND status = 'pending' AND price_key = ? LIMIT 1",
+                (pair_key, price_key),
+            ).fetchone()
+            if row is not None:
+                item_id = row[0]
+                conn.execute("UPDATE items SET seen_count = seen_count + 1, last_seen = ? WHERE id = ?", (now, item_id))
+            else:
+                cur = conn.execute(
+                    "INSERT INTO items (status, pair_key, price_key, created_at, last_seen, data) VALUES ('pending', ?, ?, ?, ?, ?)",
+                    (pair_key, price_key, now, now, json.dumps(item, ensure_ascii=False, default=str)),
+                )
+                item_id = cur.lastrowid
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    item["id"] = item_id
     item["status"] = "pending"
-    items.append(item)
-    _save(items)
-    return item["id"]
+    return item_id
+
+
+def _select(where="", params=(), limit=None):
+    sql = f"SELECT id, status, seen_count, last_seen, data FROM items{where} ORDER BY id"
+    if limit is not None:
+        sql = f"SELECT * FROM ({sql} DESC LIMIT {int(limit)}) ORDER BY id"
+    with _LOCK:
+        try:
+            rows = _conn().execute(sql, params).fetchall()
+        except Exception:
+            return []
+    return [_row_to_item(r) for r in rows]
+
 
+def get_all(limit=None):
+    """Tüm kuyruk kayıtlarını döner (id sırasıyla); limit verilirse en yeni N kayıt."""
+    return _select(limit=limit)
 
-def get_all():
-    """Tüm kuyruk kayıtlarını döner."""
-    return _load()
 
+def get_pending(limit=None):
+    """Bekleyen (status=pending) kayıtları döner; limit verilirse en yeni N kayıt."""
+    return _select(" WHERE status = ?", ("pending",), limit=limit)
 
-def get_pending():
-    """Bekleyen (status=pending) kayıtları döner."""
-    return [x for x in _load() if x.get("status") == "pending"]
+
+def get_by_pair(market_a_id, market_b_id, status=None):
+    """Bir çiftin kayıtları (pair indeksi)."""
+    pair_key, _ = _dedup_keys({"market_a_id": market_a_id, "market_b_id": market_b_id})
+    if status:
+        return _select(" WHERE pair_key = ? AND status = ?", (pair_key, status))
+    return _select(" WHERE pair_key = ?", (pair_key,))
+
+
+def count_by_status():
+    """{"pending": n, "approved": n, ...}."""
+    with _LOCK:
+        try:
+            rows = _conn().execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall()
+        except Exception:
+            return {}
+    return dict(rows)
+
+
+def _set_status(item_id, status, audit_action):
+    with _LOCK:
+        conn = _conn()
+        row = conn.execute("SELECT data FROM items WHERE id = ?", (item_id,)).fetchone()
+        if row is None:
+            return
+        conn.execute("UPDATE items SET status = ? WHERE id = ?", (status, item_id))
+    try:
+        market_a = json.loads(row[0]).get("market_a", "")
+    except Exception:
+        market_a = ""
+    try:
+        from src.audit_log import append_to_audit
+        append_to_audit(audit_action, {"id": item_id, "market_a": str(market_a)[:80]})
+    except Exception:
+        pass
 
 
 def approve(item_id):
     """Onayla."""
-    items = _load()
-    for x in items:
-        if x.get("id") == item_id:
-            x["status"] = "approved"
-            _save(items)
-            try:
-                from src.audit_log import append_to_audit
-                append_to_audit("queue_approve", {"id": item_id, "market_a": str(x.get("market_a", ""))[:80]})
-            except Exception:
-                pass
-            return
-    _save(items)
+    _set_status(item_id, "approved", "queue_approve")
 
 
 def reject(item_id):
     """Reddet."""
-    items = _load()
-    for x in items:
-        if x.get("id") == item_id:
-            x["status"] = "rejected"
-            _save(items)
-            try:
-                from src.audit_log import append_to_audit
-                append_to_audit("queue_reject", {"id": item_id, "market_a": str(x.get("market_a", ""))[:80]})
-            except Exception:
-                pass
-            return
-    _save(items)
+    _set_status(item_id, "rejected", "queue_reject")
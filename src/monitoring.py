@@ -1,77 +1,230 @@
-"""İzleme: metrikler (fırsat, execution, PnL, drawdown) — data/metrics.json, data/metrics_history.json."""
+"""
+İzleme: metrikler (fırsat, execution, PnL, drawdown) — data/metrics.sqlite (WAL).
+Sayaçlar süreç içinde biriktirilir ve FLUSH_INTERVAL_SEC aralıkla tek işlemde (delta olarak) yazılır; kayıttan sonra
+yeni kayıt gelmese de (sessiz dönem, tepkisel thread) bekleyenler daemon zamanlayıcıyla en geç bu sürede yazılır.
+Her flush bir grafik snapshot'ı ekler. Dakika/5 dk/saat oranları saniye başına kova halkasından (array) okunur. Eski data/metrics.json ve metrics_history.json ilk açılışta içe aktarılır.
+get_metrics yan etkisizdir ve önbelleklidir; alert'ler yalnızca evaluate_alerts ile (ör. tarama sonunda) değerlendirilir.
+Olay geçmişi ve pipeline çalıştırmaları: data/event_history.json, data/pipeline_runs.json.
+"""
+import atexit
 import json
+from array import array
+import sqlite3
 import time
 import sys
+import threading
 from pathlib import Path
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
+METRICS_DB_PATH = ROOT / "data" / "metrics.sqlite"
+# Eski JSON depoları (yalnızca ilk açılışta içe aktarma için)
 METRICS_PATH = ROOT / "data" / "metrics.json"
 HISTORY_PATH = ROOT / "data" / "metrics_history.json"
 EVENT_HISTORY_PATH = ROOT / "data" / "event_history.json"
 PIPELINE_RUNS_PATH = ROOT / "data" / "pipeline_runs.json"
-MAX_TIMESTAMPS = 120
-MAX_HISTORY = 500
+MAX_HISTORY = 10000
+# Oran kovaları: saniye başına bir kova, en uzun pencere (1 saat) kadar
+RATE_WINDOW_SEC = 3600
+RATE_KINDS = ("opportunity", "execution")
+FLUSH_INTERVAL_SEC = 1.0
 MAX_EVENT_HISTORY = 100
 MAX_PIPELINE_RUNS = 30
+# Pipeline çiftleri thread havuzunda değerlendirildiğinden oku-değiştir-yaz işlemleri kilitli
+_LOCK = threading.RLock()
+_CONN = None
+# Yalnızca okuyan süreçlerin (ör. dashboard) salt-okunur bağlantısı; veritabanını oluşturmaz, içe aktarma yapmaz
+_RO_CONN = None
+_LAST_FLUSH = [0.0]
+# Bekleyen sayaç varken kurulan tek seferlik flush zamanlayıcısı (threading.Timer, daemon)
+_FLUSH_TIMER = [None]
 
 
-def _load():
-    if not METRICS_PATH.exists():
-        return {"opportunities_count": 0, "executions_count": 0, "executions_success": 0, "total_pnl": 0.0, "peak_pnl": 0.0, "avg_latency_ms": 0.0, "updated_at": None, "opportunity_timestamps": [], "execution_timestamps": []}
-    try:
-        with open(METRICS_PATH) as f:
-            m = json.load(f)
-        if "opportunity_timestamps" not in m:
-            m["opportunity_timestamps"] = []
-        if "execution_timestamps" not in m:
-            m["execution_timestamps"] = []
-        return m
-    except Exception:
-        return {"opportunities_count": 0, "executions_count": 0, "executions_success": 0, "total_pnl": 0.0, "peak_pnl": 0.0, "avg_latency_ms": 0.0, "updated_at": None, "opportunity_timestamps": [], "execution_timestamps": []}
+def _empty_pending():
+    # pnl_peak_delta: bekleyen PnL deltalarının en yüksek ara toplamı (peak_pnl hesabı için)
+    return {"opportunities": 0, "executions": 0, "success": 0, "pnl": 0.0, "pnl_peak_delta": 0.0, "latency_sum": 0.0, "buckets": {}}
+
+
+_PENDING = _empty_pending()
+# kind -> (saniyeler, sayılar): kova i = epoch_sn % RATE_WINDOW_SEC; saniye eşleşmiyorsa kova eskidir
+_RATES = {kind: (array("q", [0]) * RATE_WINDOW_SEC, array("l", [0]) * RATE_WINDOW_SEC) for kind in RATE_KINDS}
+# Halkanın yansıttığı veritabanı sürümü (PRAGMA data_version; başka süreç yazınca değişir)
+_RATES_DB_VERSION = [None]
+# Süreç içi sürüm (her kayıt/flush artırır) ve get_metrics önbelleği: anahtar (data_version, sürüm, saniye)
+_VERSION = [0]
+_METRICS_CACHE = {"key": None, "value": None}
+
+
+def _now_iso():
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
 
-def _save(m):
-    METRICS_PATH.parent.mkdir(parents=True, exist_ok=True)
-    m["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-    with open(METRICS_PATH, "w") as f:
-        json.dump(m, f, indent=2)
-    # Snapshot for charts
-    peak = m.get("peak_pnl", 0) or 1
-    drawdown_pct = ((peak - m.get("total_pnl", 0)) / peak * 100) if peak > 0 else 0
-    snap = {"ts": m["updated_at"], "opportunities_count": m.get("opportunities_count", 0), "executions_count": m.get("executions_count", 0), "total_pnl": m.get("total_pnl", 0), "drawdown_pct": round(drawdown_pct, 2), "avg_latency_ms": round(m.get("avg_latency_ms", 0), 2)}
-    _append_history(snap)
+def _conn():
+    """Paylaşılan bağlantı; _LOCK altında çağrılmalı."""
+    global _CONN
+    if _CONN is None:
+        METRICS_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(METRICS_DB_PATH), check_same_thread=False, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(
+            "CREATE TABLE IF NOT EXISTS counters ("
+            " id INTEGER PRIMARY KEY CHECK (id = 1), opportunities_count INTEGER NOT NULL DEFAULT 0,"
+            " executions_count INTEGER NOT NULL DEFAULT 0, executions_success INTEGER NOT NULL DEFAULT 0,"
+            " total_pnl REAL NOT NULL DEFAULT 0, peak_pnl REAL NOT NULL DEFAULT 0,"
+            " latency_sum_ms REAL NOT NULL DEFAULT 0, updated_at TEXT);"
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " epoch REAL NOT NULL, ts TEXT NOT NULL, opportunities_count INTEGER, executions_count INTEGER,"
+            " total_pnl REAL, drawdown_pct REAL, avg_latency_ms REAL);"
+            "CREATE INDEX IF NOT EXISTS idx_snapshots_epoch ON snapshots(epoch);"
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            " kind TEXT NOT NULL, sec INTEGER NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (kind, sec)) WITHOUT ROWID;"
+        )
+        if conn.execute("SELECT COUNT(*) FROM counters").fetchone()[0] == 0:
+            _import_legacy_json(conn)
+        conn.commit()
+        _CONN = conn
+    return _CONN
 
 
-def _append_history(snap):
+def _read_conn():
+    """
+    Okuma bağlantısı; _LOCK altında çağrılmalı. Bu süreç yazdıysa paylaşılan bağlantı, değilse salt-okunur
+    (mode=ro) bağlantı. Veritabanı dosyası yoksa None (boş metrikler) — dosya oluşturulmaz.
+    """
+    global _RO_CONN
+    if _CONN is not None:
+        return _CONN
+    if _RO_CONN is None:
+        if not METRICS_DB_PATH.exists():
+            return None
+        _RO_CONN = sqlite3.connect(f"{METRICS_DB_PATH.as_uri()}?mode=ro", uri=True, check_same_thread=False, timeout=10)
+    return _RO_CONN
+
+
+def _import_legacy_json(conn):
+    """Eski metrics.json sayaçlarını ve metrics_history.json snapshot'larını taşır."""
+    m = {}
+    try:
+        if METRICS_PATH.exists():
+            with open(METRICS_PATH) as f:
+                m = json.load(f) or {}
+    except Exception:
+        m = {}
+    ec = int(m.get("executions_count", 0) or 0)
+    conn.execute(
+        "INSERT INTO counters VALUES (1, ?, ?, ?, ?, ?, ?, ?)",
+        (int(m.get("opportunities_count", 0) or 0), ec, int(m.get("executions_success", 0) or 0),
+         float(m.get("total_pnl", 0) or 0), float(m.get("peak_pnl", 0) or 0),
+         float(m.get("avg_latency_ms", 0) or 0) * ec, m.get("updated_at")),
+    )
     try:
-        history = []
         if HISTORY_PATH.exists():
             with open(HISTORY_PATH) as f:
-                history = json.load(f)
-        history.append(snap)
-        if len(history) > MAX_HISTORY:
-            history = history[-MAX_HISTORY:]
-        with open(HISTORY_PATH, "w") as f:
-            json.dump(history, f, indent=0)
+                history = json.load(f) or []
+            from datetime import datetime
+            rows = []
+            for h in history:
+                epoch = datetime.fromisoformat(str(h.get("ts")).replace("Z", "+00:00")).timestamp()
+                rows.append((epoch, h.get("ts"), h.get("opportunities_count", 0), h.get("executions_count", 0),
+                             h.get("total_pnl", 0), h.get("drawdown_pct", 0), h.get("avg_latency_ms", 0)))
+            conn.executemany("INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
     except Exception:
         pass
 
 
+def _derive(row):
+    """counters satırı -> metrik dict (drawdown, ortalama gecikme, başarı oranı)."""
+    opp, ec, es, pnl, peak, lat_sum, updated_at = row
+    m = {
+        "opportunities_count": opp,
+        "executions_count": ec,
+        "executions_success": es,
+        "total_pnl": pnl,
+        "peak_pnl": peak,
+        "avg_latency_ms": (lat_sum / ec) if ec else 0.0,
+        "updated_at": updated_at,
+    }
+    peak = peak or 1
+    m["drawdown_pct"] = ((peak - pnl) / peak * 100) if peak > 0 else 0
+    m["execution_success_rate"] = (es / ec * 100) if ec else 0
+    return m
+
+
+def flush():
+    """Bekleyen sayaçları tek işlemde yazar ve bir snapshot ekler. Yazılacak bir şey yoksa işlem yapmaz."""
+    with _LOCK:
+        p = _PENDING
+        _LAST_FLUSH[0] = time.monotonic()
+        if _FLUSH_TIMER[0] is not None:
+            _FLUSH_TIMER[0].cancel()
+            _FLUSH_TIMER[0] = None
+        if not (p["opportunities"] or p["executions"]):
+            return
+        try:
+            conn = _conn()
+            ts = _now_iso()
+            conn.execute(
+                "UPDATE counters SET opportunities_count = opportunities_count + ?,"
+                " executions_count = executions_count + ?, executions_success = executions_success + ?,"
+                " peak_pnl = MAX(peak_pnl, total_pnl + ?), total_pnl = total_pnl + ?,"
+                " latency_sum_ms = latency_sum_ms + ?, updated_at = ? WHERE id = 1",
+                (p["opportunities"], p["executions"], p["success"], p["pnl_peak_delta"], p["pnl"], p["latency_sum"], ts),
+            )
+            conn.executemany(
+                "INSERT INTO rate_buckets VALUES (?, ?, ?) ON CONFLICT(kind, sec) DO UPDATE SET count = count + excluded.count",
+                [(kind, sec, n) for (kind, sec), n in p["buckets"].items()],
+            )
+            row = conn.execute(
+                "SELECT opportunities_count, executions_count, executions_success, total_pnl, peak_pnl, latency_sum_ms, updated_at"
+                " FROM counters WHERE id = 1"
+            ).fetchone()
+            m = _derive(row)
+            now = time.time()
+            conn.execute(
+                "INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (now, ts, m["opportunities_count"], m["executions_count"], m["total_pnl"],
+                 round(m["drawdown_pct"], 2), round(m["avg_latency_ms"], 2)),
+            )
+            conn.execute("DELETE FROM rate_buckets WHERE sec <= ?", (int(now) - RATE_WINDOW_SEC,))
+            conn.execute("DELETE FROM snapshots WHERE rowid <= (SELECT MAX(rowid) FROM snapshots) - ?", (MAX_HISTORY,))
+            conn.commit()
+            _PENDING.update(_empty_pending())
+            _VERSION[0] += 1
+        except Exception:
+            pass
+
+
+atexit.register(flush)
+
+
+def _maybe_flush():
+    """Aralık dolduysa hemen yazar; dolmadıysa kalan süre sonunda yazacak zamanlayıcıyı kurar. _LOCK altında çağrılmalı."""
+    remaining = FLUSH_INTERVAL_SEC - (time.monotonic() - _LAST_FLUSH[0])
+    if remaining <= 0:
+        flush()
+    elif _FLUSH_TIMER[0] is None:
+        timer = threading.Timer(remaining, flush)
+        timer.daemon = True
+        _FLUSH_TIMER[0] = timer
+        timer.start()
+
+
 def record_event(event_type, detail=None):
     """Olay geçmişine ekler (fırsat/execution bilgilendirme). event_type: 'opportunity'|'execution', detail: dict."""
     try:
         EVENT_HISTORY_PATH.parent.mkdir(parents=True, exist_ok=True)
-        events = []
-        if EVENT_HISTORY_PATH.exists():
-            with open(EVENT_HISTORY_PATH) as f:
-                events = json.load(f)
-        ts = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-        events.append({"ts": ts, "type": event_type, "detail": detail or {}})
-        if len(events) > MAX_EVENT_HISTORY:
-            events = events[-MAX_EVENT_HISTORY:]
-        with open(EVENT_HISTORY_PATH, "w") as f:
-            json.dump(events, f, indent=0, ensure_ascii=False)
+        with _LOCK:
+            events = []
+            if EVENT_HISTORY_PATH.exists():
+                with open(EVENT_HISTORY_PATH) as f:
+                    events = json.load(f)
+            ts = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            events.append({"ts": ts, "type": event_type, "detail": detail or {}})
+            if len(events) > MAX_EVENT_HISTORY:
+                events = events[-MAX_EVENT_HISTORY:]
+            with open(EVENT_HISTORY_PATH, "w") as f:
+                json.dump(events, f, indent=0, ensure_ascii=False)
     except Exception:
         pass
 
@@ -119,52 +272,141 @@ def get_pipeline_runs(limit=15):
 
 
 def record_opportunity():
-    """Bir fırsat tespit edildi."""
-    m = _load()
-    m["opportunities_count"] = m.get("opportunities_count", 0) + 1
-    ts = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-    m["opportunity_timestamps"] = (m.get("opportunity_timestamps") or [])[-MAX_TIMESTAMPS:] + [ts]
-    _save(m)
+    """Bir fırsat tespit edildi (bellekte birikir, FLUSH_INTERVAL_SEC'te yazılır)."""
+    with _LOCK:
+        _PENDING["opportunities"] += 1
+        _count_event("opportunity", int(time.time()))
+        _VERSION[0] += 1
+        _maybe_flush()
 
 
 def record_execution(success, pnl_usd=0.0, latency_ms=0.0):
     """Bir execution (paper veya live) kaydedildi."""
-    m = _load()
-    m["executions_count"] = m.get("executions_count", 0) + 1
-    if success:
-        m["executions_success"] = m.get("executions_success", 0) + 1
-    m["total_pnl"] = m.get("total_pnl", 0) + float(pnl_usd)
-    m["peak_pnl"] = max(m.get("peak_pnl", 0), m["total_pnl"])
-    n = m["executions_count"]
-    old_avg = m.get("avg_latency_ms", 0) * (n - 1) if n > 1 else 0
-    m["avg_latency_ms"] = (old_avg + latency_ms) / n if n else 0
-    ts = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
-    m["execution_timestamps"] = (m.get("execution_timestamps") or [])[-MAX_TIMESTAMPS:] + [ts]
-    _save(m)
-
-
-def _count_last_minute(timestamps):
-    """Son 60 saniyedeki ISO timestamp sayısı."""
-    if not timestamps:
-        return 0
+    with _LOCK:
+        p = _PENDING
+        p["executions"] += 1
+        if success:
+            p["success"] += 1
+        p["pnl"] += float(pnl_usd)
+        p["pnl_peak_delta"] = max(p["pnl_peak_delta"], p["pnl"])
+        p["latency_sum"] += float(latency_ms or 0)
+        _count_event("execution", int(time.time()))
+        _VERSION[0] += 1
+        _maybe_flush()
+
+
+def _ring_add(kind, sec, n=1):
+    secs, counts = _RATES[kind]
+    i = sec % RATE_WINDOW_SEC
+    if secs[i] != sec:
+        secs[i] = sec
+        counts[i] = 0
+    counts[i] += n
+
+
+def _count_event(kind, sec):
+    """Olayı halkaya ve bekleyen kovalara ekler; _LOCK altında çağrılmalı."""
+    _ring_add(kind, sec)
+    key = (kind, sec)
+    _PENDING["buckets"][key] = _PENDING["buckets"].get(key, 0) + 1
+
+
+def _sync_rates():
+    """
+    Başka süreç (ör. pipeline) metrik yazdıysa halkayı rate_buckets + bekleyenlerden yeniden kurar.
+    Veritabanı değişmediyse yalnızca PRAGMA data_version okunur; _LOCK altında çağrılmalı.
+    """
     try:
-        from datetime import datetime, timezone
-        cutoff = datetime.now(timezone.utc).timestamp() - 60
-        return sum(1 for t in timestamps if datetime.fromisoformat(t.replace("Z", "+00:00")).timestamp() > cutoff)
+        conn = _read_conn()
+        if conn is None:
+            return
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == _RATES_DB_VERSION[0]:
+            return
+        rows = conn.execute("SELECT kind, sec, count FROM rate_buckets WHERE sec > ?", (int(time.time()) - RATE_WINDOW_SEC,)).fetchall()
     except Exception:
-        return 0
+        return
+    for secs, counts in _RATES.values():
+        for i in range(RATE_WINDOW_SEC):
+            secs[i] = 0
+            counts[i] = 0
+    for kind, sec, n in rows:
+        if kind in _RATES:
+            _ring_add(kind, sec, n)
+    for (kind, sec), n in _PENDING["buckets"].items():
+        _ring_add(kind, sec, n)
+    _RATES_DB_VERSION[0] = version
 
 
-def get_metrics(config=None):
-    """Güncel metrikleri döner; config verilmezse config/monitoring.yaml yüklenir, alert kontrolü yapılır."""
-    m = _load()
-    ec = m.get("executions_count", 0)
-    es = m.get("executions_success", 0)
-    m["execution_success_rate"] = (es / ec * 100) if ec else 0
-    peak = m.get("peak_pnl", 0) or 1
-    m["drawdown_pct"] = ((peak - m.get("total_pnl", 0)) / peak * 100) if peak > 0 else 0
-    m["opportunities_per_min"] = _count_last_minute(m.get("opportunity_timestamps") or [])
-    m["executions_per_min"] = _count_last_minute(m.get("execution_timestamps") or [])
+def _count_since(kind, seconds, now=None):
+    """Son `seconds` saniyedeki olay sayısı; pencere kadar kova taranır (O(kova), ayırma yok)."""
+    secs, counts = _RATES[kind]
+    now = int(time.time()) if now is None else int(now)
+    total = 0
+    for sec in range(now - min(int(seconds), RATE_WINDOW_SEC) + 1, now + 1):
+        i = sec % RATE_WINDOW_SEC
+        if secs[i] == sec:
+            total += counts[i]
+    return total
+
+
+def get_rates(kind):
+    """Kayan pencere sayıları ve dakika başına oranlar: {"1m", "5m", "1h", "per_min_5m", "per_min_1h"}."""
+    with _LOCK:
+        _sync_rates()
+        now = int(time.time())
+        c1, c5, c60 = (_count_since(kind, w, now) for w in (60, 300, 3600))
+    return {"1m": c1, "5m": c5, "1h": c60, "per_min_5m": round(c5 / 5, 2), "per_min_1h": round(c60 / 60, 2)}
+
+
+def get_metrics():
+    """
+    Güncel metrikler (kalıcı sayaçlar + bu süreçte bekleyenler). Yan etkisizdir: alert değerlendirmez, dosya yazmaz;
+    veritabanı salt-okunur açılır (yoksa oluşturulmaz, boş metrik döner).
+    Sonuç önbelleklenir; başka süreç yazdığında (PRAGMA data_version), bu süreç kayıt yaptığında veya saniye
+    değiştiğinde (kayan oran pencereleri) yeniden hesaplanır. Döner: kopya dict.
+    """
+    with _LOCK:
+        try:
+            conn = _read_conn()
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0] if conn is not None else None
+        except Exception:
+            conn, data_version = None, None
+        now = int(time.time())
+        key = (data_version, _VERSION[0], now)
+        if _METRICS_CACHE["key"] == key:
+            return dict(_METRICS_CACHE["value"])
+        row = None
+        if conn is not None:
+            try:
+                row = conn.execute(
+                    "SELECT opportunities_count, executions_count, executions_success, total_pnl, peak_pnl, latency_sum_ms, updated_at"
+                    " FROM counters WHERE id = 1"
+                ).fetchone()
+            except Exception:
+                row = None
+        opp, ec, es, pnl, peak, lat_sum, updated_at = row or (0, 0, 0, 0.0, 0.0, 0.0, None)
+        p = _PENDING
+        m = _derive((
+            opp + p["opportunities"], ec + p["executions"], es + p["success"], pnl + p["pnl"],
+            max(peak, pnl + p["pnl_peak_delta"]), lat_sum + p["latency_sum"], updated_at,
+        ))
+        _sync_rates()
+        m["opportunities_per_min"] = _count_since("opportunity", 60, now)
+        m["executions_per_min"] = _count_since("execution", 60, now)
+        m["opportunities_per_min_5m"] = round(_count_since("opportunity", 300, now) / 5, 2)
+        m["opportunities_per_min_1h"] = round(_count_since("opportunity", 3600, now) / 60, 2)
+        _METRICS_CACHE.update({"key": key, "value": m})
+        return dict(m)
+
+
+def evaluate_alerts(config=None):
+    """
+    Zamanlanmış alert değerlendirmesi (pipeline tarama sonu): bekleyenleri yazar, metrikleri alır,
+    alerts.check_alerts ile geçmişe yazar / e-posta gönderir. config verilmezse config/monitoring.yaml.
+    Döner: uyarı mesajları (list of str).
+    """
+    flush()
     if config is None:
         try:
             from src.config_loader import load_yaml
@@ -173,19 +415,35 @@ def get_metrics(config=None):
             config = {}
     try:
         from src.alerts import check_alerts
-        m["alerts"] = check_alerts(m, config)
+        return check_alerts(get_metrics(), config)
     except Exception:
-        m["alerts"] = []
-    return m
+        return []
 
 
-def get_metrics_history(limit=200):
-    """Son N snapshot'ı döner (grafik için)."""
-    if not HISTORY_PATH.exists():
-        return []
-    try:
-        with open(HISTORY_PATH) as f:
-            h = json.load(f)
-        return h[-limit:] if isinstance(h, list) else []
-    except Exception:
-        return []
+def get_metrics_history(limit=200, since=None, until=None):
+    """
+    Snapshot'lar (grafik için), eskiden yeniye. since/until: epoch saniye aralığı (opsiyonel).
+    Aralık sorgusu epoch indeksini kullanır; en yeni `limit` kayıt döner.
+    """
+    clauses, params = [], []
+    if since is not None:
+        clauses.append("epoch >= ?")
+        params.append(float(since))
+    if until is not None:
+        clauses.append("epoch <= ?")
+        params.append(float(until))
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    with _LOCK:
+        try:
+            conn = _read_conn()
+            if conn is None:
+                return []
+            rows = conn.execute(
+                "SELECT ts, opportunities_count, executions_count, total_pnl, drawdown_pct, avg_latency_ms"
+                f" FROM snapshots{where} ORDER BY epoch DESC LIMIT ?",
+                (*params, int(limit)),
+            ).fetchall()
+        except Exception:
+            return []
+    keys = ("ts", "opportunities_count", "executions_count", "total_pnl", "drawdown_pct", "avg_latency_ms")
+    return [dict(zip(keys, r)) for r in reversed(rows)]
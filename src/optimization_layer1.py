@@ -2,12 +2,71 @@
 Layer 1 (LCMM): Arbitraj var/yok kontrolü.
 Verilen fiyatlar ve geçerli kombinasyonlara göre min maliyet ile her geçerli sonuçta 1$ garantileme.
 Min maliyet < 1 ise arbitraj var.
+İki ikili piyasa (2×2) için vektörel motor: check_arbitrage_batch; diğer durumlarda scipy linprog.
+Karşılıklı dışlayan N piyasalı event'ler (ör. strike aralıkları) için tek seyrek LP: check_event_arbitrage.
 """
 import sys
+from functools import lru_cache
 from pathlib import Path
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
+# İkili çift için sabit sıra: fiyat sütunları ve kombinasyon maskesi sütunları
+BINARY_KEYS = ("market_a_yes", "market_a_no", "market_b_yes", "market_b_no")
+BINARY_COMBINATIONS = (("Evet", "Evet"), ("Evet", "Hayır"), ("Hayır", "Evet"), ("Hayır", "Hayır"))
+ARB_THRESHOLD = 0.999
+
+
+def combinations_to_mask(valid_combinations):
+    """Kombinasyon listesi -> BINARY_COMBINATIONS sırasında 4 elemanlı bool liste."""
+    present = {(c.get("market_a_outcome"), c.get("market_b_outcome")) for c in valid_combinations}
+    return [combo in present for combo in BINARY_COMBINATIONS]
+
+
+@lru_cache(maxsize=1)
+def _cover_table():
+    """
+    Aday pozisyonlar X (16×4, {0,1}) ve covered (16×4): aday c, kombinasyon k'de 1$ öder mi.
+    Kısıt matrisi ikili (bipartite) geliş matrisi → tamamen unimodüler; fiyatlar >= 0 iken LP optimumu
+    {0,1}^4 köşelerinden birindedir, bu yüzden 16 adayın taranması LP ile aynı sonucu verir.
+    """
+    import numpy as np
+    X = np.array([[(c >> i) & 1 for i in range(4)] for c in range(16)], dtype=float)
+    covered = np.zeros((16, 4), dtype=bool)
+    for k, (a_out, b_out) in enumerate(BINARY_COMBINATIONS):
+        ia = 0 if a_out == "Evet" else 1
+        ib = 2 if b_out == "Evet" else 3
+        covered[:, k] = (X[:, ia] > 0) | (X[:, ib] > 0)
+    return X, covered
+
+
+def check_arbitrage_batch(prices, combo_mask, return_positions=False):
+    """
+    Tüm çiftler için tek vektörel çağrı.
+    prices: (pairs, 4) — BINARY_KEYS sırası; combo_mask: (pairs, 4) bool — BINARY_COMBINATIONS sırası.
+    Döner: (has_arb: bool array, min_cost: float array) [, positions: (pairs, 4) alınacak outcome'lar].
+    Geçerli kombinasyonu olmayan veya negatif fiyatlı satırlar: has_arb=False, min_cost=1.0 (check_arbitrage ile aynı).
+    """
+    import numpy as np
+    p = np.asarray(prices, dtype=float).reshape(-1, 4)
+    mask = np.asarray(combo_mask, dtype=bool).reshape(-1, 4)
+    X, covered = _cover_table()
+    costs = p @ X.T
+    # Aday c, maskedeki her kombinasyonu karşılamalı
+    infeasible = (mask[:, None, :] & ~covered[None, :, :]).any(axis=2)
+    costs[infeasible] = np.inf
+    best = costs.argmin(axis=1)
+    rows = np.arange(len(p))
+    min_cost = costs[rows, best]
+    invalid = ~mask.any(axis=1) | (p < 0).any(axis=1) | ~np.isfinite(min_cost)
+    min_cost[invalid] = 1.0
+    has_arb = (min_cost < ARB_THRESHOLD) & ~invalid
+    if return_positions:
+        positions = X[best]
+        positions[invalid] = 0.0
+        return has_arb, min_cost, positions
+    return has_arb, min_cost
+
 
 def check_arbitrage(prices_outcomes, valid_combinations, timeout=0.1):
     """
@@ -15,41 +74,126 @@ def check_arbitrage(prices_outcomes, valid_combinations, timeout=0.1):
     valid_combinations: list of dict, örn. [{"market_a_outcome": "Evet", "market_b_outcome": "Evet"}, ...]
     Döner: (has_arbitrage: bool, min_cost: float).
     Basit model: her outcome için pozisyon; maliyet = sum(price * pos); her geçerli kombinasyonda payoff >= 1.
+    İkili çiftlerde vektörel motor kullanılır; linprog yalnızca diğer anahtar setleri için.
+    """
+    if set(prices_outcomes) == set(BINARY_KEYS):
+        try:
+            has_arb, min_cost = check_arbitrage_batch(
+                [[float(prices_outcomes[k]) for k in BINARY_KEYS]],
+                [combinations_to_mask(valid_combinations)],
+            )
+            return bool(has_arb[0]), float(min_cost[0])
+        except ImportError:
+            pass
+    return _check_arbitrage_lp(prices_outcomes, valid_combinations, timeout=timeout)
+
+
+@lru_cache(maxsize=256)
+def _constraint_template(keys, combos):
+    """
+    Kısıt şablonu: keys (outcome anahtarları, tuple) ve combos ((a_outcome, b_outcome) tuple'ları, sıralı).
+    Döner: (A_ub, b_ub) — salt okunur numpy dizileri; A_ub zaten negatiflenmiş (A x >= 1 → -A x <= -1).
+    İkili çift için yalnızca 15 boş olmayan kombinasyon alt kümesi olduğundan şablonlar bir kez kurulur.
+    """
+    import numpy as np
+    lowered = [k.lower() for k in keys]
+    A = np.zeros((len(combos), len(keys)))
+    # Eşleme: "Evet" -> _yes, "Hayır" -> _no; market_a / market_b anahtar adından
+    for r, (a_out, b_out) in enumerate(combos):
+        for i, k in enumerate(lowered):
+            if "market_a" in k:
+                out = a_out
+            elif "market_b" in k:
+                out = b_out
+            else:
+                continue
+            if ("yes" in k and out == "Evet") or ("no" in k and out == "Hayır"):
+                A[r, i] = 1.0
+    A_ub = -A
+    b_ub = -np.ones(len(combos))
+    A_ub.flags.writeable = False
+    b_ub.flags.writeable = False
+    return A_ub, b_ub
+
+
+def _check_arbitrage_lp(prices_outcomes, valid_combinations, timeout=0.1):
+    """
+    scipy linprog (HiGHS) ile genel çözüm. Kısıt matrisi _constraint_template önbelleğinden gelir;
+    her çağrıda yalnızca fiyat vektörü değişir.
+    min c^T x  s.t. A x >= 1 (her satır bir geçerli sonuç), x >= 0
     """
     try:
         from scipy.optimize import linprog
     except ImportError:
         return False, 1.0
-
-    # Outcome isimlerini sıralı al
-    keys = list(prices_outcomes.keys())
-    n = len(keys)
-    prices = [float(prices_outcomes[k]) for k in keys]
-    # Geçerli her kombinasyonda hangi outcome'lar TRUE: combination -> hangi indeksler 1
-    # Basitleştirme: combination dict'te market_a_outcome, market_b_outcome var; keys market_a_yes, market_a_no, ...
-    # Eşleme: "Evet" -> _yes, "Hayır" -> _no. keys = [market_a_yes, market_a_no, market_b_yes, market_b_no]
-    # Her valid combination için: o kombinasyonda 1 olan outcome'ların indeksleri
-    A_list = []
-    for combo in valid_combinations:
-        row = [0.0] * n
-        for i, k in enumerate(keys):
-            if "yes" in k.lower() and combo.get("market_a_outcome") == "Evet" and "market_a" in k.lower():
-                row[i] = 1.0
-            elif "no" in k.lower() and combo.get("market_a_outcome") == "Hayır" and "market_a" in k.lower():
-                row[i] = 1.0
-            elif "yes" in k.lower() and combo.get("market_b_outcome") == "Evet" and "market_b" in k.lower():
-                row[i] = 1.0
-            elif "no" in k.lower() and combo.get("market_b_outcome") == "Hayır" and "market_b" in k.lower():
-                row[i] = 1.0
-        A_list.append(row)
-    if not A_list:
+    if not valid_combinations:
         return False, 1.0
-    # min c^T x  s.t. A x >= 1 (her satır bir geçerli sonuç), x >= 0
-    c = prices
-    A_ub = [[-a for a in row] for row in A_list]
-    b_ub = [-1.0] * len(A_list)
+    keys = tuple(prices_outcomes.keys())
+    # Tekrarlanan kombinasyonlar LP'yi değiştirmez; sıralı küme şablon anahtarıdır
+    combos = tuple(sorted({(str(c.get("market_a_outcome")), str(c.get("market_b_outcome"))) for c in valid_combinations}))
+    A_ub, b_ub = _constraint_template(keys, combos)
+    c = [float(prices_outcomes[k]) for k in keys]
     res = linprog(c, A_ub=A_ub, b_ub=b_ub, bounds=(0, None), method="highs", options={"time_limit": timeout})
     if not res.success:
         return False, 1.0
     min_cost = float(res.fun)
-    return min_cost < 0.999, min_cost
+    return min_cost < ARB_THRESHOLD, min_cost
+
+
+@lru_cache(maxsize=64)
+def _event_template(n, exhaustive):
+    """
+    N piyasalı event kısıt şablonu (seyrek, CSR). Değişkenler: [yes_0, no_0, yes_1, no_1, ...].
+    Senaryo s (yalnızca piyasa s Evet): yes_s + sum_{i != s} no_i >= 1.
+    exhaustive=False ise ek "hiçbiri" senaryosu: sum_i no_i >= 1.
+    Döner: (A_ub, b_ub) — negatiflenmiş (<= biçimi).
+    """
+    import numpy as np
+    from scipy import sparse
+    n_rows = n if exhaustive else n + 1
+    rows, cols = [], []
+    for s_idx in range(n):
+        rows.append(s_idx)
+        cols.append(2 * s_idx)
+        for i in range(n):
+            if i != s_idx:
+                rows.append(s_idx)
+                cols.append(2 * i + 1)
+    if not exhaustive:
+        for i in range(n):
+            rows.append(n)
+            cols.append(2 * i + 1)
+    A_ub = sparse.csr_matrix((-np.ones(len(rows)), (rows, cols)), shape=(n_rows, 2 * n))
+    b_ub = -np.ones(n_rows)
+    b_ub.flags.writeable = False
+    return A_ub, b_ub
+
+
+def check_event_arbitrage(yes_prices, no_prices, exhaustive=True, timeout=0.1):
+    """
+    Event'in tüm piyasaları birlikte (karşılıklı dışlayan sonuçlar): tek LP, O(n²) çift yerine.
+    yes_prices, no_prices: uzunluk N. exhaustive: tam olarak bir piyasa Evet çözülür (Polymarket negRisk).
+    Döner: (has_arbitrage: bool, min_cost: float, positions: list of (yes_qty, no_qty)).
+    Not: scipy linprog HiGHS'e sıcak başlangıç (warm start) aktarmaz; şablon matrisi N başına önbelleklenir.
+    """
+    n = len(yes_prices)
+    if n < 2 or len(no_prices) != n:
+        return False, 1.0, []
+    try:
+        from scipy.optimize import linprog
+    except ImportError:
+        return False, 1.0, []
+    c = [0.0] * (2 * n)
+    for i in range(n):
+        c[2 * i] = float(yes_prices[i])
+        c[2 * i + 1] = float(no_prices[i])
+    if min(c) < 0:
+        return False, 1.0, []
+    A_ub, b_ub = _event_template(n, bool(exhaustive))
+    res = linprog(c, A_ub=A_ub, b_ub=b_ub, bounds=(0, None), method="highs", options={"time_limit": timeout})
+    if not res.success:
+        return False, 1.0, []
+    min_cost = float(res.fun)
+    x = res.x
+    positions = [(max(0.0, float(x[2 * i])), max(0.0, float(x[2 * i + 1]))) for i in range(n)]
+    return min_cost < ARB_THRESHOLD, min_cost, positions
@@ -1,37 +1,197 @@
-"""Emir gönderimi: paper modda log, live modda Polymarket CLOB stub."""
+"""
+Emir gönderimi: paper modda log, live modda Polymarket CLOB.
+Live modda bacaklar paylaşılan thread havuzunda paralel gönderilir (config/execution.yaml order_submission):
+leg_timeout_seconds içinde tamamlanmayan veya başarısız bacak olursa gönderilmiş diğer bacaklar iptal edilir
+(tek taraflı pozisyon riskini sınırlamak için); geç tamamlanan bacaklar tamamlandıkları anda iptal edilir.
+Bacaklar önce paralel imzalanır (presign_legs), ardından yalnızca gönderim (tek istek) eşzamanlı yapılır;
+böylece bacaklar arası süre imzalama/meta veri çağrılarından etkilenmez.
+Bacak büyüklüğü pay (share) cinsindendir: leg["qty"] (scale_legs ile Layer 1 pozisyonu × birim sayısı) varsa o,
+yoksa size_usd / price gönderilir.
+"""
+import threading
+import time
 import sys
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
+DEFAULT_LEG_TIMEOUT_SEC = 5
+LEG_POOL_SIZE = 16
+_POOL = None
+_POOL_LOCK = threading.Lock()
 
-def submit_orders_paper(legs, size_usd, reason="paper"):
+
+def _pool():
+    """Bacak gönderimi için paylaşılan havuz (her execution'da thread açma maliyeti olmasın)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=LEG_POOL_SIZE, thread_name_prefix="order-leg")
+        return _POOL
+
+
+def scale_legs(legs, units, prices=None):
+    """
+    Bacak kopyaları, qty = leg["position"] × units (pay). units: portföy birim sayısı (ör. size_usd / min_cost veya
+    boyutlandırmanın döndürdüğü miktar). position'ı olmayan bacağa qty yazılmaz (size_usd / price'a düşer).
+    prices: bacak başına limit fiyat (kitapta qty'nin yürüdüğü en derin seviye); verilirse leg["price"] onunla
+    değişir, böylece en iyi seviyeden derin kısım da dolar (NaN/None: fiyat değişmez).
+    """
+    out = []
+    for i, leg in enumerate(legs):
+        leg = dict(leg)
+        if leg.get("position") is not None:
+            leg["qty"] = round(float(leg["position"]) * float(units), 2)
+        limit = prices[i] if prices is not None and i < len(prices) else None
+        if limit is not None and limit == limit:
+            leg["price"] = round(float(limit), 4)
+        out.append(leg)
+    return out
+
+
+def submit_orders_paper(legs, size_usd, reason="paper", leg_report=None):
     """Paper mod: emir gönderilmez, sadece log. Döner: (success: True, message)."""
+    if leg_report is not None:
+        for leg in legs:
+            leg_report.append({
+                "token_id": leg.get("token_id"), "side": leg.get("side", "BUY"), "price": leg.get("price"),
+                "qty": leg.get("qty"), "status": "paper", "success": True, "latency_ms": 0.0,
+            })
     return True, f"paper:{reason} legs={len(legs)} size_usd={size_usd}"
 
 
-def submit_orders_live(legs, size_usd, env, config):
+def presign_legs(legs, size_usd, env, timeout=DEFAULT_LEG_TIMEOUT_SEC):
     """
-    Live mod: Polymarket CLOB client ile emir (stub).
-    legs: list of {token_id, price, side}; size_usd: pozisyon büyüklüğü.
+    Bacak emirlerini paralel imzalar; başarılı olanlara leg["signed_order"] yazılır. Döner: imzalanan bacak sayısı.
+    Client yoksa (stub) hiçbir şey yapmaz.
     """
-    from src.clob_client import place_order_stub
+    from src.clob_client import get_client, presign_order
+    if not legs or get_client(env) is None:
+        return 0
+    pool = _pool()
+    futures = {
+        pool.submit(
+            presign_order, env, leg.get("token_id", "stub"), leg.get("price", 0.5), size_usd, leg.get("side", "BUY"),
+            shares=leg.get("qty"),
+        ): leg
+        for leg in legs if leg.get("signed_order") is None
+    }
+    done, _ = wait(futures, timeout=timeout)
+    signed = 0
+    for fut in done:
+        try:
+            order = fut.result()
+        except Exception:
+            order = None
+        if order is not None:
+            futures[fut]["signed_order"] = order
+            signed += 1
+    return signed
+
+
+def _send_leg(env, leg, size_usd):
+    """Tek bacak (imzalıysa yalnızca gönderim): (success, message, order_id, latency_ms)."""
+    from src.clob_client import place_order
+    t0 = time.perf_counter()
+    ok, msg, order_id = place_order(
+        env, leg.get("token_id", "stub"), leg.get("price", 0.5), size_usd, leg.get("side", "BUY"),
+        signed_order=leg.get("signed_order"), shares=leg.get("qty"),
+    )
+    return ok, msg, order_id, (time.perf_counter() - t0) * 1000
+
+
+def _cancel_late_leg(env, report):
+    """Zaman aşımından sonra tamamlanan bacağın emrini iptal eder (future done callback)."""
+    def _callback(fut):
+        from src.clob_client import cancel_order
+        try:
+            ok, msg, order_id, latency_ms = fut.result()
+        except Exception as e:
+            report["late_result"] = str(e)
+            return
+        report["latency_ms"] = round(latency_ms, 2)
+        if ok and order_id:
+            cancelled, _ = cancel_order(env, order_id)
+            report["late_result"] = "cancelled" if cancelled else "cancel_failed"
+    return _callback
+
+
+def submit_orders_live(legs, size_usd, env, config, leg_report=None):
+    """
+    Live mod: Polymarket CLOB client ile emir.
+    legs: list of {token_id, price, side, qty}; size_usd: pozisyon büyüklüğü (qty'siz bacakta size_usd / price pay).
+    config: execution.yaml içeriği; order_submission.parallel_legs / leg_timeout_seconds.
+    leg_report: verilirse bacak başına {token_id, side, price, status, success, latency_ms, order_id, message} eklenir.
+    status: posted | failed | timeout | skipped (sıralı modda gönderilmedi) | cancelled (diğer bacak başarısız olduğu için iptal).
+    """
+    from src.clob_client import cancel_order, place_order_stub
     if not legs:
         return place_order_stub(env, token_id="stub", price=0.5, size_usd=size_usd, side="BUY")
-    success_all = True
-    for leg in legs:
-        token_id = leg.get("token_id", "stub")
-        price = leg.get("price", 0.5)
-        side = leg.get("side", "BUY")
-        ok, msg = place_order_stub(env, token_id, price, size_usd, side)
-        if not ok:
-            success_all = False
-    return success_all, f"live legs={len(legs)} size_usd={size_usd}"
-
-
-def submit_orders(legs, size_usd, env, config, execution_mode=None):
-    """execution_mode: 'paper' | 'live'."""
+    sub_cfg = (config or {}).get("order_submission") or {}
+    timeout = float(sub_cfg.get("leg_timeout_seconds", DEFAULT_LEG_TIMEOUT_SEC))
+    reports = [
+        {"token_id": leg.get("token_id"), "side": leg.get("side", "BUY"), "price": leg.get("price"), "qty": leg.get("qty"),
+         "status": "timeout", "success": False, "latency_ms": None, "order_id": None, "message": ""}
+        for leg in legs
+    ]
+    results = [None] * len(legs)
+    if sub_cfg.get("parallel_legs", True) and len(legs) > 1:
+        # İmzalar çağıranın listesini değiştirmesin diye kopyalara yazılır
+        legs = [dict(leg) for leg in legs]
+        started = time.monotonic()
+        presign_legs(legs, size_usd, env, timeout=timeout)
+        pool = _pool()
+        futures = [pool.submit(_send_leg, env, leg, size_usd) for leg in legs]
+        # İmzalama süresi de bacak zaman aşımı bütçesinden düşülür
+        done, _ = wait(futures, timeout=max(0.05, timeout - (time.monotonic() - started)))
+        for i, fut in enumerate(futures):
+            if fut in done:
+                try:
+                    results[i] = fut.result()
+                except Exception as e:
+                    results[i] = (False, str(e), None, None)
+            else:
+                fut.add_done_callback(_cancel_late_leg(env, reports[i]))
+    else:
+        deadline = time.monotonic() + timeout
+        for i, leg in enumerate(legs):
+            if time.monotonic() > deadline:
+                break
+            results[i] = _send_leg(env, leg, size_usd)
+            if not results[i][0]:
+                break
+        for i, result in enumerate(results):
+            if result is None:
+                reports[i]["status"] = "skipped"
+    for report, result in zip(reports, results):
+        if result is None:
+            continue
+        ok, msg, order_id, latency_ms = result
+        report.update({
+            "status": "posted" if ok else "failed", "success": ok, "order_id": order_id, "message": msg,
+            "latency_ms": round(latency_ms, 2) if latency_ms is not None else None,
+        })
+    success_all = all(r["success"] for r in reports)
+    if not success_all:
+        # Tek taraflı pozisyon kalmasın: gönderilmiş bacakların dolmamış kısmı iptal edilir
+        for report in reports:
+            if report["success"]:
+                cancelled, cancel_msg = cancel_order(env, report["order_id"])
+                report.update({"status": "cancelled" if cancelled else "cancel_failed", "success": False})
+                report["message"] = f"{report['message']} | {cancel_msg}"
+    if leg_report is not None:
+        leg_report.extend(reports)
+    counts = {}
+    for r in reports:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    summary = " ".join(f"{k}={v}" for k, v in sorted(counts.items()))
+    return success_all, f"live legs={len(legs)} size_usd={size_usd} {summary}"
+
+
+def submit_orders(legs, size_usd, env, config, execution_mode=None, leg_report=None):
+    """execution_mode: 'paper' | 'live'. leg_report: opsiyonel liste, bacak başına sonuç/gecikme eklenir."""
     mode = execution_mode or env.get("EXECUTION_MODE", "paper")
     if mode == "paper" or env.get("DRY_RUN", "true").lower() == "true":
-        return submit_orders_paper(legs, size_usd)
-    return submit_orders_live(legs, size_usd, env, config)
+        return submit_orders_paper(legs, size_usd, leg_report=leg_report)
+    return submit_orders_live(legs, size_usd, env, config, leg_report=leg_report)
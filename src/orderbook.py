@@ -0,0 +1,257 @@
+"""
+Canlı order book önbelleği: Polymarket CLOB market kanalından (WebSocket) token başına bid/ask seviyeleri.
+`book` mesajı tam görüntüyü, `price_change` mesajı tek seviye güncellemesini uygular.
+Okuma kilitsizdir: her token için değişmez (immutable) bir görüntü tutulur, yazıcı yenisiyle değiştirir.
+Tazelik kitap değişikliğinden bağımsız izlenir: bağlantı açık, son çerçeve (mesaj/pong) yakın zamanda alınmış ve
+token'ın tam görüntüsü bu bağlantıda gelmişse kitap canlıdır (sessiz piyasa bayat sayılmaz).
+"""
+import json
+import threading
+import time
+import sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# token_id -> {"bids": {price: size}, "asks": {price: size}} (yalnızca yazıcı, _WRITE_LOCK altında)
+_LEVELS = {}
+# token_id -> (bids, asks, ts): bids fiyat azalan, asks fiyat artan (price, size) tuple'ları; okuyucular buradan okur
+_BOOKS = {}
+_WRITE_LOCK = threading.Lock()
+_LISTENERS = []
+_STREAM = {"thread": None, "stop": None, "asset_ids": frozenset(), "url": None, "gen": 0}
+_STREAM_LOCK = threading.Lock()
+# Bağlantı canlılığı: epoch her açılışta artar; last_seen son alınan çerçeve (mesaj veya pong) zamanı
+_CONN = {"open": False, "epoch": 0, "last_seen": None, "liveness_sec": 25.0}
+# token_id -> tam görüntünün (book mesajı) alındığı bağlantı epoch'u
+_SYNCED = {}
+# Son drain_updated çağrısından beri kitabı değişen token'lar (artımlı tarama için)
+_DIRTY = set()
+_DIRTY_LOCK = threading.Lock()
+
+
+def _publish(token_id, ts):
+    levels = _LEVELS[token_id]
+    bids = tuple(sorted(levels["bids"].items(), key=lambda x: -x[0]))
+    asks = tuple(sorted(levels["asks"].items(), key=lambda x: x[0]))
+    _BOOKS[token_id] = (bids, asks, ts)
+
+
+def _parse_levels(raw_levels):
+    out = {}
+    for lvl in raw_levels or []:
+        try:
+            price, size = float(lvl["price"]), float(lvl["size"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if size > 0:
+            out[price] = size
+    return out
+
+
+def apply_book(token_id, bids, asks, ts=None):
+    """Tam görüntü: bids/asks [{"price": "0.48", "size": "30"}, ...]."""
+    token_id = str(token_id)
+    with _WRITE_LOCK:
+        _LEVELS[token_id] = {"bids": _parse_levels(bids), "asks": _parse_levels(asks)}
+        if _CONN["open"]:
+            _SYNCED[token_id] = _CONN["epoch"]
+        _publish(token_id, ts or time.time())
+
+
+def apply_price_change(token_id, side, price, size, ts=None):
+    """
+    Tek seviye güncellemesi. side: BUY (bid) | SELL (ask); size 0 seviyeyi siler. Bu bağlantıda tam görüntüsü
+    (book) gelmemiş token'ın güncellemesi yok sayılır (kısmi kitap oluşmaz, eski bağlantının kitabı tazelenmez).
+    """
+    token_id = str(token_id)
+    try:
+        price, size = float(price), float(size)
+    except (TypeError, ValueError):
+        return
+    book_side = "bids" if str(side).upper() == "BUY" else "asks"
+    with _WRITE_LOCK:
+        if _SYNCED.get(token_id) != _CONN["epoch"] or token_id not in _LEVELS:
+            return
+        levels = _LEVELS[token_id][book_side]
+        if size > 0:
+            levels[price] = size
+        else:
+            levels.pop(price, None)
+        _publish(token_id, ts or time.time())
+
+
+def _msg_ts(msg):
+    try:
+        ts = float(msg.get("timestamp"))
+        return ts / 1000.0 if ts > 1e11 else ts
+    except (TypeError, ValueError):
+        return None
+
+
+def handle_message(message):
+    """
+    Ham WebSocket mesajını uygular (tek obje veya liste). Güncellenen token id'lerini (set) döner
+    ve add_listener ile kayıtlı dinleyicileri çağırır.
+    price_change: hem yeni ("price_changes": [{asset_id, price, size, side}]) hem eski ("asset_id" + "changes") biçim.
+    """
+    try:
+        data = json.loads(message) if isinstance(message, (str, bytes)) else message
+    except (json.JSONDecodeError, TypeError):
+        return set()
+    items = data if isinstance(data, list) else [data]
+    updated = set()
+    for msg in items:
+        if not isinstance(msg, dict):
+            continue
+        etype = msg.get("event_type")
+        ts = _msg_ts(msg)
+        if etype == "book" and msg.get("asset_id"):
+            apply_book(msg["asset_id"], msg.get("bids") or msg.get("buys"), msg.get("asks") or msg.get("sells"), ts)
+            updated.add(str(msg["asset_id"]))
+        elif etype == "price_change":
+            for ch in msg.get("price_changes") or []:
+                if ch.get("asset_id"):
+                    apply_price_change(ch["asset_id"], ch.get("side"), ch.get("price"), ch.get("size"), ts)
+                    updated.add(str(ch["asset_id"]))
+            if msg.get("asset_id"):
+                for ch in msg.get("changes") or []:
+                    apply_price_change(msg["asset_id"], ch.get("side"), ch.get("price"), ch.get("size"), ts)
+                updated.add(str(msg["asset_id"]))
+    if updated:
+        with _DIRTY_LOCK:
+            _DIRTY.update(updated)
+        for fn in list(_LISTENERS):
+            try:
+                fn(updated)
+            except Exception:
+                pass
+    return updated
+
+
+def add_listener(fn):
+    """fn(updated_token_ids: set) her uygulanan mesajdan sonra (WebSocket thread'inde) çağrılır."""
+    _LISTENERS.append(fn)
+
+
+def remove_listener(fn):
+    try:
+        _LISTENERS.remove(fn)
+    except ValueError:
+        pass
+
+
+def drain_updated():
+    """Son çağrıdan beri kitabı güncellenen token id'leri (set); küme boşaltılır."""
+    global _DIRTY
+    with _DIRTY_LOCK:
+        out, _DIRTY = _DIRTY, set()
+    return out
+
+
+def is_live(token_id):
+    """
+    Token kitabı canlı abonelikle güncel mi: bağlantı açık, son çerçeve liveness_sec içinde alınmış ve
+    tam görüntü bu bağlantıda gelmiş (yeniden bağlantıdan önceki kitap yeni görüntü gelene kadar canlı sayılmaz).
+    """
+    conn = _CONN
+    if not conn["open"] or conn["last_seen"] is None or time.time() - conn["last_seen"] > conn["liveness_sec"]:
+        return False
+    return _SYNCED.get(str(token_id)) == conn["epoch"]
+
+
+def get_book(token_id, max_age_sec=None):
+    """
+    (bids, asks, ts) veya None. max_age_sec verilirse kitap canlı abonelikteyse (is_live) yaşına bakılmaz;
+    değilse son değişikliği max_age_sec'ten eskiyse None. Önceki bağlantıdan kalan (yeniden bağlantıdan sonra tam
+    görüntüsü henüz gelmemiş) kitap yaşından bağımsız kullanılmaz.
+    """
+    token_id = str(token_id)
+    book = _BOOKS.get(token_id)
+    if book is None:
+        return None
+    if max_age_sec is not None and not is_live(token_id):
+        synced = _SYNCED.get(token_id)
+        if time.time() - book[2] > max_age_sec or (synced is not None and synced != _CONN["epoch"]):
+            return None
+    return book
+
+
+def best_bid_ask(token_id, max_age_sec=None):
+    """(best_bid, best_ask) — taraf boşsa None. Kitap yoksa/bayatsa None."""
+    book = get_book(token_id, max_age_sec)
+    if book is None:
+        return None
+    bids, asks, _ = book
+    return (bids[0][0] if bids else None, asks[0][0] if asks else None)
+
+
+def get_levels(token_id, side="asks", max_levels=10, max_age_sec=None):
+    """En iyi max_levels seviye: [(price, size), ...]; side: "asks" | "bids"."""
+    book = get_book(token_id, max_age_sec)
+    if book is None:
+        return []
+    return list((book[1] if side == "asks" else book[0])[:max_levels])
+
+
+def staleness_sec(token_id):
+    """Son güncellemeden bu yana geçen süre (sn); kitap yoksa None."""
+    book = _BOOKS.get(str(token_id))
+    return None if book is None else max(0.0, time.time() - book[2])
+
+
+def _on_state(gen, event):
+    """Akış thread'i bağlantı olayı: "open" | "close" | "pong" | "message". Eski akışın olayları yok sayılır."""
+    if gen != _STREAM["gen"]:
+        return
+    now = time.time()
+    if event == "open":
+        _CONN.update({"open": True, "epoch": _CONN["epoch"] + 1, "last_seen": now})
+    elif event == "close":
+        _CONN["open"] = False
+    else:
+        _CONN["last_seen"] = now
+
+
+def ensure_stream(url, asset_ids, ping_interval=10):
+    """
+    Uzun ömürlü market kanalı akışını başlatır; istenen token'lar mevcut aboneliğin dışındaysa
+    birleşik küme ile yeniden bağlanır. Canlılık eşiği ping aralığının 2.5 katıdır (pong gelmezse bayat).
+    Döner: abone olunan token sayısı.
+    """
+    from src.ws_client import run_ws_forever
+    wanted = frozenset(str(a) for a in asset_ids if a)
+    with _STREAM_LOCK:
+        current = _STREAM["asset_ids"]
+        alive = _STREAM["thread"] is not None and _STREAM["thread"].is_alive()
+        if alive and _STREAM["url"] == url and wanted <= current:
+            return len(current)
+        if _STREAM["stop"] is not None:
+            _STREAM["stop"].set()
+        subscribe = sorted(current | wanted) if alive else sorted(wanted)
+        if not subscribe:
+            return 0
+        stop = threading.Event()
+        gen = _STREAM["gen"] + 1
+        _STREAM["gen"] = gen
+        _CONN.update({"open": False, "liveness_sec": 2.5 * ping_interval})
+
+        def _on_message(ws, msg):
+            _on_state(gen, "message")
+            handle_message(msg)
+
+        thread = run_ws_forever(
+            url, subscribe, on_message=_on_message, stop=stop, ping_interval=ping_interval,
+            on_state=lambda event: _on_state(gen, event),
+        )
+        _STREAM.update({"thread": thread, "stop": stop, "asset_ids": frozenset(subscribe), "url": url})
+        return len(subscribe)
+
+
+def stop_stream():
+    """Akışı durdurur (kitaplar bellekte kalır)."""
+    with _STREAM_LOCK:
+        if _STREAM["stop"] is not None:
+            _STREAM["stop"].set()
+        _STREAM.update({"thread": None, "stop": None, "asset_ids": frozenset(), "gen": _STREAM["gen"] + 1})
+        _CONN["open"] = False
@@ -1,15 +1,27 @@
 """
 Polymarket Gamma API: kripto event/market verisi (tag_id=21 = Crypto).
 Dokümantasyon: https://docs.polymarket.com/developers/gamma-markets-api/get-events
+Artımlı çekme: keep-alive oturum, ETag/If-Modified-Since (süreç içi), paralel sayfalama ve
+data/gamma_snapshot.json ile outcomePrices/liquidity değişen piyasaların tespiti.
 """
 import json
-import urllib.request
+import threading
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent.parent
 GAMMA_BASE = "https://gamma-api.polymarket.com"
 CRYPTO_TAG_ID = "21"
+SNAPSHOT_PATH = ROOT / "data" / "gamma_snapshot.json"
+PAGE_SIZE = 50
+PAGE_WORKERS = 4
+TIMEOUT = 30
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+# url -> {"etag", "last_modified", "data"}; 304 yanıtında son gövde kullanılır (daemon modunda turlar arası korunur)
+_HTTP_CACHE = {}
 
 
 def _parse_outcome_prices(outcome_prices):
@@ -23,27 +35,74 @@ def _parse_outcome_prices(outcome_prices):
         return 0.5, 0.5
 
 
-def fetch_events(limit=150, order="volume24hr", ascending=False):
-    """Gamma API'den event listesi (tag_id=21 kripto)."""
+def _session():
+    """Süreç boyunca paylaşılan keep-alive oturum."""
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                s = requests.Session()
+                s.headers.update({"Accept": "application/json", "User-Agent": "Polymarket-Arbitrage/1.0"})
+                s.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=PAGE_WORKERS * 2))
+                _SESSION = s
+    return _SESSION
+
+
+def _get_json(url):
+    """Koşullu GET: önceki yanıtın ETag/Last-Modified'ı gönderilir; 304 ise önbellekteki veri döner."""
+    cached = _HTTP_CACHE.get(url)
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    r = _session().get(url, headers=headers, timeout=TIMEOUT)
+    if r.status_code == 304 and cached:
+        return cached["data"]
+    r.raise_for_status()
+    data = r.json()
+    if r.headers.get("ETag") or r.headers.get("Last-Modified"):
+        _HTTP_CACHE[url] = {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"), "data": data}
+    return data
+
+
+def _fetch_page(limit, offset, order, ascending):
     params = {
         "tag_id": CRYPTO_TAG_ID,
         "active": "true",
         "closed": "false",
         "limit": str(limit),
+        "offset": str(offset),
         "order": order,
         "ascending": str(ascending).lower(),
     }
-    url = f"{GAMMA_BASE}/events?{urllib.parse.urlencode(params)}"
-    req = urllib.request.Request(url, headers={"Accept": "application/json", "User-Agent": "Polymarket-Arbitrage/1.0"})
-    with urllib.request.urlopen(req, timeout=30) as r:
-        data = json.loads(r.read().decode())
+    data = _get_json(f"{GAMMA_BASE}/events?{urllib.parse.urlencode(params)}")
     return data if isinstance(data, list) else []
 
 
+def fetch_events(limit=150, order="volume24hr", ascending=False, page_size=PAGE_SIZE):
+    """Gamma API'den event listesi (tag_id=21 kripto). limit > page_size ise sayfalar paralel çekilir."""
+    offsets = list(range(0, limit, page_size)) or [0]
+    if len(offsets) == 1:
+        return _fetch_page(limit, 0, order, ascending)
+    sizes = [min(page_size, limit - off) for off in offsets]
+    with ThreadPoolExecutor(max_workers=min(PAGE_WORKERS, len(offsets)), thread_name_prefix="gamma") as executor:
+        pages = list(executor.map(lambda a: _fetch_page(a[0], a[1], order, ascending), zip(sizes, offsets)))
+    out = []
+    for page in pages:
+        out.extend(page)
+    return out
+
+
 def fetch_crypto_events(limit=150):
-    """Kripto event'leri: volume24hr + id ile birleştir (tekrarsız)."""
-    by_vol = fetch_events(limit=max(limit, 100), order="volume24hr", ascending=False)
-    by_new = fetch_events(100, order="id", ascending=False)
+    """Kripto event'leri: volume24hr + id ile birleştir (tekrarsız). İki liste paralel çekilir."""
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="gamma-list") as executor:
+        f_vol = executor.submit(fetch_events, max(limit, 100), "volume24hr", False)
+        f_new = executor.submit(fetch_events, 100, "id", False)
+        by_vol, by_new = f_vol.result(), f_new.result()
     by_id = {e["id"]: e for e in by_vol}
     for e in by_new:
         if e["id"] not in by_id:
@@ -51,6 +110,55 @@ def fetch_crypto_events(limit=150):
     return list(by_id.values())
 
 
+def _market_fingerprint(market):
+    return [str(market.get("outcomePrices") or ""), str(market.get("liquidity") or "")]
+
+
+def load_market_snapshot():
+    """Önceki turun piyasa parmak izleri: {market_id: [outcomePrices, liquidity]}."""
+    if not SNAPSHOT_PATH.exists():
+        return {}
+    try:
+        with open(SNAPSHOT_PATH) as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def changed_market_ids(events, snapshot):
+    """Snapshot'a göre yeni veya outcomePrices/liquidity'si değişen piyasa id'leri (set)."""
+    changed = set()
+    for e in events:
+        for m in e.get("markets") or []:
+            mid = str(m.get("id", ""))
+            if snapshot.get(mid) != _market_fingerprint(m):
+                changed.add(mid)
+    return changed
+
+
+def save_market_snapshot(events, exclude_ids=None):
+    """
+    Bu turun parmak izlerini yazar (tur başarıyla bittikten sonra çağrılmalı).
+    exclude_ids: snapshot'a yazılmayacak piyasalar — sonraki turda değişmiş sayılır.
+    """
+    exclude_ids = exclude_ids or set()
+    snap = {}
+    for e in events:
+        for m in e.get("markets") or []:
+            mid = str(m.get("id", ""))
+            if mid not in exclude_ids:
+                snap[mid] = _market_fingerprint(m)
+    try:
+        SNAPSHOT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = SNAPSHOT_PATH.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(snap, f)
+        tmp.replace(SNAPSHOT_PATH)
+    except Exception:
+        pass
+
+
 def group_events_by_asset(events):
     """BTC, ETH, SOL başlıklı event'leri grupla."""
     btc, eth, sol = [], [], []
@@ -65,11 +173,54 @@ def group_events_by_asset(events):
     return {"btc": btc, "eth": eth, "sol": sol}
 
 
-def get_market_prices(market):
-    """Market outcomePrices -> (yes, no)."""
+def get_market_token_ids(market):
+    """clobTokenIds string -> (yes_token_id, no_token_id) veya (None, None)."""
+    raw = market.get("clobTokenIds")
+    try:
+        arr = json.loads(raw) if isinstance(raw, str) else (raw or [])
+        return (str(arr[0]) if arr else None, str(arr[1]) if len(arr) > 1 else None)
+    except (json.JSONDecodeError, TypeError):
+        return None, None
+
+
+def _live_prices(market, max_age_sec):
+    """Canlı order book'tan (yes_ask, no_ask) veya None (token/kitap/ask eksik ya da bayat)."""
+    from src.orderbook import best_bid_ask
+    yes_id, no_id = get_market_token_ids(market)
+    if not (yes_id and no_id):
+        return None
+    yes_q = best_bid_ask(yes_id, max_age_sec)
+    no_q = best_bid_ask(no_id, max_age_sec)
+    if yes_q and no_q and yes_q[1] is not None and no_q[1] is not None:
+        return yes_q[1], no_q[1]
+    return None
+
+
+def get_market_prices(market, max_age_sec=None):
+    """
+    Market outcomePrices -> (yes, no).
+    max_age_sec verilirse önce canlı order book'un en iyi ask'ları (alım maliyeti) kullanılır;
+    iki token için de canlı/taze ask yoksa Gamma snapshot fiyatına düşer.
+    """
+    if max_age_sec is not None:
+        live = _live_prices(market, max_age_sec)
+        if live is not None:
+            return live
     return _parse_outcome_prices(market.get("outcomePrices"))
 
 
+def get_group_prices(markets, max_age_sec=None):
+    """
+    Birlikte değerlendirilen piyasalar (çift / event) için [(yes, no), ...] tek kaynaktan:
+    hepsinin canlı ask'ı varsa order book, biri bile eksikse tümü Gamma (karışık kaynakla fırsat hesaplanmaz).
+    """
+    if max_age_sec is not None:
+        live = [_live_prices(m, max_age_sec) for m in markets]
+        if all(p is not None for p in live):
+            return live
+    return [_parse_outcome_prices(m.get("outcomePrices")) for m in markets]
+
+
 def get_market_liquidity_usd(market):
     """Market liquidity string -> float USD."""
     liq = market.get("liquidity")
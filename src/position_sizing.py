@@ -1,4 +1,4 @@
-"""Pozisyon büyüklüğü: OB derinliğinin cap_pct ile sınırlama."""
+"""Pozisyon büyüklüğü: OB derinliğinin cap_pct ile sınırlama; canlı kitap seviyeleriyle kâr-optimum boyut (depth_optimal)."""
 import sys
 from pathlib import Path
 ROOT = Path(__file__).resolve().parent.parent
@@ -23,3 +23,77 @@ def size_from_orderbook_depth(depth_per_leg_usd, cap_pct=50, max_usd=None):
     if max_usd is not None and size > float(max_usd):
         size = float(max_usd)
     return max(0.0, size)
+
+
+def optimal_sizes_batch(prices, sizes, cap_pct=50, max_usd=None, iterations=40, weights=None):
+    """
+    Derinlik-farkındalıklı boyutlama: N aday × L bacak × K ask seviyesi (fiyat artan; boş seviye size=0).
+    Q portföy birimi için bacak l'de w_l × Q pay alınır (weights (N, L), Layer 1 pozisyonu; None: her bacakta 1).
+    kâr(Q) = Q - Σ maliyet_l(w_l Q) içbükeydir (marjinal fiyat seviye seviye artar), bu yüzden optimum ağırlıklı
+    marjinal fiyat toplamının 1'i geçtiği noktadır. Q, tüm adaylar için aynı anda ikiye bölme (bisection) ile bulunur;
+    üst sınırlar: her bacak derinliğinin cap_pct'i ve toplam maliyet <= max_usd.
+    Döner: dict — qty (N,) birim, cost (N,) USD, profit (N,) USD, limit_price (N, L) bacağın yürüdüğü en derin
+    seviyenin fiyatı (qty'nin tamamı bu limitle dolar; en iyi ask'la yalnızca ilk seviye dolar).
+    """
+    import numpy as np
+    from src.execution_validation import simulate_vwap_batch
+    p = np.asarray(prices, dtype=float)
+    s = np.asarray(sizes, dtype=float)
+    w = np.ones(p.shape[:2]) if weights is None else np.asarray(weights, dtype=float)
+    cum_size = np.cumsum(s, axis=2)
+    cum_cost = np.cumsum(p * s, axis=2)
+    n_levels = p.shape[2]
+    lo = np.zeros(p.shape[0])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hi = np.where(w > 0, cum_size[:, :, -1] / w, np.inf).min(axis=1) * (cap_pct / 100.0)
+    hi = np.where(np.isfinite(hi), hi, 0.0)
+    budget = np.inf if max_usd is None else float(max_usd)
+
+    def _feasible(q):
+        # Bacak payı w_l × q; marjinal seviye: kümülatif derinliği bu paya ulaşmayan seviye sayısı
+        leg_q = w * q[:, None]
+        idx = np.minimum((cum_size < leg_q[:, :, None]).sum(axis=2), n_levels - 1)
+        marginal = np.take_along_axis(p, idx[:, :, None], axis=2)[:, :, 0]
+        prev_size = np.take_along_axis(cum_size - s, idx[:, :, None], axis=2)[:, :, 0]
+        prev_cost = np.take_along_axis(cum_cost - p * s, idx[:, :, None], axis=2)[:, :, 0]
+        cost = np.where(w > 0, prev_cost + (leg_q - prev_size) * marginal, 0.0).sum(axis=1)
+        return ((w * marginal).sum(axis=1) < 1.0) & (cost <= budget)
+
+    # Tüm aralık uygunsa üst sınır doğrudan seçilir; değilse [lo, hi] aralığı daraltılır
+    full = _feasible(hi)
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        ok = _feasible(mid)
+        lo = np.where(ok, mid, lo)
+        hi = np.where(ok, hi, mid)
+    qty = np.where(full, hi, lo)
+    sim = simulate_vwap_batch(p, s, qty, w)
+    return {"qty": sim["fill_qty"], "cost": sim["cost"], "profit": sim["profit"], "limit_price": sim["limit_price"]}
+
+
+def sizes_from_book_levels(candidates, cap_pct=50, max_usd=None, max_levels=10):
+    """
+    Bir taramanın adayları tek optimal_sizes_batch çağrısıyla: candidates [(book_levels, weights), ...]
+    (weights None: eşit pay). Döner: aday başına (size_usd, qty birim, expected_profit_usd, limit_prices) —
+    limit_prices bacak başına emir fiyatı (en derin yürünen seviye; alınmayan bacakta NaN).
+    """
+    from src.execution_validation import pad_candidates
+    if not candidates:
+        return []
+    prices, sizes, w = pad_candidates(
+        [b for b, _ in candidates], [wt if wt is not None else [1.0] * len(b) for b, wt in candidates], max_levels,
+    )
+    out = optimal_sizes_batch(prices, sizes, cap_pct=cap_pct, max_usd=max_usd, weights=w)
+    return [
+        (float(c), float(q), float(pr), [float(x) for x in lp[:len(b)]])
+        for (b, _), c, q, pr, lp in zip(candidates, out["cost"], out["qty"], out["profit"], out["limit_price"])
+    ]
+
+
+def size_from_book_levels(book_levels, cap_pct=50, max_usd=None, max_levels=10, weights=None):
+    """
+    Tek aday: book_levels bacak başına [(price, size), ...] (ask, fiyat artan); weights bacak başına birim payı.
+    Döner: (size_usd, qty, expected_profit_usd, limit_prices) — beklenen kârı (slippage sonrası) en yükselten büyüklük;
+    qty portföy birimi (bacak l'de weights[l] × qty pay), limit_prices bacak başına emir fiyatı.
+    """
+    return sizes_from_book_levels([(book_levels, weights)], cap_pct=cap_pct, max_usd=max_usd, max_levels=max_levels)[0]
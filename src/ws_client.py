@@ -60,3 +60,63 @@ def run_ws(url, asset_ids, on_message=None, run_seconds=60):
     time.sleep(run_seconds)
     stop.set()
     return received
+
+
+def run_ws_forever(url, asset_ids, on_message=None, stop=None, ping_interval=10, delay_min=1, delay_max=60,
+                   on_state=None):
+    """
+    Uzun ömürlü MARKET kanalı tüketicisi (arka plan thread'i). stop (threading.Event) set edilene kadar çalışır.
+    Bağlantı koparsa exp backoff ile sınırsız yeniden bağlanır; başarılı açılışta gecikme sıfırlanır.
+    on_message(ws, message). on_state(event): bağlantı canlılığı için "open" | "close" | "pong". Döner: thread.
+    """
+    import websocket
+    stop = stop or threading.Event()
+    state = {"attempt": 0, "app": None}
+
+    def _state(event):
+        if on_state:
+            try:
+                on_state(event)
+            except Exception:
+                pass
+
+    def _on_open(ws):
+        state["attempt"] = 0
+        ws.send(json.dumps({"assets_ids": list(asset_ids), "type": "market"}))
+        _state("open")
+
+    def _on_message(ws, message):
+        if on_message:
+            on_message(ws, message)
+
+    def _watch_stop():
+        stop.wait()
+        app = state["app"]
+        if app is not None:
+            try:
+                app.close()
+            except Exception:
+                pass
+
+    def _run():
+        while not stop.is_set():
+            try:
+                app = websocket.WebSocketApp(
+                    url, on_open=_on_open, on_message=_on_message,
+                    on_pong=lambda ws, data: _state("pong"),
+                    on_close=lambda ws, code, msg: _state("close"),
+                )
+                state["app"] = app
+                app.run_forever(ping_interval=ping_interval, ping_timeout=max(1, ping_interval - 1))
+            except Exception:
+                pass
+            _state("close")
+            if stop.is_set():
+                break
+            state["attempt"] += 1
+            stop.wait(min(delay_max, delay_min * (2 ** (state["attempt"] - 1))))
+
+    threading.Thread(target=_watch_stop, daemon=True).start()
+    t = threading.Thread(target=_run, daemon=True, name="ws-market")
+    t.start()
+    return t